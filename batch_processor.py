@@ -0,0 +1,218 @@
+import datetime
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import CancelledError, ProcessPoolExecutor, wait
+
+from landmark_cache import DEFAULT_CACHE_DIR, LandmarkCache
+from landmark_checkpoint import DEFAULT_CHECKPOINT_DIR
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov")
+# How often run_batch checks its cancel event while waiting on a clip
+CANCEL_POLL_SECONDS = 0.2
+
+def find_videos(source):
+    # A directory of clips, or a manifest: a JSON list of paths or a text file
+    # with one path per line. Relative manifest entries resolve against the manifest.
+    if os.path.isdir(source):
+        return sorted(
+            os.path.join(source, name) for name in os.listdir(source)
+            if name.lower().endswith(VIDEO_EXTENSIONS)
+        )
+
+    with open(source, 'r') as f:
+        if source.lower().endswith(".json"):
+            entries = json.load(f)
+        else:
+            entries = [line.strip() for line in f]
+    base_dir = os.path.dirname(os.path.abspath(source))
+    return [
+        os.path.join(base_dir, entry) for entry in entries
+        if entry and not entry.startswith("#")
+    ]
+
+def create_output_dir(path):
+    # path, or path_1, path_2... if it exists already. makedirs without
+    # exist_ok claims the directory, so clips of the same name converted in
+    # parallel within the same second each get their own
+    candidate, suffix = path, 0
+    while True:
+        try:
+            os.makedirs(candidate)
+            return candidate
+        except FileExistsError:
+            suffix += 1
+            candidate = f"{path}_{suffix}"
+
+def convert_video(processor, video_path, output_format, output_root=".", status=None, cache=None, json_export=False,
+                  keyframe_tolerance=None, sample_stride=1, motion_threshold=None, inference_size=None, roi_padding=None, render_videos=True, progress=None, cancel=None,
+                  checkpoint_dir=None, smoothing=None, smoothing_options=None):
+    # The full process -> visualize -> convert pipeline for one clip, written
+    # to output_<format>/<name>_<timestamp> under output_root. render_videos=False
+    # skips the overlay and skeleton videos, which can be rendered later from
+    # landmarks.npz with skeleton_renderer.render_overlay_video/render_skeleton_video.
+    # Setting the cancel event raises ProcessingCancelled at the next frame or stage.
+    # With a checkpoint_dir, an interrupted clip resumes where it stopped.
+    # smoothing and smoothing_options select a landmark_smoothing filter.
+
+    # Imported on first use so that importing this module (the GUI does) doesn't
+    # load cv2, MediaPipe and matplotlib
+    from video_processor import ProcessingCancelled
+    from landmarks import export_json
+    from spine_converter import convert_to_spine
+    from blender_converter import generate_blender_script
+    from landmark_visualizer import visualize_landmarks
+
+    def status_update(text):
+        if cancel is not None and cancel.is_set():
+            raise ProcessingCancelled(f"Processing of {video_path} was cancelled")
+        if status:
+            status(text)
+
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    video_name = os.path.splitext(os.path.basename(video_path))[0]
+    output_dir = create_output_dir(os.path.join(output_root, f"output_{output_format}", f"{video_name}_{timestamp}"))
+
+    landmarks_output = os.path.join(output_dir, "landmarks.npz")
+    overlay_video_output = os.path.join(output_dir, "overlay_video.mp4") if render_videos else None
+    skeleton_video_output = os.path.join(output_dir, "skeleton_video.mp4") if render_videos else None
+
+    status_update("Processing video...")
+    start = time.perf_counter()
+    processor.reset()
+    frames = processor.process_video(video_path, landmarks_output, overlay_video_output, skeleton_video_output, output_format, cache=cache,
+                                     sample_stride=sample_stride, motion_threshold=motion_threshold,
+                                     inference_size=inference_size, roi_padding=roi_padding, progress=progress, cancel=cancel,
+                                     checkpoint_dir=checkpoint_dir, smoothing=smoothing, smoothing_options=smoothing_options)
+    process_seconds = time.perf_counter() - start
+    status_update("Video processing complete.")
+
+    if json_export:
+        export_json(landmarks_output, os.path.join(output_dir, "landmarks.json"))
+
+    status_update("Generating landmark visualizations...")
+    visualize_landmarks(landmarks_output, output_dir)
+
+    status_update(f"Converting to {output_format} format...")
+    result = {
+        "video": video_path,
+        "output_dir": output_dir,
+        "frames": frames,
+        "process_seconds": process_seconds,
+        "fps": frames / process_seconds if process_seconds else 0.0,
+    }
+    if output_format == "spine":
+        result["spine_output"] = os.path.join(output_dir, "spine_animation.json")
+        convert_to_spine(landmarks_output, result["spine_output"], tolerance=keyframe_tolerance)
+    else:
+        blender_output = os.path.join(output_dir, "blender_animation.blend")
+        result["blender_script"] = generate_blender_script(landmarks_output, blender_output, tolerance=keyframe_tolerance)
+
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+# Each worker process keeps one warm VideoProcessor for every clip it handles
+_processor = None
+_cache = None
+
+def _init_worker(pose_settings, cache_dir):
+    global _processor, _cache
+    from video_processor import VideoProcessor
+    _processor = VideoProcessor(**pose_settings)
+    _cache = LandmarkCache(cache_dir) if cache_dir else None
+
+def _convert_in_worker(video_path, output_format, output_root, options):
+    from video_processor import ProcessingCancelled
+    try:
+        return convert_video(_processor, video_path, output_format, output_root, cache=_cache, **options)
+    except ProcessingCancelled:
+        return {"video": video_path, "error": "cancelled"}
+    except Exception as e:
+        return {"video": video_path, "error": str(e)}
+
+def run_batch(videos, output_format, output_root=".", workers=None, pose_settings=None, on_result=None, cache_dir=DEFAULT_CACHE_DIR, json_export=False,
+              keyframe_tolerance=None, sample_stride=1, motion_threshold=None, inference_size=None, roi_padding=None, render_videos=True,
+              cancel=None, checkpoint_dir=DEFAULT_CHECKPOINT_DIR, smoothing=None, smoothing_options=None):
+    # Setting the cancel event drops the clips that haven't started yet and
+    # stops the running ones at their next frame or stage
+    pose_settings = pose_settings or {}
+    options = {"json_export": json_export, "keyframe_tolerance": keyframe_tolerance,
+               "sample_stride": sample_stride, "motion_threshold": motion_threshold,
+               "inference_size": inference_size, "roi_padding": roi_padding, "render_videos": render_videos,
+               "checkpoint_dir": checkpoint_dir, "smoothing": smoothing, "smoothing_options": smoothing_options}
+    workers = max(1, min(workers or os.cpu_count() or 1, len(videos)))
+    start = time.perf_counter()
+    results = []
+
+    # Spawn rather than fork: MediaPipe graphs own threads that don't survive a fork
+    context = multiprocessing.get_context("spawn")
+    manager = None
+    worker_cancel = None
+    if cancel is not None:
+        # The caller's event can't cross into the workers; this one can, and
+        # process_video checks it every frame
+        manager = context.Manager()
+        worker_cancel = manager.Event()
+        options["cancel"] = worker_cancel
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=_init_worker, initargs=(pose_settings, cache_dir)) as executor:
+            futures = [executor.submit(_convert_in_worker, video, output_format, output_root, options) for video in videos]
+            for video, future in zip(videos, futures):
+                # Poll, so a cancel reaches the workers while a long clip runs
+                while cancel is not None and not worker_cancel.is_set() and not wait([future], timeout=CANCEL_POLL_SECONDS).done:
+                    if cancel.is_set():
+                        worker_cancel.set()
+                        for pending in futures:
+                            pending.cancel()
+                try:
+                    result = future.result()
+                except CancelledError:
+                    result = {"video": video, "error": "cancelled"}
+                results.append(result)
+                if on_result:
+                    on_result(result)
+    finally:
+        if manager is not None:
+            manager.shutdown()
+
+    wall_seconds = time.perf_counter() - start
+    total_frames = sum(result.get("frames", 0) for result in results)
+    return {
+        "output_format": output_format,
+        "workers": workers,
+        "clips": results,
+        "failed": sum(1 for result in results if "error" in result),
+        "frames": total_frames,
+        "seconds": wall_seconds,
+        "fps": total_frames / wall_seconds if wall_seconds else 0.0,
+    }
+
+def write_summary(summary, output_root="."):
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    summary_path = os.path.join(output_root, f"batch_summary_{timestamp}.json")
+    with open(summary_path, 'w') as f:
+        json.dump(summary, f, indent=2)
+    return summary_path
+
+def print_summary(summary):
+    for clip in summary["clips"]:
+        name = os.path.basename(clip["video"])
+        if "error" in clip:
+            print(f"{name}: FAILED ({clip['error']})")
+        else:
+            print(f"{name}: {clip['frames']} frames, {clip['seconds']:.1f}s, {clip['fps']:.1f} frames/sec")
+    print(f"Total: {len(summary['clips'])} clips ({summary['failed']} failed), "
+          f"{summary['frames']} frames in {summary['seconds']:.1f}s, {summary['fps']:.1f} frames/sec")
+
+def main():
+    # The batch command line lives in cli.py; this entry point is kept for
+    # existing scripts and takes the same arguments as "cli.py batch"
+    import cli
+    return cli.main(["batch", *sys.argv[1:]])
+
+if __name__ == "__main__":
+    raise SystemExit(main())
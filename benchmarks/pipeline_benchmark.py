@@ -0,0 +1,256 @@
+import argparse
+import json
+import math
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_FIXTURE_DIR = os.path.join(tempfile.gettempdir(), "dance_emotes_benchmark")
+LANDMARK_SIZES = (100, 1000, 10000, 100000)
+LANDMARK_STAGES = ("convert_to_spine", "generate_blender_script", "visualize_landmarks")
+STAGES = ("process_video",) + LANDMARK_STAGES
+FPS = 30
+
+# A standing figure in MediaPipe's normalized image coordinates, one (x, y)
+# per landmark: face, arms and hands, then hips and legs
+BASE_POSE = (
+    (0.50, 0.14), (0.49, 0.13), (0.48, 0.13), (0.47, 0.13), (0.51, 0.13), (0.52, 0.13), (0.53, 0.13),
+    (0.45, 0.14), (0.55, 0.14), (0.49, 0.16), (0.51, 0.16),
+    (0.42, 0.27), (0.58, 0.27), (0.38, 0.40), (0.62, 0.40), (0.36, 0.52), (0.64, 0.52),
+    (0.35, 0.55), (0.65, 0.55), (0.36, 0.56), (0.64, 0.56), (0.37, 0.54), (0.63, 0.54),
+    (0.45, 0.55), (0.55, 0.55), (0.45, 0.72), (0.55, 0.72), (0.45, 0.89), (0.55, 0.89),
+    (0.44, 0.91), (0.56, 0.91), (0.47, 0.93), (0.53, 0.93),
+)
+ARMS = slice(13, 23)
+LEGS = slice(25, 33)
+
+def synthetic_landmarks(frames, seed=0):
+    # Raw frames x 33 x 4 landmarks of a swaying, arm-waving figure with a
+    # little tracking noise; the same for a given frame count and seed
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    t = np.arange(frames)[:, None] / FPS
+    base = np.array(BASE_POSE)
+    raw = np.empty((frames, len(base), 4), dtype=np.float32)
+    raw[..., 0] = base[:, 0] + 0.03 * np.sin(2 * math.pi * 0.25 * t)
+    raw[..., 1] = base[:, 1]
+    raw[:, ARMS, 0] += 0.05 * np.sin(2 * math.pi * 1.0 * t)
+    raw[:, ARMS, 1] -= 0.08 * np.abs(np.sin(2 * math.pi * 0.5 * t))
+    raw[:, LEGS, 1] -= 0.02 * np.abs(np.sin(2 * math.pi * 1.0 * t))
+    raw[..., 2] = -0.1 + 0.05 * np.sin(2 * math.pi * 0.5 * t + base[:, 0])
+    raw[..., :3] += rng.normal(0, 0.002, raw[..., :3].shape)
+    raw[..., 3] = rng.uniform(0.8, 1.0, raw.shape[:2])
+    return np.arange(frames, dtype=np.int32), raw
+
+def write_landmark_json(path, frame_numbers, raw, output_format="spine"):
+    # The landmarks.json schema, written a frame at a time so the 100k-frame
+    # fixture doesn't need the whole document in memory
+    from landmarks import array_to_frames, remap_frames
+    with open(path, 'w') as f:
+        f.write(f'{{"fps": {FPS}, "frames": [')
+        for i in range(len(raw)):
+            frame = remap_frames(array_to_frames(frame_numbers[i:i + 1], raw[i:i + 1]), output_format)[0]
+            f.write((", " if i else "") + json.dumps(frame))
+        f.write("]}")
+
+def make_landmarks(fixture_dir, frames, landmark_format):
+    path = os.path.join(fixture_dir, f"landmarks_{frames}.{landmark_format}")
+    if not os.path.exists(path):
+        from landmarks import save_landmark_array
+        frame_numbers, raw = synthetic_landmarks(frames)
+        tmp_path = f"{path}.tmp.{landmark_format}"
+        if landmark_format == "npz":
+            save_landmark_array(tmp_path, FPS, frame_numbers, raw, "spine")
+        else:
+            write_landmark_json(tmp_path, frame_numbers, raw)
+        os.replace(tmp_path, path)
+    return path
+
+def make_video(fixture_dir, frames, width, height):
+    # The synthetic figure drawn thick over a textured background, encoded
+    # with the same mp4v writer the pipeline uses
+    path = os.path.join(fixture_dir, f"clip_{frames}_{width}x{height}.mp4")
+    if not os.path.exists(path):
+        import cv2
+        import numpy as np
+        from skeleton_renderer import SkeletonRenderer
+        _, raw = synthetic_landmarks(frames)
+        renderer = SkeletonRenderer(line_color=(60, 120, 200), thickness=max(2, height // 30),
+                                    joint_color=(40, 80, 160), joint_radius=max(2, height // 60), min_visibility=None)
+        yy, xx = np.mgrid[0:height, 0:width]
+        background = (96 + 32 * np.sin(xx / 23.0) * np.cos(yy / 17.0)).astype(np.uint8)
+        background = cv2.cvtColor(background, cv2.COLOR_GRAY2BGR)
+        tmp_path = f"{path}.tmp.mp4"
+        writer = cv2.VideoWriter(tmp_path, cv2.VideoWriter_fourcc(*'mp4v'), FPS, (width, height))
+        try:
+            for values in raw:
+                writer.write(renderer.draw(background.copy(), values))
+        finally:
+            writer.release()
+        os.replace(tmp_path, path)
+    return path
+
+def peak_rss():
+    # Peak resident set size of this process in bytes, or None where the
+    # resource module is missing (Windows). On Linux ru_maxrss survives exec,
+    # so a child started by a large parent would report the parent's peak;
+    # VmHWM belongs to the new address space.
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(base, name)) for base, _, names in os.walk(path) for name in names)
+
+def run_stage(stage, fixture, frames, output_dir):
+    # Runs in a fresh interpreter (see measure) so peak RSS is the stage's own.
+    # Imports and the pose model load happen before the clock starts.
+    if stage == "process_video":
+        from video_processor import VideoProcessor
+        processor = VideoProcessor()
+        start = time.perf_counter()
+        frames = processor.process_video(fixture, os.path.join(output_dir, "landmarks.npz"),
+                                         os.path.join(output_dir, "overlay_video.mp4"),
+                                         os.path.join(output_dir, "skeleton_video.mp4"), "spine")
+    elif stage == "convert_to_spine":
+        from spine_converter import convert_to_spine
+        start = time.perf_counter()
+        convert_to_spine(fixture, os.path.join(output_dir, "spine_animation.json"))
+    elif stage == "generate_blender_script":
+        from blender_converter import generate_blender_script
+        start = time.perf_counter()
+        generate_blender_script(fixture, os.path.join(output_dir, "blender_animation.blend"))
+    elif stage == "visualize_landmarks":
+        from landmark_visualizer import visualize_landmarks
+        start = time.perf_counter()
+        visualize_landmarks(fixture, output_dir)
+    else:
+        raise ValueError(f"Unknown stage: {stage}")
+    seconds = time.perf_counter() - start
+    return {"seconds": seconds, "frames": frames, "peak_rss": peak_rss(), "output_bytes": directory_size(output_dir)}
+
+def measure(stage, fixture, frames, runs):
+    samples = []
+    for _ in range(runs):
+        output_dir = tempfile.mkdtemp(prefix=f"bench_{stage}_")
+        try:
+            result = subprocess.run([sys.executable, os.path.abspath(__file__), "--run-stage", stage, fixture, str(frames), output_dir],
+                                    cwd=ROOT, capture_output=True, text=True)
+        finally:
+            shutil.rmtree(output_dir, ignore_errors=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"{stage} failed:\n{result.stderr}")
+        # The stages print their own status lines; ours is the last one
+        samples.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+    seconds = statistics.median(sample["seconds"] for sample in samples)
+    frames = samples[0]["frames"]
+    rss = [sample["peak_rss"] for sample in samples if sample["peak_rss"] is not None]
+    return {
+        "seconds": seconds,
+        "min_seconds": min(sample["seconds"] for sample in samples),
+        "frames": frames,
+        "fps": frames / seconds if seconds else 0.0,
+        "peak_rss": max(rss) if rss else None,
+        "output_bytes": samples[0]["output_bytes"],
+        "runs": runs,
+    }
+
+def compare(results, baseline, time_threshold, memory_threshold, min_seconds):
+    # Regressions against a baseline file: slower by more than time_threshold
+    # (ignoring stages faster than min_seconds either way, which are noise) or
+    # a peak RSS larger by more than memory_threshold, as fractions
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if max(current["seconds"], previous["seconds"]) >= min_seconds and current["seconds"] > previous["seconds"] * (1 + time_threshold):
+            regressions.append(f"{name}: {current['seconds']:.3f}s vs {previous['seconds']:.3f}s baseline "
+                               f"({current['fps']:.1f} vs {previous['fps']:.1f} frames/sec)")
+        if current["peak_rss"] and previous.get("peak_rss") and current["peak_rss"] > previous["peak_rss"] * (1 + memory_threshold):
+            regressions.append(f"{name}: peak RSS {current['peak_rss'] / 2 ** 20:.1f} MiB vs "
+                               f"{previous['peak_rss'] / 2 ** 20:.1f} MiB baseline")
+    return regressions
+
+def print_results(results):
+    for name, stats in results.items():
+        rss = f"{stats['peak_rss'] / 2 ** 20:.1f} MiB" if stats["peak_rss"] else "n/a"
+        print(f"{name}: {stats['seconds']:.3f}s median, {stats['fps']:.1f} frames/sec, "
+              f"peak RSS {rss}, output {stats['output_bytes'] / 1024:.1f} KiB")
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the pipeline stages on synthetic clips and landmark files.")
+    parser.add_argument("--stages", choices=STAGES, nargs="+", default=list(STAGES))
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(LANDMARK_SIZES), help="landmark fixture frame counts")
+    parser.add_argument("--landmark-format", choices=("json", "npz"), default="json")
+    parser.add_argument("--video-frames", type=int, default=300)
+    parser.add_argument("--video-size", default="640x360", help="WIDTHxHEIGHT of the synthetic clip")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURE_DIR, help="where generated fixtures are kept between runs")
+    parser.add_argument("--baseline", default=None, help="baseline JSON to compare against; exits 1 on a regression")
+    parser.add_argument("--save-baseline", default=None, help="write these results as a baseline JSON")
+    parser.add_argument("--time-threshold", type=float, default=0.15, help="allowed slowdown as a fraction")
+    parser.add_argument("--memory-threshold", type=float, default=0.10, help="allowed peak RSS growth as a fraction")
+    parser.add_argument("--min-seconds", type=float, default=0.05, help="stages faster than this are not checked for time")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    parser.add_argument("--run-stage", nargs=4, metavar=("STAGE", "FIXTURE", "FRAMES", "OUTPUT_DIR"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_stage:
+        stage, fixture, frames, output_dir = args.run_stage
+        print(json.dumps(run_stage(stage, fixture, int(frames), output_dir)))
+        return 0
+
+    os.makedirs(args.fixtures, exist_ok=True)
+    width, height = (int(value) for value in args.video_size.lower().split("x"))
+    results = {}
+    for stage in args.stages:
+        if stage == "process_video":
+            video = make_video(args.fixtures, args.video_frames, width, height)
+            results[f"{stage}@{args.video_frames}x{args.video_size}"] = measure(stage, video, args.video_frames, args.runs)
+            continue
+        for frames in args.sizes:
+            fixture = make_landmarks(args.fixtures, frames, args.landmark_format)
+            results[f"{stage}@{frames}.{args.landmark_format}"] = measure(stage, fixture, frames, args.runs)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_results(results)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.save_baseline}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.time_threshold, args.memory_threshold, args.min_seconds)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
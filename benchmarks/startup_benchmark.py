@@ -0,0 +1,85 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Each snippet runs in a fresh interpreter and prints the seconds it measured,
+# or "skip" when it can't run here (e.g. no display for Tk)
+SNIPPETS = {
+    "gui_import": """
+import time
+start = time.perf_counter()
+import gui
+print(time.perf_counter() - start)
+""",
+    "time_to_window": """
+import time
+start = time.perf_counter()
+import tkinter as tk
+try:
+    root = tk.Tk()
+except tk.TclError:
+    print("skip")
+    raise SystemExit
+import gui
+app = gui.VideoConverterGUI(root)
+root.update()
+print(time.perf_counter() - start)
+root.destroy()
+""",
+    "cli_help": """
+import contextlib, io, time
+start = time.perf_counter()
+import cli
+with contextlib.redirect_stdout(io.StringIO()):
+    try:
+        cli.main(["--help"])
+    except SystemExit:
+        pass
+print(time.perf_counter() - start)
+""",
+    "pose_model_ready": """
+import time
+start = time.perf_counter()
+from video_processor import VideoProcessor
+VideoProcessor()
+print(time.perf_counter() - start)
+""",
+}
+
+def measure(name, runs):
+    times = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-c", SNIPPETS[name]], cwd=ROOT, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"{name} failed:\n{result.stderr}")
+        output = result.stdout.strip().splitlines()[-1]
+        if output == "skip":
+            return None
+        times.append(float(output))
+    return {"median": statistics.median(times), "min": min(times), "max": max(times), "runs": runs}
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure GUI and CLI startup time in fresh interpreters.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--only", choices=sorted(SNIPPETS), action="append", help="run only these measurements")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    results = {name: measure(name, args.runs) for name in (args.only or SNIPPETS)}
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    for name, stats in results.items():
+        if stats is None:
+            print(f"{name}: skipped")
+        else:
+            print(f"{name}: {stats['median']:.3f}s median ({stats['min']:.3f}-{stats['max']:.3f}s over {stats['runs']} runs)")
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,169 @@
-import json
 import os
 
-def generate_blender_script(input_file, output_file):
+import numpy as np
+
+from keyframe_reduction import simplify_keyframes
+from landmarks import load_landmarks
+
+HIP_INDEX = 23  # Left hip as reference
+
+# Armature bones and the landmarks their rest pose runs between
+BONE_STRUCTURE = {
+    "spine": (23, 11),  # Left hip to left shoulder
+    "neck": (11, 0),  # Left shoulder to nose
+    "left_shoulder": (11, 13),
+    "left_upper_arm": (13, 15),
+    "left_forearm": (15, 17),
+    "left_hand": (17, 19),
+    "right_shoulder": (12, 14),
+    "right_upper_arm": (14, 16),
+    "right_forearm": (16, 18),
+    "right_hand": (18, 20),
+    "left_thigh": (23, 25),
+    "left_shin": (25, 27),
+    "left_foot": (27, 31),
+    "right_thigh": (24, 26),
+    "right_shin": (26, 28),
+    "right_foot": (28, 32)
+}
+
+# MediaPipe landmark to bone mapping used for the animation
+BONE_MAPPING = {
+    "root": (0, 23),
+    "spine": (23, 24),
+    "neck": (11, 12),
+    "head": (0, 0),
+    "left_shoulder": (11, 13),
+    "left_upper_arm": (13, 15),
+    "left_forearm": (15, 17),
+    "left_hand": (17, 19),
+    "right_shoulder": (12, 14),
+    "right_upper_arm": (14, 16),
+    "right_forearm": (16, 18),
+    "right_hand": (18, 20),
+    "left_thigh": (23, 25),
+    "left_shin": (25, 27),
+    "left_foot": (27, 31),
+    "right_thigh": (24, 26),
+    "right_shin": (26, 28),
+    "right_foot": (28, 32)
+}
+
+def convert_coordinates(coords):
+    # Frames x 33 x 3 positions relative to the left hip, from landmarks
+    # already remapped to Blender axes
+    relative = coords[..., :3] - coords[..., HIP_INDEX:HIP_INDEX + 1, :3]
+    return np.stack([relative[..., 0], -relative[..., 2], -relative[..., 1]], axis=-1)
+
+def track_quaternions(directions):
+    # (w, x, y, z) rotations pointing the Y axis along each direction with Z
+    # up, the same as mathutils Vector.to_track_quat('Y', 'Z')
+    directions = np.asarray(directions, dtype=np.float64)
+    x, y, z = directions[..., 0], directions[..., 1], directions[..., 2]
+    length = np.sqrt(x * x + y * y + z * z)
+    valid = length > 0
+    safe_length = np.where(valid, length, 1.0)
+
+    # Rotate Y onto the direction about the axis (z, 0, -x)
+    axis_x = z
+    axis_z = np.where(np.abs(x) + np.abs(z) < 1e-4, 1.0, -x)
+    axis_length = np.sqrt(axis_x * axis_x + axis_z * axis_z)
+    half = 0.5 * np.arccos(np.clip(y / safe_length, -1.0, 1.0))
+    sin_half = np.sin(half) / axis_length
+    qw, qx, qy, qz = np.cos(half), axis_x * sin_half, np.zeros_like(half), axis_z * sin_half
+
+    # Then twist about the direction so the Z axis stays up
+    angle = 0.5 * np.arctan2(2 * (qw * qy + qx * qz), 1 - 2 * (qx * qx + qy * qy))
+    tw = np.cos(angle)
+    twist = np.sin(angle) / safe_length
+    tx, ty, tz = x * twist, y * twist, z * twist
+
+    quaternions = np.stack([
+        tw * qw - tx * qx - ty * qy - tz * qz,
+        tw * qx + tx * qw + ty * qz - tz * qy,
+        tw * qy + ty * qw + tz * qx - tx * qz,
+        tw * qz + tz * qw + tx * qy - ty * qx,
+    ], axis=-1)
+    quaternions[~valid] = (1.0, 0.0, 0.0, 0.0)
+    return quaternions
+
+def rest_pose(initial_positions):
+    # Head, tail and parent of every armature bone. A bone only gets a parent
+    # if it was created before it, so in practice only the neck is parented.
+    bones = {}
+    for bone_name, (start_idx, end_idx) in BONE_STRUCTURE.items():
+        parent_name = None
+        if bone_name.startswith("left_") or bone_name.startswith("right_"):
+            parent_name = "_".join(bone_name.split("_")[:-1])
+        elif bone_name == "neck":
+            parent_name = "spine"
+        if parent_name not in bones:
+            parent_name = None
+        head = tuple(initial_positions[start_idx].tolist())
+        tail = tuple(initial_positions[end_idx].tolist())
+        bones[bone_name] = (head, tail, parent_name)
+    return bones
+
+def bone_animation(frame_numbers, positions, tolerance=None):
+    # Location and rotation keys for every mapped armature bone, as float32
+    # arrays keyed "<bone>.<channel>" and "<bone>.<channel>_frames"
+    times = frame_numbers.astype(np.float64)
+    animation = {}
+    for bone_name, (start_idx, end_idx) in BONE_MAPPING.items():
+        if bone_name not in BONE_STRUCTURE:
+            print(f"Warning: Bone '{bone_name}' not found in the armature.")
+            continue
+
+        # Use start position as location and the bone direction as rotation
+        locations = positions[:, start_idx]
+        direction = positions[:, end_idx] - locations
+        norm = np.linalg.norm(direction, axis=-1, keepdims=True)
+        direction = np.divide(direction, norm, out=np.zeros_like(direction), where=norm > 0)
+        rotations = track_quaternions(direction)
+
+        for channel, values in (("location", locations), ("rotation_quaternion", rotations)):
+            keep = slice(None)
+            if tolerance is not None:
+                keep = simplify_keyframes(times, values, tolerance)
+            animation[f"{bone_name}.{channel}_frames"] = times[keep].astype(np.float32)
+            animation[f"{bone_name}.{channel}"] = values[keep].astype(np.float32)
+    return animation
+
+def generate_blender_script(input_file, output_file, tolerance=None):
+    # All bone transforms are computed here and written to a float32 .npz
+    # next to the script, which only builds the armature and bulk-loads the
+    # keys. tolerance enables keyframe reduction: the largest allowed error of
+    # the linearly interpolated location and quaternion curves.
+
     # Get absolute paths
-    input_file_abs = os.path.abspath(input_file)
     output_file_abs = os.path.abspath(output_file)
     
     # Get the directory of the output file
     output_dir = os.path.dirname(output_file_abs)
     script_path = os.path.join(output_dir, "blender_conversion_script.py")
+    animation_path = os.path.join(output_dir, "blender_animation_data.npz")
+
+    fps, frame_numbers, coords = load_landmarks(input_file, "blender")
+    positions = convert_coordinates(coords)
+
+    bones = None
+    if len(positions):
+        # Create armature based on the first frame of data
+        bones = rest_pose(positions[0])
+        np.savez(animation_path, **bone_animation(frame_numbers, positions, tolerance))
 
     script_content = f"""
 import bpy
-import json
 import math
-from mathutils import Vector, Quaternion
+import numpy as np
+
+# Rest pose as bone name -> (head, tail, parent), precomputed from the first frame
+BONES = {bones!r}
 
-def create_humanoid_armature(initial_landmarks):
+# Keyframe reduction tolerance the keys were reduced with; None keys every frame
+KEYFRAME_TOLERANCE = {tolerance!r}
+
+def create_humanoid_armature(bone_structure):
     armature = bpy.data.armatures.new("MediaPipeArmature")
     armature_object = bpy.data.objects.new("MediaPipeArmature", armature)
     
@@ -26,151 +173,64 @@ def create_humanoid_armature(initial_landmarks):
     
     bones = armature.edit_bones
     
-    hip_landmark = initial_landmarks[23]  # Left hip as reference
-    
-    # Adjusted bone structure
-    bone_structure = {{
-        "spine": (23, 11),  # Left hip to left shoulder
-        "neck": (11, 0),  # Left shoulder to nose
-        "left_shoulder": (11, 13),
-        "left_upper_arm": (13, 15),
-        "left_forearm": (15, 17),
-        "left_hand": (17, 19),
-        "right_shoulder": (12, 14),
-        "right_upper_arm": (14, 16),
-        "right_forearm": (16, 18),
-        "right_hand": (18, 20),
-        "left_thigh": (23, 25),
-        "left_shin": (25, 27),
-        "left_foot": (27, 31),
-        "right_thigh": (24, 26),
-        "right_shin": (26, 28),
-        "right_foot": (28, 32)
-    }}
-    
-    for bone_name, (start_idx, end_idx) in bone_structure.items():
+    for bone_name, (head, tail, parent_name) in bone_structure.items():
         bone = bones.new(bone_name)
-        start_pos = convert_coordinates(initial_landmarks[start_idx], hip_landmark)
-        end_pos = convert_coordinates(initial_landmarks[end_idx], hip_landmark)
-        
-        bone.head = start_pos
-        bone.tail = end_pos
-        
-        if bone_name.startswith("left_") or bone_name.startswith("right_"):
-            parent_name = "_".join(bone_name.split("_")[:-1])
+        bone.head = head
+        bone.tail = tail
+        if parent_name is not None:
             bone.parent = bones.get(parent_name)
-        elif bone_name == "neck":
-            bone.parent = bones.get("spine")
     
     # Ensure the armature is standing upright
     bpy.ops.object.mode_set(mode='OBJECT')
     armature_object.rotation_euler = (math.radians(90), 0, 0)
     
     return armature_object
-    
-def convert_coordinates(landmark, hip_landmark):
-    x = (landmark['x'] - hip_landmark['x'])
-    y = -(landmark['z'] - hip_landmark['z'])  # Negate for depth
-    z = -(landmark['y'] - hip_landmark['y'])  # Negate to invert Y axis
-    return (x, y, z)
-
-def calculate_bone_rotation(start_pos, end_pos):
-    # Calculate bone direction
-    direction = (Vector(end_pos) - Vector(start_pos)).normalized()
-    
-    # Create a rotation quaternion that aligns the bone with this direction
-    up_vector = Vector((0, 0, 1))
-    rotation = direction.to_track_quat('Y', 'Z')
-    
-    return rotation
 
-def set_bone_keyframe(armature_object, bone_name, frame, location, rotation):
-    if bone_name not in armature_object.pose.bones:
-        print(f"Warning: Bone '{{bone_name}}' not found in the armature.")
-        return
+def set_bone_fcurves(action, armature_object, bone_name, data_path, frames, values):
+    # Creates one fcurve per channel and fills it in bulk rather than calling
+    # keyframe_insert once per frame
+    if data_path == "rotation_quaternion":
+        armature_object.pose.bones[bone_name].rotation_mode = 'QUATERNION'
 
-    pose_bone = armature_object.pose.bones[bone_name]
-    
-    pose_bone.location = location
-    pose_bone.keyframe_insert(data_path="location", frame=frame)
-    
-    pose_bone.rotation_mode = 'QUATERNION'
-    pose_bone.rotation_quaternion = rotation
-    pose_bone.keyframe_insert(data_path="rotation_quaternion", frame=frame)
-
-def convert_mediapipe_to_blender(input_file, output_file):
-    # Load MediaPipe data
-    with open(input_file, 'r') as f:
-        data = json.load(f)
-    
-    if not data['frames']:
+    for index in range(values.shape[1]):
+        fcurve = action.fcurves.new(data_path=f'pose.bones["{{bone_name}}"].{{data_path}}', index=index, action_group=bone_name)
+        fcurve.keyframe_points.add(len(frames))
+        fcurve.keyframe_points.foreach_set("co", np.column_stack([frames, values[:, index]]).ravel())
+        if KEYFRAME_TOLERANCE is not None:
+            # Reduction assumes straight lines between the kept keys
+            for keyframe in fcurve.keyframe_points:
+                keyframe.interpolation = 'LINEAR'
+        fcurve.update()
+
+def convert_mediapipe_to_blender(animation_file, output_file):
+    if BONES is None:
         print("Error: No frame data found in the input file.")
         return
     
-    # Create armature based on the first frame of data
-    initial_landmarks = data['frames'][0]['landmarks']
-    armature_object = create_humanoid_armature(initial_landmarks)
+    armature_object = create_humanoid_armature(BONES)
     
     # Create animation data
     armature_object.animation_data_create()
     action = bpy.data.actions.new(name="MediaPipeAnimation")
     armature_object.animation_data.action = action
     
-    # MediaPipe landmark to bone mapping
-    bone_mapping = {{
-        "root": (0, 23),
-        "spine": (23, 24),
-        "neck": (11, 12),
-        "head": (0, 0),
-        "left_shoulder": (11, 13),
-        "left_upper_arm": (13, 15),
-        "left_forearm": (15, 17),
-        "left_hand": (17, 19),
-        "right_shoulder": (12, 14),
-        "right_upper_arm": (14, 16),
-        "right_forearm": (16, 18),
-        "right_hand": (18, 20),
-        "left_thigh": (23, 25),
-        "left_shin": (25, 27),
-        "left_foot": (27, 31),
-        "right_thigh": (24, 26),
-        "right_shin": (26, 28),
-        "right_foot": (28, 32)
-    }}
-    
-    # Set keyframes for each frame
-    for frame in data['frames']:
-        frame_num = frame['frame']
-        landmarks = frame['landmarks']
-        hip_landmark = landmarks[23]  # Left hip as reference
-        
-        for bone_name, (start_idx, end_idx) in bone_mapping.items():
-            try:
-                start_landmark = landmarks[start_idx]
-                end_landmark = landmarks[end_idx]
-                
-                start_pos = convert_coordinates(start_landmark, hip_landmark)
-                end_pos = convert_coordinates(end_landmark, hip_landmark)
-                
-                # Use start position as location for the bone
-                location = start_pos
-                
-                # Calculate rotation based on bone direction
-                rotation = calculate_bone_rotation(start_pos, end_pos)
-                
-                set_bone_keyframe(armature_object, bone_name, frame_num, location, rotation)
-            except IndexError:
-                print(f"Warning: Missing landmark data for bone '{{bone_name}}' in frame {{frame_num}}")
+    # Write the precomputed keyframes straight into the action
+    with np.load(animation_file) as animation:
+        for bone_name in BONES:
+            for data_path in ("location", "rotation_quaternion"):
+                key = f"{{bone_name}}.{{data_path}}"
+                if key in animation:
+                    set_bone_fcurves(action, armature_object, bone_name, data_path, animation[key + "_frames"], animation[key])
     
     # Save the Blender file
     bpy.ops.wm.save_as_mainfile(filepath=output_file)
-    print(f"Animation imported from {{input_file}} and saved to {{output_file}}")
+    print(f"Animation imported from {{animation_file}} and saved to {{output_file}}")
 
 # Global scale factor to adjust MediaPipe data to Blender's scale
 SCALE_FACTOR = 8  # Adjust this value as needed
 
 # Run the conversion
-convert_mediapipe_to_blender("{input_file_abs}", "{output_file_abs}")
+convert_mediapipe_to_blender({animation_path!r}, {output_file_abs!r})
 """
 
     with open(script_path, "w") as f:
@@ -186,4 +246,4 @@ convert_mediapipe_to_blender("{input_file_abs}", "{output_file_abs}")
     return script_path
 
 # Usage
-# generate_blender_script("landmarks_output.json", "blender_animation.blend")
+# generate_blender_script("landmarks_output.npz", "blender_animation.blend")
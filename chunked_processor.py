@@ -0,0 +1,59 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+
+from landmarks import check_output_format, frames_to_array, save_landmarks
+from video_processor import VideoProcessor
+
+def _process_chunk(video_path, start, end, warmup_frames, pose_settings):
+    # Runs in a worker process, each with its own Pose tracker
+    processor = VideoProcessor(**pose_settings)
+    try:
+        return processor.process_frame_range(video_path, start, end, warmup_frames)
+    finally:
+        processor.pose.close()
+
+def split_frame_ranges(frame_count, chunks, min_chunk_frames=1):
+    chunks = max(1, min(chunks, frame_count // max(1, min_chunk_frames)))
+    bounds = [round(i * frame_count / chunks) for i in range(chunks + 1)]
+    return [(bounds[i], bounds[i + 1]) for i in range(chunks) if bounds[i] < bounds[i + 1]]
+
+def process_video_chunked(video_path, landmarks_output, output_format, workers=None, warmup_frames=30, pose_settings=None):
+    # Splits the clip into contiguous frame ranges and tracks each one in its own
+    # process. Every worker starts warmup_frames early so tracking has settled at
+    # the seam; the warm-up results are dropped, so the merged frames line up
+    # exactly with a serial run. Only landmarks are produced in this mode.
+    check_output_format(output_format)
+
+    cap = cv2.VideoCapture(video_path)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = int(cap.get(cv2.CAP_PROP_FPS))
+    cap.release()
+
+    workers = workers or os.cpu_count() or 1
+    pose_settings = pose_settings or {}
+    # Chunks much shorter than the warm-up window would spend most of their time warming up
+    ranges = split_frame_ranges(frame_count, workers, min_chunk_frames=warmup_frames * 4)
+
+    # Spawn rather than fork: MediaPipe graphs own threads that don't survive a fork
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max(1, len(ranges)), mp_context=context) as executor:
+        futures = [
+            executor.submit(_process_chunk, video_path, start, end, warmup_frames, pose_settings)
+            for start, end in ranges
+        ]
+        raw_frames = []
+        for future in futures:
+            raw_frames.extend(future.result())
+
+    frame_numbers, raw = frames_to_array(raw_frames)
+    save_landmarks(landmarks_output, fps, frame_numbers, raw, output_format)
+
+    print(f"Processed {frame_count} frames in {len(ranges)} chunks")
+    return frame_numbers, raw
+
+# Usage
+# if __name__ == "__main__":
+#     process_video_chunked("input_video.mp4", "landmarks_output.npz", "spine", workers=8)
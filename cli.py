@@ -0,0 +1,506 @@
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import sys
+import time
+
+# Each command imports what it needs when it runs, so --help and the light
+# commands don't pay for cv2, MediaPipe and matplotlib
+from instrumentation import NULL_METRICS, Metrics, profiling
+from landmark_cache import DEFAULT_CACHE_DIR
+from landmark_checkpoint import DEFAULT_CHECKPOINT_DIR
+from landmark_smoothing import SMOOTHING_METHODS
+from landmarks import OUTPUT_FORMATS
+
+# Exit codes for job schedulers; argparse itself exits with EXIT_USAGE
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_INTERRUPTED = 130
+
+class ProgressReporter:
+    # Writes one JSON object per line to stream. Frame progress is throttled
+    # to one event per interval seconds, plus the final frame.
+    def __init__(self, stream, interval=1.0):
+        self.stream = stream
+        self.interval = interval
+        self.start = time.perf_counter()
+        self.frames_start = self.start
+        self.last_report = None
+
+    # Keys every event has, which fields can't override
+    RESERVED_FIELDS = ("event", "time")
+
+    def event(self, event, **fields):
+        reserved = [name for name in self.RESERVED_FIELDS if name in fields]
+        if reserved:
+            raise ValueError(f"Event fields can't be named {', '.join(reserved)}")
+        fields = dict(event=event, time=round(time.time(), 3), **fields)
+        self.stream.write(json.dumps(fields) + "\n")
+        self.stream.flush()
+
+    def stage(self, stage):
+        self.event("stage", stage=stage, elapsed=round(time.perf_counter() - self.start, 3))
+        if stage == "process":
+            self.frames_start = time.perf_counter()
+            self.last_report = None
+
+    def frames(self, done, total):
+        now = time.perf_counter()
+        finished = total and done >= total
+        if not finished and self.last_report is not None and now - self.last_report < self.interval:
+            return
+        self.last_report = now
+
+        seconds = now - self.frames_start
+        fps = done / seconds if seconds else 0.0
+        # The container's frame count can be missing or wrong, so the ETA is a guess
+        eta = (total - done) / fps if total and fps and total > done else None
+        self.event("progress", frames=done, total=total or None, fps=round(fps, 2),
+                   eta=None if eta is None else round(eta, 1))
+
+def add_pose_arguments(parser):
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="blender")
+    parser.add_argument("--min-detection-confidence", type=float, default=0.5)
+    parser.add_argument("--min-tracking-confidence", type=float, default=0.5)
+    parser.add_argument("--model-complexity", type=int, choices=[0, 1, 2], default=1)
+    parser.add_argument("--stride", type=int, default=1,
+                        help="run pose inference on every Nth frame and interpolate the frames in between")
+    parser.add_argument("--motion-threshold", type=float, default=None,
+                        help="with --stride, infer every frame while landmarks move more than this per frame")
+    parser.add_argument("--inference-size", type=int, default=None,
+                        help="downscale frames so the longer side is at most this many pixels for pose inference")
+    parser.add_argument("--roi-padding", type=float, default=None,
+                        help="run inference on a crop around the previous pose, padded by this fraction of its size")
+    parser.add_argument("--keyframe-tolerance", type=float, default=None,
+                        help="drop keyframes that linear interpolation reproduces within this error")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="landmark cache location")
+    parser.add_argument("--no-cache", action="store_true", help="always rerun pose inference")
+    parser.add_argument("--json", action="store_true", help="also export landmarks.json next to landmarks.npz")
+    parser.add_argument("--no-videos", action="store_true", help="skip the overlay and skeleton videos")
+    parser.add_argument("--checkpoint-dir", default=DEFAULT_CHECKPOINT_DIR,
+                        help="where landmarks are checkpointed, so an interrupted run resumes")
+    parser.add_argument("--no-checkpoint", action="store_true", help="don't checkpoint; an interrupted run starts over")
+
+    parser.add_argument("--smooth", choices=SMOOTHING_METHODS, default=None,
+                        help="filter landmark jitter: one_euro (streaming) or savgol (zero-phase)")
+    parser.add_argument("--smooth-window", type=int, default=None, help="savgol: frames in the fitting window")
+    parser.add_argument("--smooth-order", type=int, default=None, help="savgol: polynomial order")
+    parser.add_argument("--smooth-min-cutoff", type=float, default=None, help="one_euro: cutoff in Hz when still")
+    parser.add_argument("--smooth-beta", type=float, default=None, help="one_euro: how fast the cutoff rises with speed")
+
+def checkpoint_dir(args):
+    return None if args.no_checkpoint else args.checkpoint_dir
+
+def smoothing_options(args):
+    # Only the options given, so the filters' own defaults apply otherwise
+    if args.smooth == "savgol":
+        options = {"window": args.smooth_window, "order": args.smooth_order}
+    else:
+        options = {"min_cutoff": args.smooth_min_cutoff, "beta": args.smooth_beta}
+    return {name: value for name, value in options.items() if value is not None}
+
+def pose_settings(args):
+    return {
+        "min_detection_confidence": args.min_detection_confidence,
+        "min_tracking_confidence": args.min_tracking_confidence,
+        "model_complexity": args.model_complexity,
+    }
+
+def run_process(args, reporter):
+    from batch_processor import create_output_dir
+    from video_processor import VideoProcessor
+    from landmark_cache import LandmarkCache
+    from landmarks import export_json
+    from spine_converter import convert_to_spine
+    from blender_converter import generate_blender_script
+    from landmark_visualizer import visualize_landmarks
+
+    if not os.path.isfile(args.video):
+        reporter.event("error", message=f"Video not found: {args.video}")
+        return EXIT_USAGE
+
+    output_dir = args.output_dir
+    if output_dir is None:
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        video_name = os.path.splitext(os.path.basename(args.video))[0]
+        output_dir = create_output_dir(os.path.join(f"output_{args.format}", f"{video_name}_{timestamp}"))
+    else:
+        os.makedirs(output_dir, exist_ok=True)
+
+    def output_path(path, name):
+        return path or os.path.join(output_dir, name)
+
+    landmarks_output = output_path(args.landmarks, "landmarks.npz")
+    overlay_video_output = None if args.no_videos else output_path(args.overlay_video, "overlay_video.mp4")
+    skeleton_video_output = None if args.no_videos else output_path(args.skeleton_video, "skeleton_video.mp4")
+    outputs = {"landmarks": landmarks_output, "overlay_video": overlay_video_output, "skeleton_video": skeleton_video_output}
+    reporter.event("start", video=args.video, output_dir=output_dir, format=args.format)
+
+    metrics = Metrics() if args.metrics else NULL_METRICS
+    reporter.stage("process")
+    with metrics.timer("load_model"):
+        processor = VideoProcessor(**pose_settings(args), metrics=metrics)
+    cache = None if args.no_cache else LandmarkCache(args.cache_dir)
+    with metrics.timer("process_video"):
+        frames = processor.process_video(args.video, landmarks_output, overlay_video_output, skeleton_video_output, args.format,
+                                         cache=cache, sample_stride=args.stride, motion_threshold=args.motion_threshold,
+                                         inference_size=args.inference_size, roi_padding=args.roi_padding,
+                                         progress=reporter.frames, checkpoint_dir=checkpoint_dir(args),
+                                         smoothing=args.smooth, smoothing_options=smoothing_options(args))
+
+    if args.json:
+        if landmarks_output.endswith(".npz"):
+            outputs["landmarks_json"] = output_path(None, "landmarks.json")
+            export_json(landmarks_output, outputs["landmarks_json"])
+        else:
+            # --landmarks already asked for the JSON schema
+            outputs["landmarks_json"] = landmarks_output
+
+    if not args.no_visualize:
+        reporter.stage("visualize")
+        outputs["visualization_dir"] = args.visualization_dir or output_dir
+        os.makedirs(outputs["visualization_dir"], exist_ok=True)
+        with metrics.timer("visualize"):
+            visualize_landmarks(landmarks_output, outputs["visualization_dir"], samples=args.visualize_frames,
+                                workers=args.visualize_workers, grid=args.visualize_grid,
+                                animation=args.visualize_animation, animation_step=args.animation_step)
+
+    reporter.stage(f"convert_{args.format}")
+    with metrics.timer(f"convert_{args.format}"):
+        if args.format == "spine":
+            outputs["spine_output"] = output_path(args.spine_output, "spine_animation.json")
+            convert_to_spine(landmarks_output, outputs["spine_output"], tolerance=args.keyframe_tolerance)
+        else:
+            outputs["blender_output"] = output_path(args.blender_output, "blender_animation.blend")
+            outputs["blender_script"] = generate_blender_script(landmarks_output, outputs["blender_output"], tolerance=args.keyframe_tolerance)
+
+    if args.metrics:
+        outputs["metrics"] = metrics.write(args.metrics)
+    reporter.event("done", frames=frames, seconds=round(time.perf_counter() - reporter.start, 3), outputs=outputs)
+    return EXIT_OK
+
+def run_batch_command(args, reporter):
+    from batch_processor import find_videos, run_batch, write_summary
+
+    videos = find_videos(args.source)
+    if not videos:
+        reporter.event("error", message=f"No videos found in {args.source}")
+        return EXIT_FAILED
+    reporter.event("start", source=args.source, videos=len(videos), format=args.format)
+
+    done = []
+
+    def on_result(result):
+        done.append(result)
+        reporter.event("clip", completed=len(done), total=len(videos), **result)
+
+    cache_dir = None if args.no_cache else args.cache_dir
+    summary = run_batch(videos, args.format, args.output_root, args.workers, pose_settings=pose_settings(args),
+                        on_result=on_result, cache_dir=cache_dir, json_export=args.json,
+                        keyframe_tolerance=args.keyframe_tolerance, sample_stride=args.stride,
+                        motion_threshold=args.motion_threshold, inference_size=args.inference_size,
+                        roi_padding=args.roi_padding, render_videos=not args.no_videos, checkpoint_dir=checkpoint_dir(args),
+                        smoothing=args.smooth, smoothing_options=smoothing_options(args))
+    summary_path = write_summary(summary, args.output_root)
+    reporter.event("done", clips=len(summary["clips"]), failed=summary["failed"], frames=summary["frames"],
+                   seconds=round(summary["seconds"], 3), fps=round(summary["fps"], 2), summary=summary_path)
+    return EXIT_FAILED if summary["failed"] else EXIT_OK
+
+def run_convert(args, reporter):
+    # Re-export existing landmarks without loading the video stack
+    if not os.path.isfile(args.landmarks):
+        reporter.event("error", message=f"Landmarks not found: {args.landmarks}")
+        return EXIT_USAGE
+
+    reporter.event("start", landmarks=args.landmarks, format=args.format)
+    reporter.stage(f"convert_{args.format}")
+    if args.format == "spine":
+        from spine_converter import convert_to_spine
+        output = args.output or os.path.join(os.path.dirname(args.landmarks), "spine_animation.json")
+        convert_to_spine(args.landmarks, output, tolerance=args.keyframe_tolerance)
+        outputs = {"spine_output": output}
+    else:
+        from blender_converter import generate_blender_script
+        output = args.output or os.path.join(os.path.dirname(args.landmarks), "blender_animation.blend")
+        outputs = {"blender_output": output,
+                   "blender_script": generate_blender_script(args.landmarks, output, tolerance=args.keyframe_tolerance)}
+
+    reporter.event("done", seconds=round(time.perf_counter() - reporter.start, 3), outputs=outputs)
+    return EXIT_OK
+
+def run_render(args, reporter):
+    # Drawing needs no pose model, so this never loads MediaPipe
+    from skeleton_renderer import render_overlay_video, render_skeleton_video
+
+    if not os.path.isfile(args.landmarks):
+        reporter.event("error", message=f"Landmarks not found: {args.landmarks}")
+        return EXIT_USAGE
+    if not args.landmarks.endswith(".npz"):
+        reporter.event("error", message=f"--landmarks must be a landmarks.npz file: {args.landmarks}")
+        return EXIT_USAGE
+    if args.overlay_video and not args.video:
+        reporter.event("error", message="--overlay-video needs --video")
+        return EXIT_USAGE
+
+    reporter.event("start", landmarks=args.landmarks)
+    outputs = {}
+    if args.skeleton_video:
+        reporter.stage("skeleton_video")
+        if args.width and args.height:
+            width, height = args.width, args.height
+        elif args.video:
+            width, height = video_size(args.video)
+        else:
+            reporter.event("error", message="--skeleton-video needs --video or --width and --height")
+            return EXIT_USAGE
+        outputs["skeleton_frames"] = render_skeleton_video(args.landmarks, args.skeleton_video, width, height)
+    if args.overlay_video:
+        reporter.stage("overlay_video")
+        outputs["overlay_frames"] = render_overlay_video(args.video, args.landmarks, args.overlay_video)
+
+    reporter.event("done", seconds=round(time.perf_counter() - reporter.start, 3), **outputs)
+    return EXIT_OK
+
+def run_live(args, reporter):
+    from video_processor import VideoProcessor
+    from landmark_smoothing import OneEuroFilter
+    from live_capture import LandmarkServer, LatestFrameGrabber, parse_source, stream_landmarks
+
+    metrics = Metrics()
+    processor = VideoProcessor(**pose_settings(args), metrics=metrics)
+    smoother = OneEuroFilter() if args.smooth else None
+    reporter.event("start", source=args.source, format=args.format)
+
+    server = None
+    latencies = []
+    processed = 0
+    start = last_report = time.perf_counter()
+    grabber = LatestFrameGrabber(parse_source(args.source), loop=args.loop, record_video=args.record_video)
+    try:
+        if args.port is not None:
+            server = LandmarkServer(args.host, args.port)
+            reporter.event("listening", host=server.address[0], port=server.address[1])
+        grabber.start()
+        stream = stream_landmarks(processor, grabber, args.format, inference_size=args.inference_size,
+                                  roi_padding=args.roi_padding, smoother=smoother,
+                                  record_landmarks=args.record_landmarks, max_frames=args.max_frames)
+        with contextlib.closing(stream):
+            for record in stream:
+                processed += 1
+                latencies.append(record["latency"])
+                if server is not None:
+                    server.publish(record)
+                if args.print_landmarks:
+                    # Nested: the record has its own capture "time"
+                    reporter.event("landmarks", record=record)
+
+                now = time.perf_counter()
+                if now - last_report >= reporter.interval:
+                    latencies.sort()
+                    reporter.event("live", frames=processed, fps=round(len(latencies) / (now - last_report), 2),
+                                   latency_p50=round(latencies[len(latencies) // 2], 4),
+                                   latency_p95=round(latencies[int(len(latencies) * 0.95)], 4),
+                                   dropped=grabber.dropped, clients=server.client_count if server else 0)
+                    latencies = []
+                    last_report = now
+                if args.duration and now - start >= args.duration:
+                    break
+    except KeyboardInterrupt:
+        # The usual way to end a live session
+        pass
+    finally:
+        grabber.stop()
+        if server is not None:
+            server.close()
+
+    outputs = {name: path for name, path in (("landmarks", args.record_landmarks), ("video", args.record_video)) if path}
+    reporter.event("done", frames=processed, dropped=grabber.dropped, seconds=round(time.perf_counter() - start, 3),
+                   latency=metrics.snapshot()["stages"].get("latency"), outputs=outputs)
+    return EXIT_OK
+
+def run_multi(args, reporter):
+    from batch_processor import create_output_dir
+    from multi_person import export_dancers, process_video_multi
+
+    if not os.path.isfile(args.video):
+        reporter.event("error", message=f"Video not found: {args.video}")
+        return EXIT_USAGE
+
+    output_dir = args.output_dir
+    if output_dir is None:
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        video_name = os.path.splitext(os.path.basename(args.video))[0]
+        output_dir = create_output_dir(os.path.join(f"output_{args.format}", f"{video_name}_{timestamp}"))
+
+    reporter.event("start", video=args.video, format=args.format, output_dir=output_dir)
+    reporter.stage("process")
+    dancers = process_video_multi(args.video, output_dir, args.format, max_people=args.max_people,
+                                  detect_every=args.detect_every, workers=args.workers,
+                                  pose_settings=pose_settings(args), crop_padding=args.crop_padding,
+                                  min_track_frames=args.min_track_frames, inference_size=args.inference_size,
+                                  progress=reporter.frames)
+    reporter.event("dancers", count=len(dancers), ids=[dancer["id"] for dancer in dancers])
+    reporter.stage(f"convert_{args.format}")
+    export_dancers(dancers, args.format, tolerance=args.keyframe_tolerance, workers=args.export_workers)
+
+    reporter.event("done", seconds=round(time.perf_counter() - reporter.start, 3), dancers=dancers,
+                   outputs={"manifest": os.path.join(output_dir, "dancers.json")})
+    return EXIT_OK
+
+def video_size(video_path):
+    import cv2
+    cap = cv2.VideoCapture(video_path)
+    try:
+        return int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    finally:
+        cap.release()
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Convert dance videos to Blender or Spine animations without the GUI. "
+                                                 "Progress is printed to stdout as JSON lines; other messages go to stderr.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--progress-interval", type=float, default=1.0, help="seconds between frame progress events")
+    common.add_argument("--profile", default=None, metavar="PATH", help="run under cProfile and dump the stats to PATH")
+
+    process = commands.add_parser("process", parents=[common], help="process one video: landmarks, visualizations and conversion")
+    process.add_argument("video")
+    add_pose_arguments(process)
+    process.add_argument("--output-dir", default=None, help="default: output_<format>/<name>_<timestamp>")
+    process.add_argument("--landmarks", default=None, help="landmark file (.npz or .json)")
+    process.add_argument("--overlay-video", default=None)
+    process.add_argument("--skeleton-video", default=None)
+    process.add_argument("--visualization-dir", default=None)
+    process.add_argument("--no-visualize", action="store_true", help="skip the landmark plots")
+    process.add_argument("--visualize-frames", type=int, default=3, help="number of evenly spaced frames to plot")
+    process.add_argument("--visualize-workers", type=int, default=1, help="processes rendering the plots")
+    process.add_argument("--visualize-grid", action="store_true", help="also plot the sampled frames in one keyframe grid")
+    process.add_argument("--visualize-animation", choices=("gif", "mp4"), default=None,
+                         help="also write an animated 3D skeleton")
+    process.add_argument("--animation-step", type=int, default=1, help="animate every Nth landmark frame")
+    process.add_argument("--spine-output", default=None, help="Spine JSON, or Spine's binary format for a .skel path")
+    process.add_argument("--blender-output", default=None, help="the .blend file the generated script saves")
+    process.add_argument("--metrics", default=None, metavar="PATH",
+                         help="write per-stage timings and counters: Prometheus text for .prom, JSON otherwise")
+    process.set_defaults(run=run_process)
+
+    batch = commands.add_parser("batch", parents=[common], help="process a directory or manifest of videos")
+    batch.add_argument("source", help="directory of videos, or a manifest (.json list or one path per line)")
+    add_pose_arguments(batch)
+    batch.add_argument("--output-root", default=".")
+    batch.add_argument("--workers", type=int, default=None)
+    batch.set_defaults(run=run_batch_command)
+
+    convert = commands.add_parser("convert", parents=[common], help="convert stored landmarks to Spine or Blender")
+    convert.add_argument("landmarks", help="landmark file (.npz or .json)")
+    convert.add_argument("--format", choices=OUTPUT_FORMATS, default="blender")
+    convert.add_argument("--output", default=None,
+                         help="Spine JSON (binary for a .skel path) or the .blend the generated script saves; "
+                              "default: next to the landmarks")
+    convert.add_argument("--keyframe-tolerance", type=float, default=None,
+                         help="drop keyframes that linear interpolation reproduces within this error")
+    convert.set_defaults(run=run_convert)
+
+    render = commands.add_parser("render", parents=[common], help="render overlay or skeleton videos from a stored landmarks.npz")
+    render.add_argument("landmarks")
+    render.add_argument("--video", default=None, help="source clip, for the overlay and the frame size")
+    render.add_argument("--overlay-video", default=None)
+    render.add_argument("--skeleton-video", default=None)
+    render.add_argument("--width", type=int, default=None)
+    render.add_argument("--height", type=int, default=None)
+    render.set_defaults(run=run_render)
+
+    live = commands.add_parser("live", parents=[common], help="track a camera or stream and push landmarks as they come")
+    live.add_argument("source", help="camera index (0 for the first), stream URL or video file")
+    live.add_argument("--format", choices=OUTPUT_FORMATS, default="spine", help="coordinate system of the streamed landmarks")
+    live.add_argument("--min-detection-confidence", type=float, default=0.5)
+    live.add_argument("--min-tracking-confidence", type=float, default=0.5)
+    live.add_argument("--model-complexity", type=int, choices=[0, 1, 2], default=1)
+    live.add_argument("--inference-size", type=int, default=None,
+                      help="downscale frames so the longer side is at most this many pixels for pose inference")
+    live.add_argument("--roi-padding", type=float, default=None,
+                      help="run inference on a crop around the previous pose, padded by this fraction of its size")
+    live.add_argument("--smooth", action="store_true", help="One-Euro filter the streamed landmarks")
+    live.add_argument("--host", default="127.0.0.1")
+    live.add_argument("--port", type=int, default=8765,
+                      help="serve landmarks as JSON lines over TCP or WebSocket messages here")
+    live.add_argument("--no-server", dest="port", action="store_const", const=None, help="don't open a socket")
+    live.add_argument("--print-landmarks", action="store_true", help="also write every record to stdout")
+    live.add_argument("--loop", action="store_true", help="loop a video file source, for testing")
+    live.add_argument("--record-landmarks", default=None, help="save the session's raw landmarks (.npz or .json)")
+    live.add_argument("--record-video", default=None, help="save every captured frame to this .mp4")
+    live.add_argument("--max-frames", type=int, default=None, help="stop after processing this many frames")
+    live.add_argument("--duration", type=float, default=None, help="stop after this many seconds")
+    live.set_defaults(run=run_live)
+
+    multi = commands.add_parser("multi", parents=[common], help="track every dancer in a video and export one animation each")
+    multi.add_argument("video")
+    multi.add_argument("--format", choices=OUTPUT_FORMATS, default="blender")
+    multi.add_argument("--min-detection-confidence", type=float, default=0.5)
+    multi.add_argument("--min-tracking-confidence", type=float, default=0.5)
+    multi.add_argument("--model-complexity", type=int, choices=[0, 1, 2], default=1)
+    multi.add_argument("--inference-size", type=int, default=None,
+                       help="downscale each dancer's crop so the longer side is at most this many pixels")
+    multi.add_argument("--keyframe-tolerance", type=float, default=None,
+                       help="drop keyframes that linear interpolation reproduces within this error")
+    multi.add_argument("--output-dir", default=None, help="default: output_<format>/<name>_<timestamp>")
+    multi.add_argument("--max-people", type=int, default=8, help="most dancers tracked at once")
+    multi.add_argument("--detect-every", type=int, default=10,
+                       help="look for new dancers every Nth frame; tracks follow their pose in between")
+    multi.add_argument("--crop-padding", type=float, default=0.25,
+                       help="pad each dancer's box by this fraction of its size for pose inference")
+    multi.add_argument("--min-track-frames", type=int, default=15,
+                       help="drop dancers with fewer frames with a pose than this")
+    multi.add_argument("--workers", type=int, default=None, help="threads running the dancers' pose trackers")
+    multi.add_argument("--export-workers", type=int, default=None, help="processes converting the dancers")
+    multi.set_defaults(run=run_multi)
+    return parser
+
+@contextlib.contextmanager
+def stdout_to_stderr():
+    # Yields a stream on the original stdout and points file descriptor 1 at
+    # stderr meanwhile, so prints from this process, batch worker processes
+    # and native libraries can't interleave with the progress events
+    try:
+        stdout_fd = sys.stdout.fileno()
+    except (AttributeError, io.UnsupportedOperation):
+        # No real file descriptor (e.g. captured output): redirect Python prints only
+        events = sys.stdout
+        with contextlib.redirect_stdout(sys.stderr):
+            yield events
+        return
+
+    sys.stdout.flush()
+    saved_fd = os.dup(stdout_fd)
+    events = os.fdopen(os.dup(saved_fd), "w")
+    os.dup2(sys.stderr.fileno(), stdout_fd)
+    try:
+        yield events
+    finally:
+        sys.stdout.flush()
+        os.dup2(saved_fd, stdout_fd)
+        os.close(saved_fd)
+        events.close()
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    # Keep stdout machine-readable: everything the pipeline prints goes to stderr
+    with stdout_to_stderr() as events, profiling(args.profile) if args.profile else contextlib.nullcontext():
+        reporter = ProgressReporter(events, args.progress_interval)
+        try:
+            return args.run(args, reporter)
+        except KeyboardInterrupt:
+            reporter.event("error", message="Interrupted")
+            return EXIT_INTERRUPTED
+        except Exception as e:
+            reporter.event("error", message=str(e), type=type(e).__name__)
+            return EXIT_FAILED
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,23 +1,34 @@
 import os
+import queue
+import threading
+import time
 import tkinter as tk
-import datetime
 from tkinter import filedialog, messagebox, ttk
-from video_processor import VideoProcessor
-from spine_converter import convert_to_spine
-from blender_converter import generate_blender_script
-from landmark_visualizer import visualize_landmarks
+
+# cv2, MediaPipe, matplotlib and the converters are imported on first use, so
+# the window opens without waiting for them. batch_processor itself is light.
+from batch_processor import convert_video, find_videos, print_summary, run_batch, write_summary
+from landmark_checkpoint import DEFAULT_CHECKPOINT_DIR
 
 class VideoConverterGUI:
+    # All processing runs on one background worker thread, which reports back
+    # through self.messages; the Tk thread polls that queue with after() and is
+    # the only thread that touches widgets.
+    POLL_MS = 100
+
     def __init__(self, master):
         self.master = master
         master.title("Video to Animation Converter")
-        master.geometry("400x300")
+        master.geometry("460x590")
 
-        self.label = tk.Label(master, text="Select a video file to process:")
+        self.label = tk.Label(master, text="Select video files to process:")
         self.label.pack(pady=10)
 
-        self.select_button = tk.Button(master, text="Select Video", command=self.select_file)
-        self.select_button.pack(pady=10)
+        self.select_button = tk.Button(master, text="Add Videos...", command=self.select_file)
+        self.select_button.pack(pady=5)
+
+        self.queue_list = tk.Listbox(master, height=6, width=60)
+        self.queue_list.pack(pady=5, padx=10)
 
         self.conversion_type = tk.StringVar(value="blender")
         self.radio_frame = ttk.Frame(master)
@@ -29,72 +40,251 @@ class VideoConverterGUI:
         self.spine_radio = ttk.Radiobutton(self.radio_frame, text="Spine", variable=self.conversion_type, value="spine")
         self.spine_radio.pack(side=tk.LEFT, padx=10)
 
-        self.process_button = tk.Button(master, text="Process Video", command=self.process_video, state=tk.DISABLED)
-        self.process_button.pack(pady=10)
+        self.json_export = tk.BooleanVar(value=False)
+        self.json_check = ttk.Checkbutton(master, text="Also export landmarks.json", variable=self.json_export)
+        self.json_check.pack()
+
+        # Offline clips get the zero-phase filter
+        self.smooth = tk.BooleanVar(value=False)
+        self.smooth_check = ttk.Checkbutton(master, text="Smooth landmark jitter", variable=self.smooth)
+        self.smooth_check.pack()
+
+        self.button_frame = ttk.Frame(master)
+        self.button_frame.pack(pady=10)
+
+        self.process_button = tk.Button(self.button_frame, text="Process Videos", command=self.process_video, state=tk.DISABLED)
+        self.process_button.pack(side=tk.LEFT, padx=5)
+
+        self.batch_button = tk.Button(self.button_frame, text="Process Folder...", command=self.process_folder)
+        self.batch_button.pack(side=tk.LEFT, padx=5)
+
+        self.cancel_button = tk.Button(self.button_frame, text="Cancel", command=self.cancel, state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.LEFT, padx=5)
+
+        self.progress = ttk.Progressbar(master, orient=tk.HORIZONTAL, length=400, mode="determinate")
+        self.progress.pack(pady=10)
+
+        self.rate_label = tk.Label(master, text="")
+        self.rate_label.pack()
 
-        self.status_label = tk.Label(master, text="")
+        self.status_label = tk.Label(master, text="", wraplength=420)
         self.status_label.pack(pady=10)
 
-        self.input_video = None
+        # Selected videos (the listbox shows their names), the jobs waiting for
+        # the worker and the results of the current run
+        self.selected_videos = []
+        self.pending = queue.Queue()
+        self.results = []
+        self.messages = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.worker = None
+        # Built once by a warm-up thread started after the window is up, then
+        # reused; the lock makes the worker wait for a warm-up in progress
+        self.processor = None
+        self.cache = None
+        self.processor_lock = threading.Lock()
+
+        self.master.after(self.POLL_MS, self.poll_messages)
+        self.master.after_idle(self.warm_up)
+
+    def warm_up(self):
+        threading.Thread(target=self._load_processor, name="warm-up", daemon=True).start()
+
+    def _load_processor(self):
+        with self.processor_lock:
+            if self.processor is not None:
+                return self.processor
+            try:
+                from video_processor import VideoProcessor
+                from landmark_cache import LandmarkCache
+                self.processor = VideoProcessor()
+                self.cache = LandmarkCache()
+            except Exception as e:
+                # Surfaced again when a job needs the processor
+                self.messages.put(("status", f"Could not load the pose model: {e}"))
+                raise
+            return self.processor
 
     def select_file(self):
-        self.input_video = filedialog.askopenfilename(filetypes=[("Video files", "*.mp4 *.avi *.mov")])
-        if self.input_video:
-            self.status_label.config(text=f"Selected: {os.path.basename(self.input_video)}")
+        videos = filedialog.askopenfilenames(filetypes=[("Video files", "*.mp4 *.avi *.mov")])
+        for video in videos:
+            self.selected_videos.append(video)
+            self.queue_list.insert(tk.END, os.path.basename(video))
+        if videos:
+            self.status_label.config(text=f"Queued: {len(videos)} video(s)")
             self.process_button.config(state=tk.NORMAL)
 
     def process_video(self):
-        if not self.input_video:
+        if not self.selected_videos:
             messagebox.showerror("Error", "No video file selected.")
             return
 
-        # Create timestamped output directory
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        video_name = os.path.splitext(os.path.basename(self.input_video))[0]
-        
-        output_format = self.conversion_type.get()
-        base_output_dir = f"output_{output_format}"
-        output_dir = os.path.join(base_output_dir, f"{video_name}_{timestamp}")
-        os.makedirs(output_dir, exist_ok=True)
-
-        # Define output paths
-        landmarks_output = os.path.join(output_dir, "landmarks.json")
-        overlay_video_output = os.path.join(output_dir, "overlay_video.mp4")
-        skeleton_video_output = os.path.join(output_dir, "skeleton_video.mp4")
-
-        # Process video
-        self.status_label.config(text="Processing video...")
-        self.master.update()
-        
-        processor = VideoProcessor()
+        # Videos added while the worker is busy are picked up after the current
+        # one, with the settings chosen when they were queued
+        output_format, json_export, smoothing = self._job_settings()
+        for video in self.selected_videos:
+            self.pending.put(("video", video, output_format, json_export, smoothing))
+        self.selected_videos = []
+        self.queue_list.delete(0, tk.END)
+        self.process_button.config(state=tk.DISABLED)
+        self._start_worker()
+
+    def process_folder(self):
+        folder = filedialog.askdirectory(title="Select a folder of videos")
+        if not folder:
+            return
+
+        videos = find_videos(folder)
+        if not videos:
+            messagebox.showerror("Error", "No video files found in the selected folder.")
+            return
+
+        self.pending.put(("batch", videos, *self._job_settings()))
+        self._start_worker()
+
+    def cancel(self):
+        # Stops the current video (or the clips of a batch that haven't
+        # started); videos queued after it still run
+        self.cancel_event.set()
+        self.cancel_button.config(state=tk.DISABLED)
+        self.set_status("Cancelling...")
+
+    def set_status(self, text):
+        self.status_label.config(text=text)
+
+    def _job_settings(self):
+        # Output format, JSON export and smoothing for a job, read from the
+        # widgets on the Tk thread when the job is queued
+        smoothing = "savgol" if self.smooth.get() else None
+        return self.conversion_type.get(), self.json_export.get(), smoothing
+
+    def _start_worker(self):
+        if self.worker is not None and self.worker.is_alive():
+            return
+        self.results = []
+        self.worker = threading.Thread(target=self._work, name="converter", daemon=True)
+        self.worker.start()
+
+    def _work(self):
+        # Worker thread: never touches Tk, only posts (kind, payload) messages
+        from video_processor import ProcessingCancelled
+        post = self.messages.put
+        while True:
+            try:
+                kind, item, output_format, json_export, smoothing = self.pending.get_nowait()
+            except queue.Empty:
+                post(("idle", None))
+                return
+
+            self.cancel_event.clear()
+            post(("started", kind))
+            try:
+                if kind == "video":
+                    result = self._convert(item, output_format, json_export, smoothing)
+                else:
+                    result = self._batch(item, output_format, json_export, smoothing)
+                post(("done", (output_format, result)))
+            except ProcessingCancelled:
+                post(("cancelled", item if kind == "video" else "batch"))
+            except Exception as e:
+                post(("error", (item if kind == "video" else "batch", str(e))))
+
+    def _convert(self, video_path, output_format, json_export, smoothing):
+        if self.processor is None:
+            self.messages.put(("status", "Loading pose model..."))
+        processor = self._load_processor()
+
+        name = os.path.basename(video_path)
+        start = time.perf_counter()
+        last_report = [0.0]
+
+        def progress(frames_read, frame_count):
+            now = time.perf_counter()
+            if now - last_report[0] >= self.POLL_MS / 1000 or frames_read == frame_count:
+                last_report[0] = now
+                seconds = now - start
+                rate = f"{frames_read / seconds:.1f} frames/sec" if seconds else ""
+                self.messages.put(("progress", (frames_read, frame_count, f"{frames_read}/{frame_count} frames  {rate}")))
+
+        def status(text):
+            self.messages.put(("status", f"{name}: {text}"))
+
+        return convert_video(processor, video_path, output_format, status=status, cache=self.cache,
+                             json_export=json_export, progress=progress, cancel=self.cancel_event,
+                             checkpoint_dir=DEFAULT_CHECKPOINT_DIR, smoothing=smoothing)
+
+    def _batch(self, videos, output_format, json_export, smoothing):
+        done = []
+
+        def on_result(result):
+            done.append(result)
+            self.messages.put(("progress", (len(done), len(videos), f"{len(done)}/{len(videos)} videos")))
+            self.messages.put(("status", f"Processed {len(done)}/{len(videos)}: {os.path.basename(result['video'])}"))
+
+        self.messages.put(("status", f"Processing {len(videos)} videos..."))
+        summary = run_batch(videos, output_format, on_result=on_result, json_export=json_export, cancel=self.cancel_event,
+                            smoothing=smoothing)
+        print_summary(summary)
+        summary["summary_path"] = write_summary(summary)
+        return summary
+
+    def poll_messages(self):
         try:
-            processor.process_video(self.input_video, landmarks_output, overlay_video_output, skeleton_video_output, output_format)
-            self.status_label.config(text="Video processing complete.")
-            self.master.update()
-        except Exception as e:
-            messagebox.showerror("Error", f"Error processing video: {e}")
+            while True:
+                kind, payload = self.messages.get_nowait()
+                self._handle(kind, payload)
+        except queue.Empty:
+            pass
+        self.master.after(self.POLL_MS, self.poll_messages)
+
+    def _handle(self, kind, payload):
+        if kind == "status":
+            self.set_status(payload)
+        elif kind == "started":
+            self.cancel_button.config(state=tk.NORMAL)
+            self.progress.config(value=0, maximum=1)
+            self.rate_label.config(text="")
+        elif kind == "progress":
+            done, total, text = payload
+            self.progress.config(maximum=max(total, done, 1), value=done)
+            self.rate_label.config(text=text)
+        elif kind == "done":
+            self.results.append(payload)
+            _, result = payload
+            self.set_status(f"Finished: {os.path.basename(result.get('video', result.get('summary_path', '')))}")
+        elif kind == "cancelled":
+            self.set_status(f"Cancelled: {os.path.basename(payload)}")
+        elif kind == "error":
+            video, message = payload
+            messagebox.showerror("Error", f"Error processing {os.path.basename(video)}: {message}")
+        elif kind == "idle":
+            self.cancel_button.config(state=tk.DISABLED)
+            self._show_results()
+            if not self.pending.empty():
+                # Queued just as the worker was finishing
+                self._start_worker()
+
+    def _show_results(self):
+        # self.results holds the (output format, result) of each finished job
+        results, self.results = self.results, []
+        if not results:
+            self.set_status("Stopped.")
             return
 
-        # Visualize landmarks
-        self.status_label.config(text="Generating landmark visualizations...")
-        self.master.update()
-        visualize_landmarks(landmarks_output, output_dir)
-
-        # Convert based on selected type
-        self.status_label.config(text=f"Converting to {output_format} format...")
-        self.master.update()
-        
-        if output_format == "spine":
-            spine_output = os.path.join(output_dir, "spine_animation.json")
-            convert_to_spine(landmarks_output, spine_output)
-            self.status_label.config(text="Spine conversion complete!")
+        output_format, last = results[-1]
+        if "clips" in last:
+            messagebox.showinfo(
+                "Batch Complete",
+                f"Processed {len(last['clips'])} videos ({last['failed']} failed) "
+                f"at {last['fps']:.1f} frames/sec.\nSummary saved to: {last['summary_path']}"
+            )
+        elif output_format == "spine":
+            self.set_status("Spine conversion complete!")
         else:  # Blender
-            blender_script = os.path.join(output_dir, "blender_conversion_script.py")
-            blender_output = os.path.join(output_dir, "blender_animation.blend")
-            script_path = generate_blender_script(landmarks_output, blender_output)
-            self.status_label.config(text="Blender script generated. Please run it in Blender.")
+            script_path = last["blender_script"]
+            self.set_status("Blender script generated. Please run it in Blender.")
             instructions = (
-                f"A Blender script has been generated at {blender_script}.\n\n"
+                f"A Blender script has been generated at {script_path}.\n\n"
                 "To use this script:\n"
                 "1. Open Blender\n"
                 "2. Go to Scripting workspace\n"
@@ -106,8 +296,10 @@ class VideoConverterGUI:
             )
             messagebox.showinfo("Blender Conversion Instructions", instructions)
 
-        self.status_label.config(text="Process complete!")
-        messagebox.showinfo("Success", f"Processing complete!\nOutputs saved in: {output_dir}")
+        output_dirs = [result["output_dir"] for _, result in results if "output_dir" in result]
+        self.set_status("Process complete!")
+        if output_dirs:
+            messagebox.showinfo("Success", "Processing complete!\nOutputs saved in:\n" + "\n".join(output_dirs))
 
 def main():
     root = tk.Tk()
@@ -115,4 +307,4 @@ def main():
     root.mainloop()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
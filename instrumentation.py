@@ -0,0 +1,207 @@
+import bisect
+import contextlib
+import cProfile
+import json
+import math
+import time
+
+# Latency histogram bucket upper bounds in seconds, Prometheus style
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+class Histogram:
+    # Count, sum, min, max and bucket counts of observed values; quantiles are
+    # estimated as the upper bound of the bucket they fall in
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def observe(self, value):
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, self.bucket_counts):
+            cumulative += bucket_count
+            if cumulative >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def snapshot(self):
+        cumulative = 0
+        buckets = {}
+        for bound, bucket_count in zip(self.buckets + (math.inf,), self.bucket_counts):
+            cumulative += bucket_count
+            buckets["+Inf" if bound == math.inf else repr(bound)] = cumulative
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "mean": self.total / self.count if self.count else None,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": buckets,
+        }
+
+class _Timer:
+    # Context manager that adds the time spent in its block to a stage. One
+    # object per stage is reused, so it is not for nested or concurrent use.
+    __slots__ = ("metrics", "name", "histogram", "start")
+
+    def __init__(self, metrics, name, histogram):
+        self.metrics = metrics
+        self.name = name
+        self.histogram = histogram
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.start
+        self.histogram.observe(seconds)
+        if self.metrics.listeners:
+            self.metrics._notify("timer", self.name, seconds)
+        return False
+
+class Metrics:
+    # Per-stage latency histograms and event counters for the processing
+    # pipeline. Listeners are called as listener(kind, name, value) for every
+    # timing ("timer", seconds) and count ("counter", increment), e.g. to feed
+    # a live dashboard; export with to_json or to_prometheus.
+    enabled = True
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, listeners=None):
+        self.buckets = buckets
+        self.listeners = list(listeners or [])
+        self.timers = {}
+        self.counters = {}
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def _notify(self, kind, name, value):
+        for listener in self.listeners:
+            listener(kind, name, value)
+
+    def timer(self, name):
+        timer = self.timers.get(name)
+        if timer is None:
+            timer = self.timers[name] = _Timer(self, name, Histogram(self.buckets))
+        return timer
+
+    def observe(self, name, seconds):
+        # For durations measured elsewhere
+        self.timer(name).histogram.observe(seconds)
+        if self.listeners:
+            self._notify("timer", name, seconds)
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+        if self.listeners:
+            self._notify("counter", name, value)
+
+    def reset(self):
+        self.timers.clear()
+        self.counters.clear()
+
+    def snapshot(self):
+        return {
+            "stages": {name: timer.histogram.snapshot() for name, timer in sorted(self.timers.items())},
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+    def to_json(self, indent=2):
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def to_prometheus(self, prefix="dance_emotes"):
+        # Prometheus text exposition format: one histogram labelled by stage,
+        # one counter per event
+        lines = []
+        if self.timers:
+            metric = f"{prefix}_stage_seconds"
+            lines.append(f"# HELP {metric} Time spent per call in each pipeline stage.")
+            lines.append(f"# TYPE {metric} histogram")
+            for name, timer in sorted(self.timers.items()):
+                histogram = timer.histogram
+                for bound, cumulative in histogram.snapshot()["buckets"].items():
+                    lines.append(f'{metric}_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_sum{{stage="{name}"}} {histogram.total!r}')
+                lines.append(f'{metric}_count{{stage="{name}"}} {histogram.count}')
+        for name, value in sorted(self.counters.items()):
+            metric = f"{prefix}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        # Prometheus text for .prom/.txt paths, JSON otherwise
+        with open(path, 'w') as f:
+            f.write(self.to_prometheus() if path.endswith((".prom", ".txt")) else self.to_json())
+        return path
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+class NullMetrics:
+    # Metrics that record nothing: the default, so the instrumentation points
+    # cost a method call and an empty with-block when metrics are off
+    enabled = False
+    _timer = _NullTimer()
+
+    def timer(self, name):
+        return self._timer
+
+    def observe(self, name, seconds):
+        pass
+
+    def count(self, name, value=1):
+        pass
+
+    def snapshot(self):
+        return {"stages": {}, "counters": {}}
+
+NULL_METRICS = NullMetrics()
+
+@contextlib.contextmanager
+def profiling(path=None):
+    # cProfile over the block, dumped to path for pstats or snakeviz. For
+    # sampling instead, run the CLI under py-spy (py-spy record -o out.svg --
+    # python cli.py process ...); the pipeline stages are named functions,
+    # so they show up in its flame graphs without this.
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        if path:
+            profiler.dump_stats(path)
+
+# Usage
+# metrics = Metrics(listeners=[lambda kind, name, value: print(kind, name, value)])
+# processor = VideoProcessor(metrics=metrics)
+# processor.process_video("dance.mp4", "landmarks.npz", None, None, "blender")
+# print(metrics.snapshot()["stages"]["pose"]["p95"])
+# metrics.write("metrics.prom")
@@ -0,0 +1,31 @@
+import numpy as np
+
+def simplify_keyframes(times, values, tolerance):
+    # Ramer-Douglas-Peucker over one animation channel (or several channels that
+    # share keys, e.g. x/y or a quaternion). Returns a boolean mask of the keys to
+    # keep so that linear interpolation between them stays within tolerance of
+    # every dropped key, measured per component at the dropped key's time.
+    times = np.asarray(times, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64).reshape(len(times), -1)
+    keep = np.zeros(len(times), dtype=bool)
+    if len(times) == 0:
+        return keep
+    keep[0] = keep[-1] = True
+
+    stack = [(0, len(times) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        span = times[end] - times[start]
+        weights = (times[start + 1:end] - times[start]) / span if span else np.zeros(end - start - 1)
+        interpolated = values[start] + weights[:, None] * (values[end] - values[start])
+        errors = np.abs(values[start + 1:end] - interpolated).max(axis=1)
+        worst = int(np.argmax(errors))
+        if errors[worst] > tolerance:
+            split = start + 1 + worst
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+
+    return keep
@@ -0,0 +1,79 @@
+import hashlib
+import json
+import os
+import zipfile
+
+import numpy as np
+
+from landmarks import load_landmark_array, save_landmark_array
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")),
+    "dance_emotes", "landmarks"
+)
+DEFAULT_MAX_BYTES = 1024 ** 3
+
+def hash_file(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class LandmarkCache:
+    # Raw, format-neutral landmarks keyed by video content and Pose settings, so
+    # re-exporting a clip to another format skips pose inference entirely.
+    # Entries are evicted least-recently-used first once max_bytes is exceeded.
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, video_path, pose_settings):
+        settings = json.dumps(pose_settings, sort_keys=True)
+        return hashlib.sha256(f"{hash_file(video_path)}:{settings}".encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            fps, frame_numbers, raw, _ = load_landmark_array(path, mmap=False)
+            with np.load(path) as data:
+                frames_read = int(data["frames_read"])
+        except (FileNotFoundError, KeyError, ValueError, zipfile.BadZipFile):
+            return None
+        # Mark as recently used
+        os.utime(path)
+        return {"fps": fps, "frames_read": frames_read, "frame_numbers": frame_numbers, "landmarks": raw}
+
+    def put(self, key, entry):
+        path = self._path(key)
+        # np.savez appends .npz to names without it, so the temp name keeps it
+        tmp_path = f"{path[:-4]}.{os.getpid()}.tmp.npz"
+        save_landmark_array(tmp_path, entry["fps"], entry["frame_numbers"], entry["landmarks"], frames_read=entry["frames_read"])
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".npz") or name.endswith(".tmp.npz"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from landmark_cache import DEFAULT_CACHE_DIR
+from landmarks import LANDMARK_COUNT
+
+DEFAULT_CHECKPOINT_DIR = os.path.join(os.path.dirname(DEFAULT_CACHE_DIR), "checkpoints")
+DEFAULT_CHECKPOINT_INTERVAL = 300
+
+def checkpoint_header(video_path, settings):
+    # What a checkpoint must match to be resumed: the same file, unchanged,
+    # processed with the same settings
+    stat = os.stat(video_path)
+    return {"video": os.path.abspath(video_path), "size": stat.st_size, "mtime": stat.st_mtime, "settings": settings}
+
+def open_checkpoint(checkpoint_dir, video_path, settings):
+    # The checkpoint for this video and settings in checkpoint_dir, so a rerun
+    # finds it even when its outputs go to a new timestamped directory
+    header = checkpoint_header(video_path, settings)
+    key = hashlib.sha256(json.dumps(header, sort_keys=True).encode()).hexdigest()[:16]
+    video_name = os.path.splitext(os.path.basename(video_path))[0]
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    return LandmarkCheckpoint(os.path.join(checkpoint_dir, f"{video_name}_{key}.jsonl"), header)
+
+class LandmarkCheckpoint:
+    # Landmarks of an unfinished process_video run, appended to a JSON-lines
+    # file while it goes: a header line, then one line per chunk of raw
+    # detections with the frame to resume from after it and the frame the
+    # next inference was due on. A line cut short by a crash is dropped on
+    # load, and a header that doesn't match starts over.
+    def __init__(self, path, header):
+        self.path = path
+        # Round-tripped so it compares equal to the one read back
+        self.header = json.loads(json.dumps(header))
+        self.frame_numbers = np.empty(0, dtype=np.int32)
+        self.landmarks = np.empty((0, LANDMARK_COUNT, 4), dtype=np.float32)
+        self.resume_frame = 0
+        self.next_inference = 0
+
+    def load(self):
+        # True if there is progress to resume from; otherwise the file is
+        # started afresh with just the header
+        chunks = []
+        valid_bytes = 0
+        try:
+            with open(self.path, 'rb') as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            lines = []
+
+        for i, line in enumerate(lines):
+            if not line.endswith(b"\n"):
+                break
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            if i == 0:
+                if record != self.header:
+                    break
+            else:
+                chunks.append(record)
+            valid_bytes += len(line)
+
+        if not chunks:
+            self.start()
+            return False
+
+        # Cut off a partial last line so appends start on a fresh one
+        with open(self.path, 'r+b') as f:
+            f.truncate(valid_bytes)
+
+        self.frame_numbers = np.array([frame for chunk in chunks for frame in chunk["frames"]], dtype=np.int32)
+        self.landmarks = np.array([values for chunk in chunks for values in chunk["landmarks"]],
+                                  dtype=np.float32).reshape(-1, LANDMARK_COUNT, 4)
+        self.resume_frame = chunks[-1]["resume_frame"]
+        self.next_inference = chunks[-1].get("next_inference", self.resume_frame)
+        return True
+
+    def start(self):
+        with open(self.path, 'w') as f:
+            f.write(json.dumps(self.header) + "\n")
+
+    def append(self, frame_numbers, landmarks, resume_frame, next_inference=None):
+        # One chunk of detections; every frame before resume_frame is then
+        # accounted for. next_inference (default resume_frame) keeps a strided
+        # run on the same frames when it resumes. float32 values survive the
+        # JSON round trip exactly.
+        record = {
+            "frames": [int(frame) for frame in frame_numbers],
+            "landmarks": np.asarray(landmarks, dtype=np.float32).reshape(-1, LANDMARK_COUNT * 4).tolist(),
+            "resume_frame": int(resume_frame),
+            "next_inference": int(resume_frame if next_inference is None else next_inference),
+        }
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.resume_frame = resume_frame
+        self.next_inference = record["next_inference"]
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+# Usage
+# checkpoint = open_checkpoint("checkpoints", "dance.mp4", {"model_complexity": 1})
+# if checkpoint.load():
+#     print(f"Resuming at frame {checkpoint.resume_frame}")
+# checkpoint.append(frame_numbers, landmarks, resume_frame=300)
@@ -0,0 +1,151 @@
+import math
+
+import numpy as np
+
+SMOOTHING_METHODS = ("one_euro", "savgol")
+
+def visibility_weights(values, min_weight=0.05):
+    # Per-landmark trust from the visibility channel, floored so a landmark
+    # that is never visible still gets smoothed rather than frozen
+    values = np.asarray(values)
+    if values.shape[-1] < 4:
+        return np.ones(values.shape[:-1])
+    return np.clip(values[..., 3], min_weight, 1.0)
+
+class OneEuroFilter:
+    # Streaming One-Euro filter (Casiez et al.) over one frame's landmarks at a
+    # time, for live use. Each coordinate is low-pass filtered with a cutoff
+    # that rises with its speed, so slow jitter is removed while fast moves
+    # keep little lag. The step towards a new value is scaled by the
+    # landmark's visibility, so occluded points mostly hold still.
+    # Visibility is passed through unfiltered.
+    def __init__(self, min_cutoff=1.0, beta=10.0, d_cutoff=1.0, min_weight=0.05):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.min_weight = min_weight
+        self.reset()
+
+    def reset(self):
+        self.t = None
+        self.x = None
+        self.dx = None
+
+    @staticmethod
+    def _alpha(cutoff, dt):
+        tau = 1.0 / (2 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def __call__(self, t, values):
+        # values: 33 x 4 (x, y, z, visibility) at time t in seconds
+        values = np.asarray(values, dtype=np.float64)
+        out = values.copy()
+        x = values[:, :3]
+        if self.x is None or t <= self.t:
+            self.t, self.x, self.dx = t, x.copy(), np.zeros_like(x)
+            return out
+
+        dt = t - self.t
+        weight = visibility_weights(values, self.min_weight)[:, None]
+        self.dx += self._alpha(self.d_cutoff, dt) * ((x - self.x) / dt - self.dx)
+        cutoff = self.min_cutoff + self.beta * np.abs(self.dx)
+        self.x += self._alpha(cutoff, dt) * weight * (x - self.x)
+        self.t = t
+        out[:, :3] = self.x
+        return out
+
+def one_euro_smooth(frame_numbers, raw, fps, min_cutoff=1.0, beta=10.0, d_cutoff=1.0, min_weight=0.05):
+    # OneEuroFilter run over a whole clip; frame gaps give longer time steps
+    smoothed = np.array(raw, dtype=np.float32)
+    euro = OneEuroFilter(min_cutoff, beta, d_cutoff, min_weight)
+    for i, frame_num in enumerate(np.asarray(frame_numbers).tolist()):
+        smoothed[i] = euro(frame_num / fps, raw[i])
+    return smoothed
+
+def savgol_smooth(frame_numbers, raw, window=9, order=2, min_weight=0.05):
+    # Zero-phase Savitzky-Golay smoothing for offline use: each value is
+    # replaced by a weighted least-squares polynomial of the given order fitted
+    # to the frames at most window // 2 frame numbers either side, weighted by
+    # visibility. The weights make the fit differ per point, so instead of one
+    # convolution kernel the normal equations are built for every frame and
+    # landmark at once, one window offset at a time, and solved as a batch.
+    # Frames missing from frame_numbers are simply not in the fit, and the
+    # clip ends use the one-sided windows they have. A point with fewer
+    # samples in its window than the fit has coefficients (an isolated
+    # detection, a clip of a frame or two) is fitted with the highest order
+    # its samples support, which for a single sample keeps its own value.
+    half = window // 2
+    if half < order:
+        raise ValueError(f"A window of {window} frames is too short for order {order} smoothing")
+
+    raw = np.asarray(raw)
+    frame_numbers = np.asarray(frame_numbers, dtype=np.int64)
+    count = len(raw)
+    smoothed = np.array(raw, dtype=np.float32)
+    if count == 0:
+        return smoothed
+
+    xyz = raw[..., :3].astype(np.float64)
+    weights = visibility_weights(raw, min_weight).astype(np.float64)
+    weighted = xyz * weights[..., None]
+
+    # moments[m] = sum of w * k^m and rhs[m] = sum of w * y * k^m over the
+    # window, with the offset k scaled to [-1, 1] to keep them well conditioned
+    moments = np.zeros((2 * order + 1,) + weights.shape)
+    rhs = np.zeros((order + 1,) + xyz.shape)
+    samples = np.zeros(weights.shape, dtype=np.int64)
+    index = np.arange(count)
+    for shift in range(-half, half + 1):
+        neighbour = index + shift
+        inside = (neighbour >= 0) & (neighbour < count)
+        neighbour = np.clip(neighbour, 0, count - 1)
+        offset = (frame_numbers[neighbour] - frame_numbers) / half
+        inside &= np.abs(offset) <= 1
+        w = np.where(inside[:, None], weights[neighbour], 0.0)
+        wy = np.where(inside[:, None, None], weighted[neighbour], 0.0)
+        samples += w > 0
+        power = np.ones(count)
+        for m in range(2 * order + 1):
+            moments[m] += w * power[:, None]
+            if m <= order:
+                rhs[m] += wy * power[:, None, None]
+            power = power * offset
+
+    # Hankel normal matrix per frame and landmark; the fitted polynomial's
+    # constant term is the smoothed value at the frame itself. Its leading
+    # blocks are the normal matrices of the lower orders.
+    normal = np.stack([np.stack([moments[i + j] for j in range(order + 1)], axis=-1) for i in range(order + 1)], axis=-2)
+    rhs = np.moveaxis(rhs, 0, -2)
+    fit_order = np.minimum(order, samples - 1)
+    if (fit_order == order).all():
+        smoothed[..., :3] = _solve_normal(normal, rhs)[..., 0, :]
+        return smoothed
+    # Points with no weighted sample at all keep their raw value
+    for fit in range(order + 1):
+        points = fit_order == fit
+        if points.any():
+            smoothed[..., :3][points] = _solve_normal(normal[points][:, :fit + 1, :fit + 1], rhs[points][:, :fit + 1])[:, 0]
+    return smoothed
+
+def _solve_normal(normal, rhs):
+    # Batched solve of normal equations; the pseudo-inverse if any of them is
+    # still singular, e.g. samples whose weights underflow
+    try:
+        return np.linalg.solve(normal, rhs)
+    except np.linalg.LinAlgError:
+        return np.linalg.pinv(normal) @ rhs
+
+def smooth_landmarks(frame_numbers, raw, fps, method, **options):
+    # raw frames x 33 x 4 landmarks smoothed with one of SMOOTHING_METHODS
+    if method == "one_euro":
+        return one_euro_smooth(frame_numbers, raw, fps, **options)
+    elif method == "savgol":
+        return savgol_smooth(frame_numbers, raw, **options)
+    else:
+        raise ValueError(f"Unsupported smoothing method: {method}")
+
+# Usage
+# smoothed = smooth_landmarks(frame_numbers, raw, fps, "savgol", window=9, order=2)
+# euro = OneEuroFilter(min_cutoff=1.0, beta=10.0)
+# for t, values in live_landmarks:
+#     values = euro(t, values)
@@ -1,45 +1,202 @@
-import json
-import matplotlib.pyplot as plt
-from mpl_toolkits.mplot3d import Axes3D
+import multiprocessing
 import os
+from concurrent.futures import ProcessPoolExecutor
 
-def visualize_landmarks(landmarks_file, output_dir):
-    # Load the landmark data
-    with open(landmarks_file, 'r') as f:
-        data = json.load(f)
+import cv2
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from mpl_toolkits.mplot3d.art3d import Line3DCollection
+
+from landmarks import open_landmarks
+from skeleton_renderer import POSE_CONNECTIONS
+
+CONNECTIONS = np.array(POSE_CONNECTIONS, dtype=np.intp)
+
+def sample_indices(count, samples):
+    # Up to samples evenly spaced frame indices, always including the first
+    # and last frame
+    if count == 0 or samples <= 0:
+        return np.array([], dtype=np.intp)
+    return np.unique(np.linspace(0, count - 1, min(samples, count)).round().astype(np.intp))
+
+def axis_limits(landmarks, margin=0.05):
+    # One set of limits for every image, so the frames are drawn to the same scale
+    xyz = np.asarray(landmarks)[..., :3].reshape(-1, 3)
+    low, high = xyz.min(axis=0), xyz.max(axis=0)
+    pad = np.maximum(high - low, 1e-3) * margin
+    return low - pad, high + pad
+
+class SkeletonPlot:
+    # A 3D plot of one frame's landmarks and bones on a bare Agg figure.
+    # update() swaps the artists' data, so a sequence of frames reuses one
+    # figure instead of building a new one each time. The axes never move, so
+    # they are drawn once and each frame only redraws the skeleton and title
+    # over a copy of them. No pyplot, so it is safe to use off the main thread.
+    def __init__(self, limits, figsize=(10, 10), dpi=100):
+        self.figure = Figure(figsize=figsize, dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.figure)
+        self.ax = self.figure.add_subplot(111, projection='3d')
+
+        zeros = np.zeros(CONNECTIONS.max() + 1)
+        self.points = self.ax.scatter(zeros, zeros, zeros, depthshade=False)
+        self.bones = Line3DCollection(np.zeros((len(CONNECTIONS), 2, 3)), colors='tab:red', linewidths=1.5)
+        self.ax.add_collection3d(self.bones)
+        self.title = self.ax.set_title('')
+        self.background = None
+
+        # Set labels and fixed limits
+        self.ax.set_xlabel('X')
+        self.ax.set_ylabel('Y')
+        self.ax.set_zlabel('Z')
+        low, high = limits
+        self.ax.set_xlim(low[0], high[0])
+        self.ax.set_ylim(low[1], high[1])
+        self.ax.set_zlim(low[2], high[2])
+
+    def update(self, landmarks, frame_num):
+        xyz = np.asarray(landmarks)[:, :3]
+        self.points._offsets3d = (xyz[:, 0], xyz[:, 1], xyz[:, 2])
+        self.bones.set_segments(xyz[CONNECTIONS])
+        self.title.set_text(f'Frame {frame_num}')
+
+    def save(self, path):
+        # One Agg draw, written out by OpenCV; savefig would draw again
+        cv2.imwrite(path, cv2.cvtColor(self._draw(), cv2.COLOR_RGBA2BGR))
+
+    def to_rgb(self):
+        return cv2.cvtColor(self._draw(), cv2.COLOR_RGBA2RGB)
+
+    def _draw(self):
+        # The canvas's RGBA buffer; valid until the next draw
+        artists = (self.points, self.bones, self.title)
+        if self.background is None:
+            for artist in artists:
+                artist.set_visible(False)
+            self.canvas.draw()
+            self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+            for artist in artists:
+                artist.set_visible(True)
+            # A full draw for the first frame, which also lays out the title
+            self.canvas.draw()
+            return np.asarray(self.canvas.buffer_rgba())
+
+        self.canvas.restore_region(self.background)
+        renderer = self.canvas.get_renderer()
+        # Project the skeleton with the camera of the background draw
+        for artist in artists[:2]:
+            artist.do_3d_projection()
+        for artist in artists:
+            artist.draw(renderer)
+        return np.asarray(self.canvas.buffer_rgba())
+
+def _render_stills(landmarks_file, indices, vis_dir, limits, figsize):
+    # Renders the given frame indices to PNGs; also the process pool's task
+    fps, frame_numbers, coords = open_landmarks(landmarks_file)
+    plot = SkeletonPlot(limits, figsize)
+    paths = []
+    for idx in indices:
+        frame_num = int(frame_numbers[idx])
+        plot.update(coords[idx], frame_num)
+        paths.append(os.path.join(vis_dir, f'frame_{frame_num}_visualization.png'))
+        plot.save(paths[-1])
+    return paths
+
+def render_keyframe_grid(landmarks, frame_numbers, path, limits, columns=4, cell_size=3):
+    # All the given frames as small 3D plots in one image
+    rows = max(1, -(-len(landmarks) // columns))
+    figure = Figure(figsize=(columns * cell_size, rows * cell_size))
+    FigureCanvasAgg(figure)
+    low, high = limits
+    for i, (values, frame_num) in enumerate(zip(landmarks, frame_numbers)):
+        ax = figure.add_subplot(rows, columns, i + 1, projection='3d')
+        xyz = np.asarray(values)[:, :3]
+        ax.scatter(xyz[:, 0], xyz[:, 1], xyz[:, 2], s=4, depthshade=False)
+        ax.add_collection3d(Line3DCollection(xyz[CONNECTIONS], colors='tab:red', linewidths=1))
+        ax.set_xlim(low[0], high[0])
+        ax.set_ylim(low[1], high[1])
+        ax.set_zlim(low[2], high[2])
+        ax.set_xticklabels([])
+        ax.set_yticklabels([])
+        ax.set_zticklabels([])
+        ax.set_title(f'Frame {int(frame_num)}', fontsize=8)
+    figure.savefig(path)
+    return path
+
+def write_animation(landmarks, frame_numbers, path, limits, fps, figsize=(6, 6), dpi=80):
+    # Animated 3D skeleton: a GIF through Pillow for .gif paths, otherwise an
+    # mp4v video through OpenCV. Frames are drawn into one reused figure.
+    plot = SkeletonPlot(limits, figsize, dpi)
+    gif = path.lower().endswith(".gif")
+    if gif:
+        from PIL import Image
+    frames = []
+    writer = None
+    try:
+        for values, frame_num in zip(landmarks, frame_numbers):
+            plot.update(values, int(frame_num))
+            image = plot.to_rgb()
+            if gif:
+                # Quantized as they come, to the first frame's palette; the
+                # skeleton's few colors barely change, and it is much faster
+                # (and smaller) than a palette per frame
+                frame = Image.fromarray(image)
+                if frames:
+                    frames.append(frame.quantize(palette=frames[0], dither=Image.Dither.NONE))
+                else:
+                    frames.append(frame.quantize(64, dither=Image.Dither.NONE))
+                continue
+            if writer is None:
+                height, width = image.shape[:2]
+                writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+            writer.write(image[..., ::-1])
+    finally:
+        if writer is not None:
+            writer.release()
+
+    if frames:
+        frames[0].save(path, save_all=True, append_images=frames[1:], duration=round(1000 / fps), loop=0)
+    return path
+
+def visualize_landmarks(landmarks_file, output_dir, samples=3, workers=1, grid=False, animation=None, animation_step=1):
+    # PNGs of samples evenly spaced frames (first, middle and last by
+    # default), optionally rendered by a pool of worker processes. grid adds
+    # one keyframe_grid.png of the same frames; animation ("gif" or "mp4")
+    # adds an animation of every animation_step-th frame.
+    fps, frame_numbers, coords = open_landmarks(landmarks_file)
 
-    frames = data['frames']
-    
     # Create a directory for the visualizations
     vis_dir = os.path.join(output_dir, 'landmark_visualizations')
     os.makedirs(vis_dir, exist_ok=True)
 
-    # Create visualizations for the first, middle, and last frames
-    frame_indices = [0, len(frames) // 2, -1]
-    
-    for idx in frame_indices:
-        frame = frames[idx]
-        landmarks = frame['landmarks']
-        
-        fig = plt.figure(figsize=(10, 10))
-        ax = fig.add_subplot(111, projection='3d')
-        
-        xs = [lm['x'] for lm in landmarks]
-        ys = [lm['y'] for lm in landmarks]
-        zs = [lm['z'] for lm in landmarks]
-        
-        ax.scatter(xs, ys, zs)
-        
-        # Set labels and title
-        ax.set_xlabel('X')
-        ax.set_ylabel('Y')
-        ax.set_zlabel('Z')
-        ax.set_title(f'Frame {frame["frame"]}')
-        
-        # Save the plot
-        plt.savefig(os.path.join(vis_dir, f'frame_{frame["frame"]}_visualization.png'))
-        plt.close()
+    if len(frame_numbers) == 0:
+        print(f"No landmarks to visualize in {landmarks_file}")
+        return vis_dir
+
+    indices = sample_indices(len(frame_numbers), samples)
+    animated = np.arange(0, len(frame_numbers), animation_step) if animation else indices
+    limits = axis_limits(coords[np.union1d(indices, animated)])
+
+    figsize = (10, 10)
+    chunks = [chunk for chunk in np.array_split(indices, max(1, workers)) if len(chunk)]
+    if len(chunks) > 1:
+        # Spawn, like the batch runner; each worker builds its own figure
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=len(chunks), mp_context=context) as executor:
+            for future in [executor.submit(_render_stills, landmarks_file, chunk, vis_dir, limits, figsize) for chunk in chunks]:
+                future.result()
+    else:
+        _render_stills(landmarks_file, indices, vis_dir, limits, figsize)
+
+    if grid:
+        render_keyframe_grid(coords[indices], frame_numbers[indices], os.path.join(vis_dir, 'keyframe_grid.png'), limits)
+
+    if animation:
+        write_animation(coords[animated], frame_numbers[animated], os.path.join(vis_dir, f'landmark_animation.{animation}'),
+                        limits, max(1.0, fps / animation_step))
 
     print(f"Landmark visualizations saved in {vis_dir}")
+    return vis_dir
 
-# This function will be called from gui.py
\ No newline at end of file
+# This function will be called from gui.py
+# visualize_landmarks("landmarks_output.npz", "output", samples=200, workers=4, grid=True, animation="gif", animation_step=2)
@@ -0,0 +1,176 @@
+import json
+import struct
+import zipfile
+from itertools import chain
+
+import numpy as np
+
+OUTPUT_FORMATS = ("blender", "spine")
+
+def check_output_format(output_format):
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported output format: {output_format}")
+
+def remap_landmarks(landmarks, output_format):
+    # Raw MediaPipe image coordinates to the coordinate system of the target tool
+    if output_format == "blender":
+        return [
+            {"x": lm["x"], "y": lm["z"], "z": -lm["y"]}  # Adjust for Blender's coordinate system
+            for lm in landmarks
+        ]
+    elif output_format == "spine":
+        return [
+            {"x": lm["x"], "y": 1 - lm["y"], "z": lm["z"]}  # Invert y-axis for Spine compatibility
+            for lm in landmarks
+        ]
+    else:
+        raise ValueError(f"Unsupported output format: {output_format}")
+
+def remap_frames(raw_frames, output_format):
+    check_output_format(output_format)
+    return [
+        {"frame": frame["frame"], "landmarks": remap_landmarks(frame["landmarks"], output_format)}
+        for frame in raw_frames
+    ]
+
+LANDMARK_COUNT = 33
+
+def _frames_to_values(frames, dtype):
+    values = [(lm["x"], lm["y"], lm["z"], lm.get("visibility", 1.0)) for frame in frames for lm in frame["landmarks"]]
+    return np.fromiter(chain.from_iterable(values), dtype=dtype, count=len(values) * 4).reshape(len(frames), LANDMARK_COUNT, 4)
+
+def frames_to_array(raw_frames):
+    # frames x 33 x (x, y, z, visibility) float32, plus the matching frame numbers
+    array = _frames_to_values(raw_frames, np.float32)
+    frame_numbers = np.array([frame["frame"] for frame in raw_frames], dtype=np.int32)
+    return frame_numbers, array
+
+def array_to_frames(frame_numbers, array):
+    return [
+        {
+            "frame": frame_num,
+            "landmarks": [{"x": x, "y": y, "z": z, "visibility": v} for x, y, z, v in landmarks]
+        }
+        for frame_num, landmarks in zip(frame_numbers.tolist(), array.tolist())
+    ]
+
+def remap_array(raw, output_format):
+    # Vectorized remap_landmarks. Done in float64 so the values match the JSON
+    # export exactly; the visibility channel is passed through.
+    raw = np.asarray(raw, dtype=np.float64)
+    coords = np.empty(raw.shape, dtype=np.float64)
+    coords[..., 0] = raw[..., 0]
+    if output_format == "blender":
+        coords[..., 1] = raw[..., 2]
+        coords[..., 2] = -raw[..., 1]
+    elif output_format == "spine":
+        coords[..., 1] = 1 - raw[..., 1]
+        coords[..., 2] = raw[..., 2]
+    else:
+        raise ValueError(f"Unsupported output format: {output_format}")
+    coords[..., 3] = raw[..., 3]
+    return coords
+
+def save_landmark_array(path, fps, frame_numbers, raw, output_format=None, **extra):
+    # Uncompressed so every member can be memory-mapped by load_landmark_array.
+    # Landmarks stay in MediaPipe's raw image coordinates, which float32 holds
+    # losslessly; output_format records the remap consumers should apply.
+    np.savez(
+        path,
+        landmarks=np.asarray(raw, dtype=np.float32),
+        frames=np.asarray(frame_numbers, dtype=np.int32),
+        fps=np.float64(fps),
+        format=np.str_(output_format or ""),
+        **extra
+    )
+
+def _memmap_npz_member(path, name):
+    with zipfile.ZipFile(path) as archive:
+        info = archive.getinfo(f"{name}.npy")
+    if info.compress_type != zipfile.ZIP_STORED:
+        return None
+
+    with open(path, 'rb') as f:
+        # Skip the zip local file header to reach the embedded .npy file
+        f.seek(info.header_offset)
+        local_header = f.read(30)
+        name_length, extra_length = struct.unpack("<HH", local_header[26:30])
+        f.seek(info.header_offset + 30 + name_length + extra_length)
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+
+    if not all(shape):
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=shape, order='F' if fortran_order else 'C', offset=offset)
+
+def load_landmark_array(path, mmap=True):
+    # Returns fps, frame numbers, raw frames x 33 x 4 landmarks and the recorded
+    # output format. The landmark array is memory-mapped rather than read.
+    with np.load(path) as data:
+        fps = data["fps"].item()
+        frame_numbers = data["frames"]
+        output_format = str(data["format"]) or None
+        raw = data["landmarks"] if not mmap else None
+    if mmap:
+        raw = _memmap_npz_member(path, "landmarks")
+        if raw is None:
+            with np.load(path) as data:
+                raw = data["landmarks"]
+    if fps == int(fps):
+        fps = int(fps)
+    return fps, frame_numbers, raw, output_format
+
+def load_landmarks(path, output_format=None):
+    # Either landmark file as fps, frame numbers and a frames x 33 x 4 array of
+    # (x, y, z, visibility) in export coordinates. JSON files are already
+    # remapped; .npz files are remapped to output_format (default: the format
+    # they were recorded for).
+    if path.endswith(".npz"):
+        fps, frame_numbers, raw, recorded_format = load_landmark_array(path)
+        return fps, frame_numbers, remap_array(raw, output_format or recorded_format)
+
+    with open(path, 'r') as f:
+        data = json.load(f)
+    frames = data["frames"]
+    coords = _frames_to_values(frames, np.float64)
+    frame_numbers = np.array([frame["frame"] for frame in frames], dtype=np.int32)
+    return data["fps"], frame_numbers, coords
+
+class RemappedLandmarks:
+    # Read-only frames x 33 x 4 view over a raw landmark array that remaps each
+    # slice on access, so a memory-mapped file is never converted as a whole
+    def __init__(self, raw, output_format):
+        check_output_format(output_format)
+        self.raw = raw
+        self.output_format = output_format
+
+    def __len__(self):
+        return len(self.raw)
+
+    def __getitem__(self, index):
+        return remap_array(self.raw[index], self.output_format)
+
+def open_landmarks(path, output_format=None):
+    # load_landmarks for streaming consumers: .npz landmarks stay on disk and
+    # are remapped slice by slice
+    if path.endswith(".npz"):
+        fps, frame_numbers, raw, recorded_format = load_landmark_array(path)
+        return fps, frame_numbers, RemappedLandmarks(raw, output_format or recorded_format)
+    return load_landmarks(path, output_format)
+
+def save_landmarks(path, fps, frame_numbers, raw, output_format):
+    # Binary store for .npz paths, the remapped landmarks.json schema otherwise
+    check_output_format(output_format)
+    if path.endswith(".npz"):
+        save_landmark_array(path, fps, frame_numbers, raw, output_format)
+    else:
+        with open(path, 'w') as f:
+            json.dump({"fps": fps, "frames": remap_frames(array_to_frames(frame_numbers, raw), output_format)}, f)
+
+def export_json(npz_path, json_path, output_format=None):
+    fps, frame_numbers, raw, recorded_format = load_landmark_array(npz_path)
+    save_landmarks(json_path, fps, frame_numbers, raw, output_format or recorded_format)
@@ -0,0 +1,411 @@
+import base64
+import hashlib
+import json
+import os
+import selectors
+import socket
+import struct
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from landmarks import LANDMARK_COUNT, check_output_format, remap_array, save_landmarks
+from video_processor import landmark_box
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+# How often the server thread wakes to flush backlogs and time out handshakes
+SERVER_POLL_SECONDS = 0.05
+# A client silent this long after connecting is taken for a plain TCP one
+PLAIN_CLIENT_SECONDS = 0.2
+# An upgrade request still incomplete after this long is dropped
+HANDSHAKE_SECONDS = 5.0
+
+def parse_source(source):
+    # "0" is the first camera; anything else is a file path or stream URL
+    return int(source) if str(source).isdigit() else source
+
+class LatestFrameGrabber:
+    # Reads a camera, stream URL or video file on its own thread and keeps only
+    # the newest frame, so a consumer that falls behind skips stale frames
+    # instead of working through a backlog. Files are paced at their frame
+    # rate like a camera (realtime) and can loop, which makes a local clip a
+    # stand-in for a live source. record_video, if given, gets every captured
+    # frame, dropped or not, so frame numbers index into it.
+    def __init__(self, source, loop=False, realtime=None, record_video=None):
+        self.source = source
+        self.cap = cv2.VideoCapture(source)
+        if not self.cap.isOpened():
+            raise IOError(f"Could not open video source: {source}")
+        # Camera drivers that support it stop queueing frames behind our back
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        is_file = isinstance(source, str) and os.path.isfile(source)
+        self.loop = loop and is_file
+        self.realtime = is_file if realtime is None else realtime
+        self.recorder = None
+        if record_video is not None:
+            self.recorder = cv2.VideoWriter(record_video, cv2.VideoWriter_fourcc(*'mp4v'), self.fps, (self.width, self.height))
+
+        self.condition = threading.Condition()
+        self.frame = None
+        self.frame_num = -1
+        self.captured = None
+        self.consumed = -1
+        self.dropped = 0
+        self.finished = False
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="frame-grabber", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+        self.cap.release()
+        if self.recorder is not None:
+            self.recorder.release()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+        return False
+
+    def _run(self):
+        interval = 1.0 / self.fps
+        next_frame = time.perf_counter()
+        frame_num = -1
+        try:
+            while self.running:
+                ret, frame = self.cap.read()
+                if not ret:
+                    # Rewind a looping file, unless it has no frames at all
+                    if self.loop and frame_num >= 0 and self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0):
+                        continue
+                    break
+                frame_num += 1
+
+                if self.realtime:
+                    next_frame += interval
+                    delay = next_frame - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    elif delay < -interval:
+                        # Far behind (e.g. a slow decode); don't burst to catch up
+                        next_frame = time.perf_counter()
+
+                if self.recorder is not None:
+                    self.recorder.write(frame)
+                with self.condition:
+                    if self.frame_num > self.consumed:
+                        self.dropped += 1
+                    self.frame = frame
+                    self.frame_num = frame_num
+                    self.captured = time.perf_counter()
+                    self.condition.notify_all()
+        finally:
+            with self.condition:
+                self.finished = True
+                self.condition.notify_all()
+
+    def read(self, timeout=1.0):
+        # The newest frame not returned before, as (frame number, capture time
+        # on the perf_counter clock, BGR frame); None on timeout or once the
+        # source has ended (then finished is set)
+        with self.condition:
+            self.condition.wait_for(lambda: self.frame_num > self.consumed or self.finished, timeout)
+            if self.frame_num <= self.consumed:
+                return None
+            self.consumed = self.frame_num
+            return self.frame_num, self.captured, self.frame
+
+def stream_landmarks(processor, grabber, output_format, inference_size=None, roi_padding=None, smoother=None,
+                     record_landmarks=None, max_frames=None, stop=None):
+    # Runs pose tracking on the grabber's newest frames and yields one record
+    # per processed frame: the source frame number, its wall-clock capture
+    # time, the capture-to-landmark latency, frames dropped so far and the 33
+    # (x, y, z, visibility) landmarks in output_format coordinates, or None
+    # without a pose. smoother is a landmark_smoothing.OneEuroFilter. With
+    # record_landmarks, the raw (unsmoothed) detections are saved there when
+    # the stream ends, with the grabber's frame numbers and rate.
+    check_output_format(output_format)
+    metrics = processor.metrics
+    roi = None
+    frame_numbers = []
+    recorded = []
+    processed = 0
+    # Capture times are taken on perf_counter; this maps them to wall time
+    clock_offset = time.time() - time.perf_counter()
+    try:
+        while (max_frames is None or processed < max_frames) and (stop is None or not stop.is_set()):
+            item = grabber.read()
+            if item is None:
+                if grabber.finished:
+                    return
+                continue
+            frame_num, captured, frame = item
+
+            values = processor.detect_frame(frame, roi, inference_size)
+            landmarks = None
+            roi = None
+            if values is not None:
+                if roi_padding is not None:
+                    roi = landmark_box(values, frame.shape[1], frame.shape[0], roi_padding)
+                if record_landmarks is not None:
+                    frame_numbers.append(frame_num)
+                    recorded.append(values)
+                if smoother is not None:
+                    values = smoother(captured, values)
+                landmarks = remap_array(values, output_format).tolist()
+            else:
+                metrics.count("frames_without_pose")
+
+            latency = time.perf_counter() - captured
+            metrics.observe("latency", latency)
+            processed += 1
+            yield {
+                "frame": frame_num,
+                "time": round(captured + clock_offset, 4),
+                "latency": latency,
+                "dropped": grabber.dropped,
+                "landmarks": landmarks,
+            }
+    finally:
+        if record_landmarks is not None:
+            raw = np.array(recorded, dtype=np.float32).reshape(-1, LANDMARK_COUNT, 4)
+            save_landmarks(record_landmarks, grabber.fps, np.array(frame_numbers, dtype=np.int32), raw, output_format)
+
+def websocket_frame(payload, opcode=0x1):
+    # One unmasked frame, as a server sends them; a text frame by default
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 1 << 16:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+def read_websocket_frame(data):
+    # (opcode, payload, frame length) of the first frame in data, or None
+    # until all of it has arrived. Client frames are masked.
+    if len(data) < 2:
+        return None
+    opcode, length = data[0] & 0x0F, data[1] & 0x7F
+    offset = 2
+    if length == 126:
+        if len(data) < 4:
+            return None
+        length, offset = struct.unpack_from("!H", data, 2)[0], 4
+    elif length == 127:
+        if len(data) < 10:
+            return None
+        length, offset = struct.unpack_from("!Q", data, 2)[0], 10
+    mask = None
+    if data[1] & 0x80:
+        if len(data) < offset + 4:
+            return None
+        mask, offset = bytes(data[offset:offset + 4]), offset + 4
+    end = offset + length
+    if len(data) < end:
+        return None
+    payload = bytes(data[offset:end])
+    if mask is not None:
+        payload = bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+    return opcode, payload, end
+
+class _Client:
+    # One connection. It stays in "handshake" until its first bytes (or a
+    # silence of PLAIN_CLIENT_SECONDS) tell a WebSocket from a plain TCP
+    # client, and only then gets records.
+    def __init__(self, conn):
+        self.conn = conn
+        self.state = "handshake"
+        self.connected = time.perf_counter()
+        self.incoming = bytearray()
+        self.pending = bytearray()
+        self.closed = False
+
+class LandmarkServer:
+    # Pushes each published record to every connected client: as JSON lines
+    # over plain TCP, or as text messages to WebSocket clients, which are told
+    # apart by their opening upgrade request. Sends never block; a client
+    # more than max_pending bytes behind misses records rather than delaying
+    # the stream for everyone else. A selector thread accepts connections,
+    # completes handshakes, drains what clients send (answering WebSocket
+    # pings and closes) and drops clients that hang up.
+    def __init__(self, host="127.0.0.1", port=8765, max_pending=1 << 16):
+        self.server = socket.create_server((host, port))
+        self.server.setblocking(False)
+        self.address = self.server.getsockname()
+        self.max_pending = max_pending
+        self.clients = []
+        self.lock = threading.Lock()
+        self.running = True
+        self.thread = threading.Thread(target=self._serve, name="landmark-server", daemon=True)
+        self.thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def _serve(self):
+        selector = selectors.DefaultSelector()
+        selector.register(self.server, selectors.EVENT_READ)
+        try:
+            while self.running:
+                for key, _ in selector.select(timeout=SERVER_POLL_SECONDS):
+                    if key.fileobj is self.server:
+                        self._accept(selector)
+                    else:
+                        self._receive(key.data)
+
+                now = time.perf_counter()
+                with self.lock:
+                    for client in list(self.clients):
+                        if client.state == "handshake":
+                            if not client.incoming and now - client.connected >= PLAIN_CLIENT_SECONDS:
+                                # Plain TCP clients just connect and listen
+                                client.state = "tcp"
+                            elif now - client.connected >= HANDSHAKE_SECONDS:
+                                client.closed = True
+                        if not client.closed:
+                            self._flush(client)
+                        if client.closed:
+                            selector.unregister(client.conn)
+                            client.conn.close()
+                            self.clients.remove(client)
+        finally:
+            selector.close()
+
+    def _accept(self, selector):
+        try:
+            conn, _ = self.server.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        conn.setblocking(False)
+        client = _Client(conn)
+        selector.register(conn, selectors.EVENT_READ, client)
+        with self.lock:
+            self.clients.append(client)
+
+    def _receive(self, client):
+        try:
+            data = client.conn.recv(65536)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b""
+        with self.lock:
+            if not data:
+                client.closed = True
+                return
+            if client.state == "tcp":
+                # Nothing a plain client sends means anything
+                return
+            client.incoming += data
+            if client.state == "handshake":
+                self._handshake(client)
+            if client.state == "websocket":
+                self._read_frames(client)
+            if len(client.incoming) > self.max_pending:
+                client.closed = True
+
+    def _handshake(self, client):
+        request = bytes(client.incoming)
+        if not b"GET ".startswith(request[:4]):
+            client.state = "tcp"
+            client.incoming.clear()
+            return
+        if b"\r\n\r\n" not in request:
+            return
+        request, _, rest = request.partition(b"\r\n\r\n")
+
+        key = None
+        for line in request.decode("latin-1").split("\r\n")[1:]:
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "sec-websocket-key":
+                key = value.strip()
+        if key is None:
+            # Not a WebSocket upgrade request
+            client.closed = True
+            return
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+        client.pending += ("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                           f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode()
+        client.state = "websocket"
+        client.incoming = bytearray(rest)
+
+    def _read_frames(self, client):
+        while not client.closed:
+            frame = read_websocket_frame(client.incoming)
+            if frame is None:
+                return
+            opcode, payload, length = frame
+            del client.incoming[:length]
+            if opcode == 0x8:
+                # Echo the close, then drop the client
+                client.pending += websocket_frame(payload[:2], 0x8)
+                self._flush(client)
+                client.closed = True
+            elif opcode == 0x9:
+                client.pending += websocket_frame(payload, 0xA)
+            # Text, binary and pong frames from clients are ignored
+
+    def _flush(self, client):
+        # Called with the lock held
+        if not client.pending:
+            return
+        try:
+            sent = client.conn.send(client.pending)
+            del client.pending[:sent]
+        except (BlockingIOError, InterruptedError):
+            pass
+        except OSError:
+            client.closed = True
+
+    @property
+    def client_count(self):
+        with self.lock:
+            return sum(1 for client in self.clients if client.state != "handshake" and not client.closed)
+
+    def publish(self, record):
+        payload = json.dumps(record).encode()
+        line = payload + b"\n"
+        message = websocket_frame(payload)
+        with self.lock:
+            for client in self.clients:
+                if client.state == "handshake" or client.closed:
+                    continue
+                if len(client.pending) < self.max_pending:
+                    client.pending += message if client.state == "websocket" else line
+                self._flush(client)
+
+    def close(self):
+        self.running = False
+        self.thread.join()
+        self.server.close()
+        with self.lock:
+            for client in self.clients:
+                client.conn.close()
+            self.clients.clear()
+
+# Usage
+# processor = VideoProcessor()
+# with LatestFrameGrabber(0) as grabber, LandmarkServer(port=8765) as server:
+#     for record in stream_landmarks(processor, grabber, "spine", smoother=OneEuroFilter()):
+#         server.publish(record)
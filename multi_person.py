@@ -0,0 +1,253 @@
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from landmarks import LANDMARK_COUNT, check_output_format, save_landmarks
+from video_processor import ProcessingCancelled, VideoProcessor, landmark_box
+
+def _box_pairs(boxes_a, boxes_b):
+    # Every (x0, y0, x1, y1) box in boxes_a against every box in boxes_b
+    a = np.asarray(boxes_a, dtype=np.float64).reshape(-1, 1, 4)
+    b = np.asarray(boxes_b, dtype=np.float64).reshape(1, -1, 4)
+    return a, b
+
+def _intersection_and_areas(boxes_a, boxes_b):
+    a, b = _box_pairs(boxes_a, boxes_b)
+    width = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    height = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return width * height, area_a, area_b
+
+def box_iou(boxes_a, boxes_b):
+    # Intersection over union, as a len(a) x len(b) matrix
+    intersection, area_a, area_b = _intersection_and_areas(boxes_a, boxes_b)
+    return intersection / np.maximum(area_a + area_b - intersection, 1e-9)
+
+def box_coverage(boxes_a, boxes_b):
+    # How much of the smaller box of each pair lies inside the other one
+    intersection, area_a, area_b = _intersection_and_areas(boxes_a, boxes_b)
+    return intersection / np.maximum(np.minimum(area_a, area_b), 1e-9)
+
+def centroid_distance(boxes_a, boxes_b):
+    # Distance between box centres, relative to the longer diagonal of the pair
+    a, b = _box_pairs(boxes_a, boxes_b)
+    offset = (a[..., :2] + a[..., 2:]) / 2 - (b[..., :2] + b[..., 2:]) / 2
+    diagonal = np.maximum(np.hypot(a[..., 2] - a[..., 0], a[..., 3] - a[..., 1]),
+                          np.hypot(b[..., 2] - b[..., 0], b[..., 3] - b[..., 1]))
+    return np.hypot(offset[..., 0], offset[..., 1]) / np.maximum(diagonal, 1e-9)
+
+def associate(track_boxes, detections, iou_threshold=0.3, max_distance=0.5):
+    # Greedy assignment of detections to tracks: best IoU first, then, for
+    # what is left, nearest centre within max_distance box diagonals. Returns
+    # the (track index, detection index) matches and the unmatched detections.
+    matches = []
+    if len(track_boxes) and len(detections):
+        free_tracks = set(range(len(track_boxes)))
+        free_detections = set(range(len(detections)))
+        iou = box_iou(track_boxes, detections)
+        distance = centroid_distance(track_boxes, detections)
+        for scores, better, limit in ((iou, -1, iou_threshold), (distance, 1, max_distance)):
+            for flat in np.argsort(better * scores, axis=None):
+                track, detection = np.unravel_index(flat, scores.shape)
+                score = scores[track, detection]
+                if (score < limit) if better < 0 else (score > limit):
+                    break
+                if track in free_tracks and detection in free_detections:
+                    matches.append((int(track), int(detection)))
+                    free_tracks.discard(track)
+                    free_detections.discard(detection)
+        unmatched = sorted(free_detections)
+    else:
+        unmatched = list(range(len(detections)))
+    return matches, unmatched
+
+def pad_box(box, width, height, padding):
+    # box grown by padding times its size on every side, clipped to the frame
+    x0, y0, x1, y1 = box
+    pad_x, pad_y = (x1 - x0) * padding, (y1 - y0) * padding
+    return (max(0, int(x0 - pad_x)), max(0, int(y0 - pad_y)),
+            min(width, int(np.ceil(x1 + pad_x))), min(height, int(np.ceil(y1 + pad_y))))
+
+class PersonDetector:
+    # OpenCV's HOG people detector, which needs no model download. Frames are
+    # downscaled so the longer side is at most detect_size before detection.
+    def __init__(self, detect_size=640, min_confidence=0.5):
+        self.hog = cv2.HOGDescriptor()
+        self.hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+        self.detect_size = detect_size
+        self.min_confidence = min_confidence
+
+    def detect(self, frame):
+        height, width = frame.shape[:2]
+        scale = min(1.0, self.detect_size / max(width, height))
+        if scale < 1.0:
+            frame = cv2.resize(frame, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+        rects, weights = self.hog.detectMultiScale(frame, winStride=(8, 8), padding=(8, 8), scale=1.05)
+        boxes = [
+            (int(x / scale), int(y / scale), int((x + w) / scale), int((y + h) / scale))
+            for (x, y, w, h), weight in zip(rects, np.ravel(weights)) if weight >= self.min_confidence
+        ]
+        return boxes
+
+class Track:
+    # One dancer: the box to run pose on next, and the landmarks found so far
+    def __init__(self, track_id, box, processor):
+        self.id = track_id
+        self.box = box
+        self.processor = processor
+        self.missing = 0
+        self.frame_numbers = []
+        self.values = []
+
+def process_video_multi(video_path, output_dir, output_format, max_people=8, detect_every=10, workers=None,
+                        pose_settings=None, iou_threshold=0.3, crop_padding=0.25, max_missing=15,
+                        min_track_frames=15, inference_size=None, detector=None, progress=None, cancel=None):
+    # Landmarks for every dancer in the clip. People are detected every
+    # detect_every frames (and whenever nobody is tracked); in between, each
+    # track follows its own pose, whose landmark box becomes the next crop.
+    # Detections are matched to tracks by IoU, then by centre distance, so
+    # track IDs stay stable; a track that loses its pose for max_missing
+    # frames ends. Each track has its own Pose tracker on a crop of the frame,
+    # and the tracks of a frame run in a thread pool of workers. Writes
+    # dancer_<id>/landmarks.npz per track with at least min_track_frames
+    # detections, plus a dancers.json manifest, and returns the manifest.
+    check_output_format(output_format)
+    pose_settings = pose_settings or {}
+    detector = detector or PersonDetector()
+
+    cap = cv2.VideoCapture(video_path)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = int(cap.get(cv2.CAP_PROP_FPS))
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    tracks = []
+    finished = []
+    # Pose trackers of ended tracks, reset and reused for new ones
+    spare_processors = []
+    next_id = 0
+
+    def new_processor():
+        if spare_processors:
+            return spare_processors.pop()
+        return VideoProcessor(**pose_settings)
+
+    def end_track(track):
+        tracks.remove(track)
+        track.processor.reset()
+        spare_processors.append(track.processor)
+        track.processor = None
+        finished.append(track)
+
+    def detect_pose(track, frame):
+        return track.processor.detect_frame(frame, pad_box(track.box, width, height, crop_padding), inference_size)
+
+    frames_read = 0
+    try:
+        with ThreadPoolExecutor(max_workers=workers or max_people) as pool:
+            for frame_num in range(frame_count):
+                if cancel is not None and cancel.is_set():
+                    raise ProcessingCancelled(f"Processing of {video_path} was cancelled")
+
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                frames_read += 1
+
+                if frame_num % detect_every == 0 or not tracks:
+                    detections = detector.detect(frame)
+                    matches, unmatched = associate([track.box for track in tracks], detections, iou_threshold)
+                    for track_index, detection_index in matches:
+                        tracks[track_index].box = detections[detection_index]
+                    for detection_index in unmatched:
+                        if len(tracks) >= max_people:
+                            break
+                        # A box around a dancer already tracked is not a new one
+                        if tracks and box_coverage([detections[detection_index]], [track.box for track in tracks]).max() > 0.5:
+                            continue
+                        tracks.append(Track(next_id, detections[detection_index], new_processor()))
+                        next_id += 1
+
+                # The trackers are separate graphs, so the tracks of a frame
+                # can run at once; each one still sees its frames in order
+                for track, values in zip(list(tracks), pool.map(lambda track: detect_pose(track, frame), tracks)):
+                    if values is None:
+                        track.missing += 1
+                        if track.missing > max_missing:
+                            end_track(track)
+                        continue
+                    track.missing = 0
+                    track.frame_numbers.append(frame_num)
+                    track.values.append(values)
+                    track.box = landmark_box(values, width, height, 0.0) or track.box
+
+                # Two tracks that have locked onto the same dancer: keep the older
+                if len(tracks) > 1:
+                    boxes = [track.box for track in tracks]
+                    duplicates = {tracks[j] for i, j in zip(*np.nonzero(np.triu(box_iou(boxes, boxes), 1) > 0.7))}
+                    for track in duplicates:
+                        end_track(track)
+
+                if progress:
+                    progress(frames_read, frame_count)
+    finally:
+        cap.release()
+
+    os.makedirs(output_dir, exist_ok=True)
+    dancers = []
+    for track in sorted(finished + tracks, key=lambda track: track.id):
+        if not track.frame_numbers or len(track.frame_numbers) < min_track_frames:
+            continue
+        dancer_dir = os.path.join(output_dir, f"dancer_{track.id:02d}")
+        os.makedirs(dancer_dir, exist_ok=True)
+        landmarks_output = os.path.join(dancer_dir, "landmarks.npz")
+        raw = np.array(track.values, dtype=np.float32).reshape(-1, LANDMARK_COUNT, 4)
+        save_landmarks(landmarks_output, fps, np.array(track.frame_numbers, dtype=np.int32), raw, output_format)
+        dancers.append({
+            "id": track.id,
+            "landmarks": landmarks_output,
+            "frames": len(track.frame_numbers),
+            "first_frame": track.frame_numbers[0],
+            "last_frame": track.frame_numbers[-1],
+        })
+
+    with open(os.path.join(output_dir, "dancers.json"), 'w') as f:
+        json.dump({"video": video_path, "fps": fps, "frames_read": frames_read, "dancers": dancers}, f, indent=2)
+    print(f"Tracked {len(dancers)} dancers in {video_path}")
+    return dancers
+
+def _export_dancer(landmarks_path, output_format, tolerance):
+    # Runs in a worker process; outputs go next to the dancer's landmarks
+    output_dir = os.path.dirname(landmarks_path)
+    if output_format == "spine":
+        from spine_converter import convert_to_spine
+        spine_output = os.path.join(output_dir, "spine_animation.json")
+        convert_to_spine(landmarks_path, spine_output, tolerance=tolerance)
+        return {"spine_output": spine_output}
+    from blender_converter import generate_blender_script
+    blender_output = os.path.join(output_dir, "blender_animation.blend")
+    return {"blender_output": blender_output,
+            "blender_script": generate_blender_script(landmarks_path, blender_output, tolerance=tolerance)}
+
+def export_dancers(dancers, output_format, tolerance=None, workers=None):
+    # Converts every dancer's landmarks at once, one process per export
+    check_output_format(output_format)
+    if not dancers:
+        return dancers
+    workers = max(1, min(workers or os.cpu_count() or 1, len(dancers)))
+    # Spawn, like the batch runner
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        futures = [executor.submit(_export_dancer, dancer["landmarks"], output_format, tolerance) for dancer in dancers]
+        for dancer, future in zip(dancers, futures):
+            dancer.update(future.result())
+    return dancers
+
+# Usage
+# dancers = process_video_multi("crew.mp4", "output_spine/crew", "spine", max_people=5)
+# export_dancers(dancers, "spine", tolerance=0.002)
@@ -0,0 +1,143 @@
+import cv2
+import numpy as np
+
+from landmarks import load_landmark_array
+
+# MediaPipe's pose connections, as drawn by mp_drawing.draw_landmarks
+POSE_CONNECTIONS = (
+    (0, 1), (0, 4), (1, 2), (2, 3), (3, 7), (4, 5), (5, 6), (6, 8), (9, 10),
+    (11, 12), (11, 13), (11, 23), (12, 14), (12, 24), (13, 15), (14, 16),
+    (15, 17), (15, 19), (15, 21), (16, 18), (16, 20), (16, 22), (17, 19), (18, 20),
+    (23, 24), (23, 25), (24, 26), (25, 27), (26, 28), (27, 29), (27, 31),
+    (28, 30), (28, 32), (29, 31), (30, 32)
+)
+
+# The simplified body drawn by VideoProcessor.draw_skeleton
+SKELETON_CONNECTIONS = (
+    (11, 12), (11, 23), (12, 24), (23, 24),  # Shoulders, torso and hips
+    (11, 13), (13, 15), (12, 14), (14, 16),  # Arms
+    (23, 25), (25, 27), (24, 26), (26, 28),  # Legs
+    (0, 11), (0, 12)  # Head
+)
+
+class SkeletonRenderer:
+    # Draws a frame's 33 landmarks given as an array of (x, y[, z, visibility])
+    # rows in normalized image coordinates. All connections go out in one
+    # cv2.polylines call, and the joints in a second one as zero-length
+    # segments, which OpenCV draws as dots of the line thickness.
+    def __init__(self, connections=POSE_CONNECTIONS, line_color=(224, 224, 224), thickness=2,
+                 joint_color=(0, 0, 255), joint_radius=2, min_visibility=0.5, line_type=cv2.LINE_8):
+        self.connections = np.array(connections, dtype=np.intp)
+        self.joints = np.unique(self.connections)
+        self.line_color = line_color
+        self.thickness = thickness
+        self.joint_color = joint_color
+        self.joint_radius = joint_radius
+        # Landmarks below this visibility are left out, as mp_drawing does; None draws everything
+        self.min_visibility = min_visibility
+        self.line_type = line_type
+        self._buffer = None
+
+    def to_pixels(self, values, width, height):
+        # Truncated like int(x * width) in the old per-line drawing
+        values = np.asarray(values)
+        return (values[:, :2] * (width, height)).astype(np.int32)
+
+    def draw(self, frame, values):
+        # Draws onto frame in place and returns it
+        values = np.asarray(values)
+        height, width = frame.shape[:2]
+        pixels = self.to_pixels(values, width, height)
+
+        connections, joints = self.connections, self.joints
+        if self.min_visibility is not None and values.shape[1] > 3:
+            visible = values[:, 3] >= self.min_visibility
+            connections = connections[visible[connections].all(axis=1)]
+            joints = joints[visible[joints]]
+
+        if len(connections) and self.thickness > 0:
+            cv2.polylines(frame, pixels[connections], False, self.line_color, self.thickness, self.line_type)
+        if len(joints) and self.joint_radius > 0:
+            dots = np.repeat(pixels[joints][:, None], 2, axis=1)
+            cv2.polylines(frame, dots, False, self.joint_color, 2 * self.joint_radius, self.line_type)
+        return frame
+
+    def render(self, values, width, height):
+        # The skeleton on black, in a buffer that is reused by the next call
+        if self._buffer is None or self._buffer.shape[:2] != (height, width):
+            self._buffer = np.zeros((height, width, 3), dtype=np.uint8)
+        else:
+            self._buffer.fill(0)
+        return self.draw(self._buffer, values)
+
+    def contact_sheet(self, frames, cell_width, cell_height, columns=8, labels=None):
+        # One image with a cell per frame of landmarks, left to right and top
+        # to bottom; labels (e.g. frame numbers) are printed in the corners
+        frames = list(frames)
+        rows = max(1, -(-len(frames) // columns))
+        sheet = np.zeros((rows * cell_height, columns * cell_width, 3), dtype=np.uint8)
+        for i, values in enumerate(frames):
+            top, left = (i // columns) * cell_height, (i % columns) * cell_width
+            sheet[top:top + cell_height, left:left + cell_width] = self.render(values, cell_width, cell_height)
+            if labels is not None:
+                cv2.putText(sheet, str(labels[i]), (left + 4, top + 14), cv2.FONT_HERSHEY_SIMPLEX, 0.4, self.line_color, 1)
+        return sheet
+
+def plain_renderer():
+    # The green, joint-less style of VideoProcessor.draw_skeleton
+    return SkeletonRenderer(SKELETON_CONNECTIONS, line_color=(0, 255, 0), joint_radius=0, min_visibility=None)
+
+def video_writer(path, fps, width, height):
+    # None when the output is not wanted
+    if path is None:
+        return None
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    return cv2.VideoWriter(path, fourcc, fps, (width, height))
+
+def render_skeleton_video(landmarks_path, skeleton_video_output, width, height, renderer=None):
+    # Skeleton video from a stored .npz landmark file alone, one frame per
+    # stored detection. Needs no pose model, so it can run without MediaPipe.
+    renderer = renderer or plain_renderer()
+    fps, frame_numbers, raw, _ = load_landmark_array(landmarks_path)
+    skeleton_out = video_writer(skeleton_video_output, fps, width, height)
+    try:
+        for values in raw:
+            skeleton_out.write(renderer.render(values, width, height))
+    finally:
+        skeleton_out.release()
+    return len(raw)
+
+def render_overlay_video(video_path, landmarks_path, overlay_video_output, renderer=None):
+    # Overlay video from the source clip and a stored .npz landmark file.
+    # As in process_video, only frames with landmarks are written; the
+    # others are grabbed without being decoded into an image.
+    renderer = renderer or plain_renderer()
+    fps, frame_numbers, raw, _ = load_landmark_array(landmarks_path)
+    cap = cv2.VideoCapture(video_path)
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    overlay_out = video_writer(overlay_video_output, fps, width, height)
+
+    frames_written = 0
+    frame_num = 0
+    try:
+        for target, values in zip(frame_numbers.tolist(), raw):
+            while frame_num < target and cap.grab():
+                frame_num += 1
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frame_num += 1
+            overlay_out.write(renderer.draw(frame, values))
+            frames_written += 1
+    finally:
+        cap.release()
+        overlay_out.release()
+    return frames_written
+
+# Usage
+# renderer = SkeletonRenderer(SKELETON_CONNECTIONS, line_color=(0, 255, 0))
+# skeleton_frame = renderer.render(landmarks, 1920, 1080)
+# cv2.imwrite("contact_sheet.png", renderer.contact_sheet(landmarks[::30], 160, 160, labels=frame_numbers[::30]))
+# render_skeleton_video("landmarks_output.npz", "skeleton_video.mp4", 1920, 1080)
+# render_overlay_video("input_video.mp4", "landmarks_output.npz", "overlay_video.mp4")
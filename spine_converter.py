@@ -1,172 +1,406 @@
 import json
 import math
+import struct
+from itertools import repeat
 
-def calculate_angle(a, b):
-    return math.degrees(math.atan2(b['y'] - a['y'], b['x'] - a['x']))
+import numpy as np
 
-def calculate_length(a, b):
-    return math.sqrt((b['x'] - a['x'])**2 + (b['y'] - a['y'])**2)
+from keyframe_reduction import simplify_keyframes
+from landmarks import open_landmarks
 
-def convert_to_spine(input_file, output_file):
-    with open(input_file, 'r') as f:
-        data = json.load(f)
+# (bone, start landmark, end landmark)
+BONE_CONNECTIONS = [
+    ("hips", 23, 24),
+    ("leftHip", 23, 23),
+    ("rightHip", 24, 24),
+    ("spine", 23, 11),
+    ("chest", 11, 12),
+    ("neck", 12, 0),
+    ("head", 0, 0),
+    ("leftShoulder", 11, 13),
+    ("leftUpperArm", 13, 15),
+    ("leftElbow", 15, 15),
+    ("leftForearm", 15, 17),
+    ("leftHand", 17, 19),
+    ("rightShoulder", 12, 14),
+    ("rightUpperArm", 14, 16),
+    ("rightElbow", 16, 16),
+    ("rightForearm", 16, 18),
+    ("rightHand", 18, 20),
+    ("leftUpperLeg", 23, 25),
+    ("leftKnee", 25, 25),
+    ("leftLowerLeg", 25, 27),
+    ("leftFoot", 27, 31),
+    ("rightUpperLeg", 24, 26),
+    ("rightKnee", 26, 26),
+    ("rightLowerLeg", 26, 28),
+    ("rightFoot", 28, 32),
+]
+ROOT_INDEX = 23  # Use left hip as root
+# Landmark pair of every bone, by name, in BONE_CONNECTIONS order
+BONE_LANDMARKS = {bone_name: (start, end) for bone_name, start, end in BONE_CONNECTIONS}
+CONNECTION_INDICES = {bone_name: i for i, bone_name in enumerate(BONE_LANDMARKS)}
+START_INDICES = np.array([start for start, _ in BONE_LANDMARKS.values()])
+END_INDICES = np.array([end for _, end in BONE_LANDMARKS.values()])
+
+# The exported skeleton as (bone, parent); parents come before their children
+SKELETON_BONES = [
+    ("root", None),
+    ("hips", "root"),
+    ("leftHip", "hips"),
+    ("rightHip", "hips"),
+    ("spine", "hips"),
+    ("chest", "spine"),
+    ("neck", "chest"),
+    ("head", "neck"),
+    ("leftShoulder", "chest"),
+    ("leftUpperArm", "leftShoulder"),
+    ("leftElbow", "leftUpperArm"),
+    ("leftForearm", "leftElbow"),
+    ("leftHand", "leftForearm"),
+    ("rightShoulder", "chest"),
+    ("rightUpperArm", "rightShoulder"),
+    ("rightElbow", "rightUpperArm"),
+    ("rightForearm", "rightElbow"),
+    ("rightHand", "rightForearm"),
+    ("leftUpperLeg", "leftHip"),
+    ("leftKnee", "leftUpperLeg"),
+    ("leftLowerLeg", "leftKnee"),
+    ("leftFoot", "leftLowerLeg"),
+    ("rightUpperLeg", "rightHip"),
+    ("rightKnee", "rightUpperLeg"),
+    ("rightLowerLeg", "rightKnee"),
+    ("rightFoot", "rightLowerLeg"),
+]
+SKELETON_BONE_INDICES = {bone_name: i for i, (bone_name, _) in enumerate(SKELETON_BONES)}
+# Parent index of every skeleton bone, -1 for the root
+BONE_PARENTS = np.array([-1 if parent is None else SKELETON_BONE_INDICES[parent] for _, parent in SKELETON_BONES])
+# BONE_CONNECTIONS index of every skeleton bone; -1 for the root, which
+# follows the root landmark instead
+BONE_CONNECTION_INDICES = np.array([CONNECTION_INDICES.get(bone_name, -1) for bone_name, _ in SKELETON_BONES])
+
+# (slot, attachment width before it is sized from the clip). Every slot sits
+# on the bone of the same name and holds one attachment, also of that name.
+SLOTS = [
+    ("hips", 50),
+    ("spine", 50),
+    ("chest", 50),
+    ("neck", 30),
+    ("head", 80),
+    ("leftUpperArm", 40),
+    ("leftForearm", 30),
+    ("leftHand", 30),
+    ("rightUpperArm", 40),
+    ("rightForearm", 30),
+    ("rightHand", 30),
+    ("leftUpperLeg", 60),
+    ("leftLowerLeg", 50),
+    ("leftFoot", 50),
+    ("rightUpperLeg", 60),
+    ("rightLowerLeg", 50),
+    ("rightFoot", 50),
+]
+SLOT_BONE_INDICES = np.array([SKELETON_BONE_INDICES[slot_name] for slot_name, _ in SLOTS])
+SLOT_CONNECTION_INDICES = np.array([CONNECTION_INDICES[slot_name] for slot_name, _ in SLOTS])
+SLOT_ATTACHMENT = "line"
+ATTACHMENT_HEIGHT = 5
+
+SPINE_VERSION = "4.2.35"
+SKELETON_SIZE = 1000
+SCALE_FACTOR = 500
+
+# .skel constants, as in the Spine runtimes' SkeletonBinary
+SKEL_BONE_ROTATE = 0
+SKEL_BONE_TRANSLATE = 1
+SKEL_CURVE_LINEAR = 0
+SKEL_ATTACHMENT_REGION = 0
+SKEL_REFERENCE_SCALE = 100
+
+def compute_bone_timelines(frame_numbers, coords, fps, scale_factor=500, bones=None):
+    # Every bone on every frame at once, from frames x 33 x (x, y, ...) landmarks.
+    # bones optionally restricts the result to those BONE_CONNECTIONS indices.
+    # atan2 and the squares go through the scalar libm calls (math.atan2,
+    # pow) rather than NumPy's SIMD versions, which can differ in the last
+    # bit, so the exported JSON stays byte-identical to per-bone math code.
+    positions = np.asarray(coords, dtype=np.float64)[:, :, :2] * scale_factor
+    root = positions[:, ROOT_INDEX]
+    bones = slice(None) if bones is None else bones
+    starts = positions[:, START_INDICES[bones]]
+    ends = positions[:, END_INDICES[bones]]
+
+    dx = (ends[..., 0] - starts[..., 0]).ravel().tolist()
+    dy = (ends[..., 1] - starts[..., 1]).ravel().tolist()
+    count = len(dx)
+    angles = np.degrees(np.fromiter(map(math.atan2, dy, dx), dtype=np.float64, count=count))
+    squares = (np.fromiter(map(pow, dx, repeat(2)), dtype=np.float64, count=count)
+               + np.fromiter(map(pow, dy, repeat(2)), dtype=np.float64, count=count))
+
+    return {
+        "times": np.asarray(frame_numbers) / fps,
+        "root": root,
+        "translate": starts - root[:, None, :],
+        "angles": angles.reshape(starts.shape[:2]),
+        "lengths": np.sqrt(squares).reshape(starts.shape[:2]),
+        "midpoints": (starts + ends) / 2 - root[:, None, :],
+    }
+
+class _LazyObject:
+    # A JSON object whose (key, value) pairs are only produced while writing
+    def __init__(self, items):
+        self.items = items
+
+class _Timeline:
+    # A JSON array of flat objects sharing the same keys, produced as chunks
+    # of value tuples
+    def __init__(self, keys, chunks):
+        self.keys = keys
+        self.chunks = chunks
+
+def _separators(indent, level):
+    # (before the first item, between items, before the closing bracket)
+    if indent is None:
+        return "", ",", ""
+    inner = "\n" + " " * (indent * (level + 1))
+    return inner, "," + inner, "\n" + " " * (indent * level)
+
+def _write_json(f, value, indent, level=0):
+    # Streams value to f. With an indent the output is byte-identical to
+    # json.dump(value, f, indent=indent); without one it is fully compact.
+    if isinstance(value, (dict, _LazyObject)):
+        _write_object(f, value.items() if isinstance(value, dict) else value.items, indent, level)
+    elif isinstance(value, _Timeline):
+        _write_timeline(f, value, indent, level)
+    elif indent is None:
+        f.write(json.dumps(value, separators=(",", ":")))
+    else:
+        f.write(json.dumps(value, indent=indent).replace("\n", "\n" + " " * (indent * level)))
+
+def _write_object(f, items, indent, level):
+    first, separator, close = _separators(indent, level)
+    key_separator = ":" if indent is None else ": "
+    empty = True
+    for key, item in items:
+        f.write("{" + first if empty else separator)
+        empty = False
+        f.write(json.dumps(key) + key_separator)
+        _write_json(f, item, indent, level + 1)
+    f.write("{}" if empty else close + "}")
+
+def _write_timeline(f, timeline, indent, level):
+    first, separator, close = _separators(indent, level)
+    # Keyframes are formatted from a template; %r matches json's float repr
+    key_first, key_separator, key_close = _separators(indent, level + 1)
+    value_separator = ":" if indent is None else ": "
+    template = "{" + key_first + key_separator.join(
+        json.dumps(key) + value_separator + "%r" for key in timeline.keys
+    ) + key_close + "}"
+
+    empty = True
+    for rows in timeline.chunks:
+        if not rows:
+            continue
+        f.write("[" + first if empty else separator)
+        empty = False
+        f.write(separator.join([template % row for row in rows]))
+    f.write("[]" if empty else close + "]")
+
+def _bone_curves(frame_numbers, coords, fps, scale_factor, bone, channel, chunk_frames, tolerance):
+    # Chunks of (times, values) arrays for one timeline, values being frames
+    # x 1 angles or frames x 2 translations. bone is a BONE_CONNECTIONS index,
+    # or None for the root's motion. Only chunk_frames frames are held at a
+    # time unless keyframe reduction needs the whole curve.
+    def chunks():
+        for start in range(0, len(frame_numbers), chunk_frames):
+            end = start + chunk_frames
+            timelines = compute_bone_timelines(
+                frame_numbers[start:end], coords[start:end], fps, scale_factor,
+                bones=[] if bone is None else [bone]
+            )
+            if bone is None:
+                values = timelines["root"]
+            elif channel == "rotate":
+                values = timelines["angles"]
+            else:
+                values = timelines["translate"][:, 0]
+            yield timelines["times"], values
+
+    if tolerance is None:
+        yield from chunks()
+        return
+
+    pieces = list(chunks())
+    if not pieces:
+        return
+    times = np.concatenate([times for times, _ in pieces])
+    values = np.concatenate([values for _, values in pieces])
+    keep = simplify_keyframes(times, values, tolerance)
+    yield times[keep], values[keep]
+
+def _bone_keyframes(frame_numbers, coords, fps, scale_factor, bone, channel, chunk_frames, tolerance):
+    # The same chunks as keyframe tuples, for the JSON writer
+    for times, values in _bone_curves(frame_numbers, coords, fps, scale_factor, bone, channel, chunk_frames, tolerance):
+        yield list(zip(times.tolist(), *values.T.tolist()))
+
+def _bone_channels(bone):
+    # (channel, BONE_CONNECTIONS index or None for the root's motion) of each
+    # animated timeline of a skeleton bone
+    connection = BONE_CONNECTION_INDICES[bone].item()
+    if connection < 0:
+        return [("translate", None)]
+    return [("translate", connection), ("rotate", connection)]
+
+def _attachments(frame_numbers, coords, fps, scale_factor):
+    # (x, y, width, height) of every slot's attachment, sized from the last
+    # frame; the default sizes when there are no frames
+    if not len(frame_numbers):
+        return [(0, 0, width, ATTACHMENT_HEIGHT) for _, width in SLOTS]
+    last = compute_bone_timelines(frame_numbers[-1:], coords[-1:], fps, scale_factor, bones=SLOT_CONNECTION_INDICES)
+    midpoints = last["midpoints"][0].tolist()
+    lengths = last["lengths"][0].tolist()
+    return [(x, y, length, length / 2) for (x, y), length in zip(midpoints, lengths)]
+
+def convert_to_spine(input_file, output_file, tolerance=None, compact=False, chunk_frames=4096):
+    # The document is streamed to disk: the header first, then one bone timeline
+    # at a time computed chunk by chunk, so memory stays flat however long the
+    # clip is (.npz landmarks are memory-mapped). tolerance enables keyframe
+    # reduction: the largest allowed error of the linearly interpolated curve,
+    # in Spine units for translations and degrees for rotations. compact drops
+    # the indentation. A .skel output_file gets Spine's binary format instead.
+    if output_file.endswith(".skel"):
+        return convert_to_spine_binary(input_file, output_file, tolerance=tolerance, chunk_frames=chunk_frames)
+
+    fps, frame_numbers, coords = open_landmarks(input_file, output_format="spine")
 
     spine_data = {
-        "skeleton": {"hash": " ", "spine": "4.2.35", "width": 1000, "height": 1000},
+        "skeleton": {"hash": " ", "spine": SPINE_VERSION, "width": SKELETON_SIZE, "height": SKELETON_SIZE},
         "bones": [
-            {"name": "root"},
-            {"name": "hips", "parent": "root"},
-            {"name": "leftHip", "parent": "hips"},
-            {"name": "rightHip", "parent": "hips"},
-            {"name": "spine", "parent": "hips"},
-            {"name": "chest", "parent": "spine"},
-            {"name": "neck", "parent": "chest"},
-            {"name": "head", "parent": "neck"},
-            {"name": "leftShoulder", "parent": "chest"},
-            {"name": "leftUpperArm", "parent": "leftShoulder"},
-            {"name": "leftElbow", "parent": "leftUpperArm"},
-            {"name": "leftForearm", "parent": "leftElbow"},
-            {"name": "leftHand", "parent": "leftForearm"},
-            {"name": "rightShoulder", "parent": "chest"},
-            {"name": "rightUpperArm", "parent": "rightShoulder"},
-            {"name": "rightElbow", "parent": "rightUpperArm"},
-            {"name": "rightForearm", "parent": "rightElbow"},
-            {"name": "rightHand", "parent": "rightForearm"},
-            {"name": "leftUpperLeg", "parent": "leftHip"},
-            {"name": "leftKnee", "parent": "leftUpperLeg"},
-            {"name": "leftLowerLeg", "parent": "leftKnee"},
-            {"name": "leftFoot", "parent": "leftLowerLeg"},
-            {"name": "rightUpperLeg", "parent": "rightHip"},
-            {"name": "rightKnee", "parent": "rightUpperLeg"},
-            {"name": "rightLowerLeg", "parent": "rightKnee"},
-            {"name": "rightFoot", "parent": "rightLowerLeg"},
-        ],
-        "slots": [
-            {"name": "hips", "bone": "hips", "attachment": "line"},
-            {"name": "spine", "bone": "spine", "attachment": "line"},
-            {"name": "chest", "bone": "chest", "attachment": "line"},
-            {"name": "neck", "bone": "neck", "attachment": "line"},
-            {"name": "head", "bone": "head", "attachment": "line"},
-            {"name": "leftUpperArm", "bone": "leftUpperArm", "attachment": "line"},
-            {"name": "leftForearm", "bone": "leftForearm", "attachment": "line"},
-            {"name": "leftHand", "bone": "leftHand", "attachment": "line"},
-            {"name": "rightUpperArm", "bone": "rightUpperArm", "attachment": "line"},
-            {"name": "rightForearm", "bone": "rightForearm", "attachment": "line"},
-            {"name": "rightHand", "bone": "rightHand", "attachment": "line"},
-            {"name": "leftUpperLeg", "bone": "leftUpperLeg", "attachment": "line"},
-            {"name": "leftLowerLeg", "bone": "leftLowerLeg", "attachment": "line"},
-            {"name": "leftFoot", "bone": "leftFoot", "attachment": "line"},
-            {"name": "rightUpperLeg", "bone": "rightUpperLeg", "attachment": "line"},
-            {"name": "rightLowerLeg", "bone": "rightLowerLeg", "attachment": "line"},
-            {"name": "rightFoot", "bone": "rightFoot", "attachment": "line"},
+            {"name": bone_name} if parent is None else {"name": bone_name, "parent": parent}
+            for bone_name, parent in SKELETON_BONES
         ],
+        "slots": [{"name": slot_name, "bone": slot_name, "attachment": SLOT_ATTACHMENT} for slot_name, _ in SLOTS],
         "skins": {
             "default": {
-                "hips": {"hips": {"x": 0, "y": 0, "scaleX": 1, "scaleY": 1, "rotation": 0, "width": 50, "height": 5}},
-                "spine": {"spine": {"x": 0, "y": 0, "scaleX": 1, "scaleY": 1, "rotation": 0, "width": 50, "height": 5}},
-                "chest": {"chest": {"x": 0, "y": 0, "scaleX": 1, "scaleY": 1, "rotation": 0, "width": 50, "height": 5}},
-                "neck": {"neck": {"x": 0, "y": 0, "scaleX": 1, "scaleY": 1, "rotation": 0, "width": 30, "height": 5}},
-                "head": {"head": {"x": 0, "y": 0, "scaleX": 1, "scaleY": 1, "rotation": 0, "width": 80, "height": 5}},
-                "leftUpperArm": {"leftUpperArm": {"x": 0, "y": 0, "scaleX": 1, "scaleY": 1, "rotation": 0, "width": 40, "height": 5}},
-                "leftForearm": {"leftForearm": {"x": 0, "y": 0, "scaleX": 1, "scaleY": 1, "rotation": 0, "width": 30, "height": 5}},
-                "leftHand": {"leftHand": {"x": 0, "y": 0, "scaleX": 1, "scaleY": 1, "rotation": 0, "width": 30, "height": 5}},
-                "rightUpperArm": {"rightUpperArm": {"x": 0, "y": 0, "scaleX": 1, "scaleY": 1, "rotation": 0, "width": 40, "height": 5}},
-                "rightForearm": {"rightForearm": {"x": 0, "y": 0, "scaleX": 1, "scaleY": 1, "rotation": 0, "width": 30, "height": 5}},
-                "rightHand": {"rightHand": {"x": 0, "y": 0, "scaleX": 1, "scaleY": 1, "rotation": 0, "width": 30, "height": 5}},
-                "leftUpperLeg": {"leftUpperLeg": {"x": 0, "y": 0, "scaleX": 1, "scaleY": 1, "rotation": 0, "width": 60, "height": 5}},
-                "leftLowerLeg": {"leftLowerLeg": {"x": 0, "y": 0, "scaleX": 1, "scaleY": 1, "rotation": 0, "width": 50, "height": 5}},
-                "leftFoot": {"leftFoot": {"x": 0, "y": 0, "scaleX": 1, "scaleY": 1, "rotation": 0, "width": 50, "height": 5}},
-                "rightUpperLeg": {"rightUpperLeg": {"x": 0, "y": 0, "scaleX": 1, "scaleY": 1, "rotation": 0, "width": 60, "height": 5}},
-                "rightLowerLeg": {"rightLowerLeg": {"x": 0, "y": 0, "scaleX": 1, "scaleY": 1, "rotation": 0, "width": 50, "height": 5}},
-                "rightFoot": {"rightFoot": {"x": 0, "y": 0, "scaleX": 1, "scaleY": 1, "rotation": 0, "width": 50, "height": 5}},
+                slot_name: {slot_name: {"x": x, "y": y, "scaleX": 1, "scaleY": 1, "rotation": 0, "width": width, "height": height}}
+                for (slot_name, _), (x, y, width, height) in zip(SLOTS, _attachments(frame_numbers, coords, fps, SCALE_FACTOR))
             }
         },
         "animations": {"animation": {"bones": {}}}
     }
 
-    fps = data["fps"]
-    frames = data["frames"]
-    scale_factor = 500
-
-    for bone in spine_data["bones"]:
-        spine_data["animations"]["animation"]["bones"][bone["name"]] = {"translate": [], "rotate": []}
-
-    bone_connections = [
-        ("hips", 23, 24),
-        ("leftHip", 23, 23),
-        ("rightHip", 24, 24),
-        ("spine", 23, 11),
-        ("chest", 11, 12),
-        ("neck", 12, 0),
-        ("head", 0, 0),
-        ("leftShoulder", 11, 13),
-        ("leftUpperArm", 13, 15),
-        ("leftElbow", 15, 15),
-        ("leftForearm", 15, 17),
-        ("leftHand", 17, 19),
-        ("rightShoulder", 12, 14),
-        ("rightUpperArm", 14, 16),
-        ("rightElbow", 16, 16),
-        ("rightForearm", 16, 18),
-        ("rightHand", 18, 20),
-        ("leftUpperLeg", 23, 25),
-        ("leftKnee", 25, 25),
-        ("leftLowerLeg", 25, 27),
-        ("leftFoot", 27, 31),
-        ("rightUpperLeg", 24, 26),
-        ("rightKnee", 26, 26),
-        ("rightLowerLeg", 26, 28),
-        ("rightFoot", 28, 32),
-    ]
-
-    for frame in frames:
-        frame_num = frame["frame"]
-        time = frame_num / fps
-        landmarks = frame["landmarks"]
-
-        def get_pos(index):
-            return {
-                "x": landmarks[index]["x"] * scale_factor,
-                "y": landmarks[index]["y"] * scale_factor
-            }
+    def timeline(bone, channel):
+        keys = ("time", "angle") if channel == "rotate" else ("time", "x", "y")
+        return _Timeline(keys, _bone_keyframes(frame_numbers, coords, fps, SCALE_FACTOR, bone, channel, chunk_frames, tolerance))
+
+    def bone_timelines():
+        for i, (bone_name, _) in enumerate(SKELETON_BONES):
+            channels = {"translate": [], "rotate": []}
+            for channel, connection in _bone_channels(i):
+                channels[channel] = timeline(connection, channel)
+            yield bone_name, channels
 
-        root_position = get_pos(23)  # Use left hip as root
-
-        for bone_name, start_idx, end_idx in bone_connections:
-            start = get_pos(start_idx)
-            end = get_pos(end_idx)
-            
-            angle = calculate_angle(start, end)
-            length = calculate_length(start, end)
-            
-            spine_data["animations"]["animation"]["bones"][bone_name]["translate"].append({
-                "time": time,
-                "x": start["x"] - root_position["x"],
-                "y": start["y"] - root_position["y"]
-            })
-            spine_data["animations"]["animation"]["bones"][bone_name]["rotate"].append({
-                "time": time,
-                "angle": angle
-            })
-
-            # Update attachment position and size based on landmarks
-            if bone_name in spine_data["skins"]["default"]:
-                attachment = spine_data["skins"]["default"][bone_name][bone_name]
-                attachment["x"] = (start["x"] + end["x"]) / 2 - root_position["x"]
-                attachment["y"] = (start["y"] + end["y"]) / 2 - root_position["y"]
-                attachment["width"] = length
-                attachment["height"] = length / 2
-
-        # Set root motion
-        spine_data["animations"]["animation"]["bones"]["root"]["translate"].append({
-            "time": time,
-            "x": root_position["x"],
-            "y": root_position["y"]
-        })
-
-    with open(output_file, 'w') as f:
-        json.dump(spine_data, f, indent=2)
+    spine_data["animations"]["animation"]["bones"] = _LazyObject(bone_timelines())
+
+    with open(output_file, 'w', buffering=1024 * 1024) as f:
+        _write_json(f, spine_data, None if compact else 2)
 
     print(f"Spine animation data saved to {output_file}")
+
+def _varint(value):
+    # Unsigned LEB128, as read by readInt(true) in the Spine runtimes
+    out = bytearray()
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+def _skel_string(value):
+    # Length + 1 (0 is null), then UTF-8
+    if value is None:
+        return _varint(0)
+    data = value.encode("utf-8")
+    return _varint(len(data) + 1) + data
+
+def _skel_floats(*values):
+    return struct.pack(f">{len(values)}f", *values)
+
+def _skel_frames(times, values, first):
+    # Keyframes as big-endian float32 time and values, each but the timeline's
+    # first one followed by the curve type of the segment leading to it
+    records = np.empty(len(times), dtype=[("time", ">f4"), ("values", ">f4", values.shape[1]), ("curve", "u1")])
+    records["time"] = times
+    records["values"] = values
+    records["curve"] = SKEL_CURVE_LINEAR
+    data = records.tobytes()
+    if first:
+        size = records.dtype.itemsize
+        data = data[:size - 1] + data[size:]
+    return data
+
+def convert_to_spine_binary(input_file, output_file, tolerance=None, chunk_frames=4096):
+    # The same skeleton and animation as convert_to_spine, in the Spine 4.2
+    # binary format, which runtimes load faster than JSON and which is several
+    # times smaller. Names used as references (attachments) go in the string
+    # table; curves are linear, like the JSON's. Each timeline is buffered only
+    # until its frame count is known, as that comes first.
+    fps, frame_numbers, coords = open_landmarks(input_file, output_format="spine")
+
+    strings = [SLOT_ATTACHMENT] + [slot_name for slot_name, _ in SLOTS]
+    string_refs = {name: i + 1 for i, name in enumerate(strings)}
+
+    with open(output_file, 'wb', buffering=1024 * 1024) as f:
+        # Header: hash (none), version, bounds, reference scale, no nonessential data
+        f.write(bytes(8) + _skel_string(SPINE_VERSION))
+        f.write(_skel_floats(0, 0, SKELETON_SIZE, SKELETON_SIZE, SKEL_REFERENCE_SCALE) + b"\0")
+        f.write(_varint(len(strings)) + b"".join(_skel_string(name) for name in strings))
+
+        # Bones in setup pose: rotation, x, y, scale x/y, shear x/y, length,
+        # then normal inheritance and not skin-specific
+        f.write(_varint(len(SKELETON_BONES)))
+        for bone_name, parent in zip([bone_name for bone_name, _ in SKELETON_BONES], BONE_PARENTS.tolist()):
+            f.write(_skel_string(bone_name) + (b"" if parent < 0 else _varint(parent)))
+            f.write(_skel_floats(0, 0, 0, 1, 1, 0, 0, 0) + _varint(0) + b"\0")
+
+        # Slots: white, no dark color, normal blending
+        f.write(_varint(len(SLOTS)))
+        for (slot_name, _), bone in zip(SLOTS, SLOT_BONE_INDICES.tolist()):
+            f.write(_skel_string(slot_name) + _varint(bone) + struct.pack(">Ii", 0xFFFFFFFF, -1))
+            f.write(_varint(string_refs[SLOT_ATTACHMENT]) + _varint(0))
+
+        # No IK, transform, path or physics constraints
+        f.write(_varint(0) * 4)
+
+        # Default skin: one region attachment per slot, then no other skins
+        attachments = _attachments(frame_numbers, coords, fps, SCALE_FACTOR)
+        f.write(_varint(len(SLOTS)))
+        for i, ((slot_name, _), (x, y, width, height)) in enumerate(zip(SLOTS, attachments)):
+            f.write(_varint(i) + _varint(1) + _varint(string_refs[slot_name]) + bytes([SKEL_ATTACHMENT_REGION]))
+            f.write(_skel_floats(x, y, 1, 1, width, height))
+        f.write(_varint(0))
+
+        # No events; one animation
+        f.write(_varint(0) + _varint(1) + _skel_string("animation"))
+        animated = [(i, _bone_channels(i)) for i in range(len(SKELETON_BONES))] if len(frame_numbers) else []
+        f.write(_varint(sum(len(channels) for _, channels in animated)))
+        # Slot timelines, then bone timelines
+        f.write(_varint(0) + _varint(len(animated)))
+        for bone, channels in animated:
+            f.write(_varint(bone) + _varint(len(channels)))
+            for channel, connection in channels:
+                pieces = []
+                frame_count = 0
+                for times, values in _bone_curves(frame_numbers, coords, fps, SCALE_FACTOR, connection, channel, chunk_frames, tolerance):
+                    pieces.append(_skel_frames(times, values, not frame_count))
+                    frame_count += len(times)
+                timeline_type = SKEL_BONE_ROTATE if channel == "rotate" else SKEL_BONE_TRANSLATE
+                # No bezier curves
+                f.write(bytes([timeline_type]) + _varint(frame_count) + _varint(0))
+                f.writelines(pieces)
+        # No IK, transform, path, physics, attachment, draw order or event timelines
+        f.write(_varint(0) * 7)
+
+    print(f"Spine binary skeleton saved to {output_file}")
+
 # Usage
-# convert_to_spine("landmarks_output.json", "spine_animation.json")
\ No newline at end of file
+# convert_to_spine("landmarks_output.npz", "spine_animation.json")
+# convert_to_spine("landmarks_output.npz", "spine_animation.skel")
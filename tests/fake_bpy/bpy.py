@@ -0,0 +1,143 @@
+# Just enough of Blender's bpy for the generated conversion script to run
+# outside Blender. Everything the script creates is kept on this module, so
+# tests reload it for a clean scene.
+import types
+
+import numpy as np
+
+class Keyframe:
+    def __init__(self, co):
+        self.co = co
+        self.interpolation = 'BEZIER'
+
+class KeyframePoints:
+    def __init__(self):
+        self.co = np.zeros((0, 2), dtype=np.float32)
+        self.points = []
+
+    def add(self, count):
+        self.co = np.concatenate([self.co, np.zeros((count, 2), dtype=np.float32)])
+        self.points.extend(Keyframe(None) for _ in range(count))
+
+    def foreach_set(self, attribute, values):
+        if attribute != "co":
+            raise AttributeError(attribute)
+        values = np.asarray(values, dtype=np.float32)
+        if values.size != self.co.size:
+            raise RuntimeError(f"foreach_set got {values.size} values for {self.co.size}")
+        self.co = values.reshape(self.co.shape).copy()
+        for point, co in zip(self.points, self.co):
+            point.co = tuple(co.tolist())
+
+    def __len__(self):
+        return len(self.points)
+
+    def __iter__(self):
+        return iter(self.points)
+
+class FCurve:
+    def __init__(self, data_path, index, action_group):
+        self.data_path = data_path
+        self.array_index = index
+        self.group = action_group
+        self.keyframe_points = KeyframePoints()
+        self.updated = False
+
+    def update(self):
+        self.updated = True
+
+class FCurves(list):
+    def new(self, data_path, index=0, action_group=""):
+        if any(fcurve.data_path == data_path and fcurve.array_index == index for fcurve in self):
+            raise RuntimeError(f"F-Curve {data_path}[{index}] already exists")
+        fcurve = FCurve(data_path, index, action_group)
+        self.append(fcurve)
+        return fcurve
+
+class Action:
+    def __init__(self, name):
+        self.name = name
+        self.fcurves = FCurves()
+
+class EditBone:
+    def __init__(self, name):
+        self.name = name
+        self.head = (0.0, 0.0, 0.0)
+        self.tail = (0.0, 0.0, 0.0)
+        self.parent = None
+
+class EditBones(dict):
+    def new(self, name):
+        if data.mode != 'EDIT':
+            raise RuntimeError("Edit bones need edit mode")
+        bone = self[name] = EditBone(name)
+        return bone
+
+class Armature:
+    def __init__(self, name):
+        self.name = name
+        self.edit_bones = EditBones()
+
+class PoseBone:
+    def __init__(self, name):
+        self.name = name
+        self.rotation_mode = 'XYZ'
+
+class PoseBones:
+    def __init__(self, armature):
+        self.armature = armature
+        self.bones = {}
+
+    def __getitem__(self, name):
+        if name not in self.armature.edit_bones:
+            raise KeyError(name)
+        return self.bones.setdefault(name, PoseBone(name))
+
+    def __contains__(self, name):
+        return name in self.armature.edit_bones
+
+class Object:
+    def __init__(self, name, object_data):
+        self.name = name
+        self.data = object_data
+        self.rotation_euler = (0.0, 0.0, 0.0)
+        self.animation_data = None
+        self.pose = types.SimpleNamespace(bones=PoseBones(object_data))
+
+    def animation_data_create(self):
+        self.animation_data = types.SimpleNamespace(action=None)
+        return self.animation_data
+
+class Collection(dict):
+    def __init__(self, factory):
+        super().__init__()
+        self.factory = factory
+
+    def new(self, name, *args):
+        item = self[name] = self.factory(name, *args)
+        return item
+
+data = types.SimpleNamespace(
+    armatures=Collection(Armature),
+    objects=Collection(Object),
+    actions=Collection(Action),
+    mode='OBJECT',
+    saved=[],
+)
+
+scene_objects = []
+context = types.SimpleNamespace(
+    scene=types.SimpleNamespace(collection=types.SimpleNamespace(objects=types.SimpleNamespace(link=scene_objects.append))),
+    view_layer=types.SimpleNamespace(objects=types.SimpleNamespace(active=None)),
+)
+
+def _mode_set(mode):
+    data.mode = mode
+
+def _save_as_mainfile(filepath):
+    data.saved.append(filepath)
+
+ops = types.SimpleNamespace(
+    object=types.SimpleNamespace(mode_set=_mode_set),
+    wm=types.SimpleNamespace(save_as_mainfile=_save_as_mainfile),
+)
@@ -0,0 +1,17 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from batch_processor import create_output_dir
+
+def test_create_output_dir_suffixes_taken_names(tmp_path):
+    path = str(tmp_path / "output_spine" / "clip_20260101_120000")
+    assert create_output_dir(path) == path
+    assert create_output_dir(path) == path + "_1"
+    assert create_output_dir(path) == path + "_2"
+
+def test_create_output_dir_is_unique_across_threads(tmp_path):
+    path = str(tmp_path / "output_blender" / "clip_20260101_120000")
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        created = list(pool.map(lambda _: create_output_dir(path), range(16)))
+    assert len(set(created)) == 16
+    assert all(os.path.isdir(directory) for directory in created)
@@ -0,0 +1,79 @@
+import importlib
+import os
+import runpy
+import sys
+
+import numpy as np
+import pytest
+
+from blender_converter import BONE_STRUCTURE, generate_blender_script
+from landmarks import LANDMARK_COUNT, save_landmarks
+
+FAKE_BPY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_bpy")
+
+@pytest.fixture
+def bpy(monkeypatch):
+    # A fresh fake bpy per test, so scenes don't leak between runs
+    monkeypatch.syspath_prepend(FAKE_BPY_DIR)
+    sys.modules.pop("bpy", None)
+    module = importlib.import_module("bpy")
+    yield module
+    sys.modules.pop("bpy", None)
+
+def write_landmarks(path, frames=12):
+    rng = np.random.default_rng(0)
+    frame_numbers = np.arange(frames, dtype=np.int32) * 2
+    raw = rng.uniform(0.2, 0.8, (frames, LANDMARK_COUNT, 4)).astype(np.float32)
+    save_landmarks(path, 30, frame_numbers, raw, "blender")
+    return frame_numbers
+
+def run_script(script_path):
+    runpy.run_path(script_path, run_name="__main__")
+
+@pytest.mark.parametrize("tolerance", [None, 0.01])
+def test_generated_script_sets_keyframes(tmp_path, bpy, tolerance):
+    landmarks_path = str(tmp_path / "landmarks.npz")
+    frame_numbers = write_landmarks(landmarks_path)
+    blend_path = str(tmp_path / "blender_animation.blend")
+    script_path = generate_blender_script(landmarks_path, blend_path, tolerance=tolerance)
+
+    run_script(script_path)
+
+    armature_object = bpy.data.objects["MediaPipeArmature"]
+    assert sorted(armature_object.data.edit_bones) == sorted(BONE_STRUCTURE)
+    assert bpy.data.saved == [os.path.abspath(blend_path)]
+
+    action = armature_object.animation_data.action
+    fcurves = {(fcurve.data_path, fcurve.array_index): fcurve for fcurve in action.fcurves}
+    with np.load(tmp_path / "blender_animation_data.npz") as animation:
+        expected = 0
+        for bone_name in BONE_STRUCTURE:
+            for data_path, channels in (("location", 3), ("rotation_quaternion", 4)):
+                key = f"{bone_name}.{data_path}"
+                if key not in animation:
+                    continue
+                frames = animation[key + "_frames"]
+                values = animation[key]
+                if tolerance is None:
+                    np.testing.assert_array_equal(frames, frame_numbers)
+                for index in range(channels):
+                    fcurve = fcurves[(f'pose.bones["{bone_name}"].{data_path}', index)]
+                    expected += 1
+                    assert fcurve.updated
+                    np.testing.assert_array_equal(fcurve.keyframe_points.co[:, 0], frames)
+                    np.testing.assert_array_equal(fcurve.keyframe_points.co[:, 1], values[:, index])
+                    interpolation = {point.interpolation for point in fcurve.keyframe_points}
+                    assert interpolation == ({'BEZIER'} if tolerance is None else {'LINEAR'})
+                if data_path == "rotation_quaternion":
+                    assert armature_object.pose.bones[bone_name].rotation_mode == 'QUATERNION'
+        assert expected and len(action.fcurves) == expected
+
+def test_generated_script_without_frames(tmp_path, bpy, capsys):
+    landmarks_path = str(tmp_path / "landmarks.npz")
+    write_landmarks(landmarks_path, frames=0)
+    script_path = generate_blender_script(landmarks_path, str(tmp_path / "out.blend"))
+
+    run_script(script_path)
+
+    assert not bpy.data.objects and not bpy.data.saved
+    assert "No frame data" in capsys.readouterr().out
@@ -0,0 +1,96 @@
+import io
+import json
+
+import pytest
+
+from cli import ProgressReporter
+
+def test_event_writes_json_lines():
+    stream = io.StringIO()
+    reporter = ProgressReporter(stream)
+    reporter.event("landmarks", record={"frame": 3, "time": 12.5})
+    event = json.loads(stream.getvalue())
+    assert event["event"] == "landmarks"
+    assert event["record"] == {"frame": 3, "time": 12.5}
+
+def test_event_rejects_reserved_fields():
+    reporter = ProgressReporter(io.StringIO())
+    with pytest.raises(ValueError):
+        reporter.event("landmarks", time=1.0)
+
+def run_cli(argv, capsys):
+    from cli import main
+    code = main(argv)
+    events = [json.loads(line) for line in capsys.readouterr().out.splitlines() if line.startswith("{")]
+    return code, events
+
+def write_landmarks(path, frames=5):
+    import numpy as np
+    from landmarks import LANDMARK_COUNT, save_landmarks
+    raw = np.random.default_rng(0).uniform(0.2, 0.8, (frames, LANDMARK_COUNT, 4)).astype(np.float32)
+    save_landmarks(str(path), 30, np.arange(frames, dtype=np.int32), raw, "spine")
+
+def test_render_draws_without_a_pose_model(tmp_path, capsys, monkeypatch):
+    import mediapipe as mp
+
+    def no_pose(*args, **kwargs):
+        raise AssertionError("render built a pose model")
+
+    monkeypatch.setattr(mp.solutions.pose, "Pose", no_pose)
+    write_landmarks(tmp_path / "landmarks.npz")
+    skeleton_video = tmp_path / "skeleton.mp4"
+    code, events = run_cli(["render", str(tmp_path / "landmarks.npz"), "--skeleton-video", str(skeleton_video),
+                            "--width", "64", "--height", "48"], capsys)
+    assert code == 0
+    assert events[-1]["event"] == "done" and events[-1]["skeleton_frames"] == 5
+    assert skeleton_video.stat().st_size > 0
+
+def test_render_rejects_json_landmarks(tmp_path, capsys):
+    from cli import EXIT_USAGE
+    landmarks = tmp_path / "landmarks.json"
+    landmarks.write_text(json.dumps({"fps": 30, "frames": []}))
+    code, events = run_cli(["render", str(landmarks), "--skeleton-video", str(tmp_path / "out.mp4"),
+                            "--width", "64", "--height", "48"], capsys)
+    assert code == EXIT_USAGE
+    assert events[-1]["event"] == "error" and "landmarks.npz" in events[-1]["message"]
+    assert not (tmp_path / "out.mp4").exists()
+
+def test_process_with_json_landmarks_and_json_export(tmp_path, capsys, monkeypatch):
+    import types
+    import cv2
+    import mediapipe as mp
+    import numpy as np
+    from mediapipe.framework.formats import landmark_pb2
+
+    class FakePose:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def process(self, rgb):
+            landmarks = landmark_pb2.NormalizedLandmarkList()
+            for i in range(33):
+                landmark = landmarks.landmark.add()
+                landmark.x, landmark.y, landmark.visibility = 0.2 + 0.01 * i, 0.3 + 0.01 * i, 0.9
+            return types.SimpleNamespace(pose_landmarks=landmarks)
+
+        def reset(self):
+            pass
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(mp.solutions.pose, "Pose", FakePose)
+    clip = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(clip, cv2.VideoWriter_fourcc(*"MJPG"), 30, (64, 48))
+    for _ in range(6):
+        writer.write(np.zeros((48, 64, 3), dtype=np.uint8))
+    writer.release()
+
+    landmarks = str(tmp_path / "out" / "landmarks.json")
+    code, events = run_cli(["process", clip, "--format", "spine", "--output-dir", str(tmp_path / "out"),
+                            "--landmarks", landmarks, "--json", "--no-cache", "--no-videos", "--no-visualize"], capsys)
+    assert code == 0
+    outputs = events[-1]["outputs"]
+    assert outputs["landmarks_json"] == landmarks
+    with open(landmarks) as f:
+        assert len(json.load(f)["frames"]) == 6
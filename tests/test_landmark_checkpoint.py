@@ -0,0 +1,105 @@
+import types
+
+import cv2
+import numpy as np
+import pytest
+
+mp = pytest.importorskip("mediapipe")
+from mediapipe.framework.formats import landmark_pb2
+
+from landmark_checkpoint import LandmarkCheckpoint, open_checkpoint
+from landmarks import LANDMARK_COUNT, load_landmark_array
+from video_processor import VideoProcessor
+
+FRAMES = 60
+DROPOUTS = {7, 31, 32}
+# Frame brightness encodes the frame number, in steps that survive encoding
+LEVEL = 4
+
+class FakePose:
+    # Landmarks that depend only on the frame number, so a resumed run can be
+    # compared with an uninterrupted one. crash_after makes process raise
+    # after that many calls, like a run that dies part way.
+    crash_after = None
+    calls = 0
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def process(self, rgb):
+        FakePose.calls += 1
+        if FakePose.crash_after is not None and FakePose.calls > FakePose.crash_after:
+            raise RuntimeError("pose model crashed")
+        index = int(round(float(rgb.mean()) / LEVEL))
+        if index in DROPOUTS:
+            return types.SimpleNamespace(pose_landmarks=None)
+        landmarks = landmark_pb2.NormalizedLandmarkList()
+        for i in range(33):
+            landmark = landmarks.landmark.add()
+            landmark.x = 0.2 + 0.01 * i + 0.004 * index
+            landmark.y = 0.3 + 0.01 * i - 0.002 * index
+            landmark.z = 0.001 * index
+            landmark.visibility = 0.9
+        return types.SimpleNamespace(pose_landmarks=landmarks)
+
+    def reset(self):
+        pass
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def clip(tmp_path, monkeypatch):
+    monkeypatch.setattr(mp.solutions.pose, "Pose", FakePose)
+    monkeypatch.setattr(FakePose, "crash_after", None)
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 30, (64, 48))
+    for index in range(FRAMES):
+        writer.write(np.full((48, 64, 3), index * LEVEL, dtype=np.uint8))
+    writer.release()
+    return path
+
+def run(clip, output, stride=1, checkpoint_dir=None, crash_after=None):
+    FakePose.calls = 0
+    FakePose.crash_after = crash_after
+    VideoProcessor().process_video(clip, output, None, None, "spine", sample_stride=stride,
+                                   checkpoint_dir=checkpoint_dir, checkpoint_interval=10)
+    _, frame_numbers, raw, _ = load_landmark_array(output, mmap=False)
+    return frame_numbers, raw
+
+@pytest.mark.parametrize("stride", [1, 3])
+def test_resume_matches_an_uninterrupted_run(clip, tmp_path, stride):
+    expected_frames, expected = run(clip, str(tmp_path / "reference.npz"), stride)
+    checkpoint_dir = tmp_path / "checkpoints"
+
+    with pytest.raises(RuntimeError):
+        run(clip, str(tmp_path / "crashed.npz"), stride, str(checkpoint_dir), crash_after=25 // stride)
+    (checkpoint_path,) = checkpoint_dir.iterdir()
+    # A write cut short by the crash
+    with open(checkpoint_path, 'a') as f:
+        f.write('{"frames": [40, 4')
+
+    frame_numbers, raw = run(clip, str(tmp_path / "resumed.npz"), stride, str(checkpoint_dir))
+    # Only the frames after the last checkpoint went through the model again
+    assert FakePose.calls < FRAMES // stride
+    np.testing.assert_array_equal(frame_numbers, expected_frames)
+    np.testing.assert_array_equal(raw, expected)
+    assert not list(checkpoint_dir.iterdir())
+
+def test_checkpoint_round_trip_and_header_mismatch(clip, tmp_path):
+    checkpoint = open_checkpoint(str(tmp_path), clip, {"model_complexity": 1})
+    assert not checkpoint.load()
+    values = np.random.default_rng(0).random((3, LANDMARK_COUNT, 4)).astype(np.float32)
+    checkpoint.append([0, 1], values[:2], resume_frame=2)
+    checkpoint.append([4], values[2:], resume_frame=6)
+
+    reloaded = open_checkpoint(str(tmp_path), clip, {"model_complexity": 1})
+    assert reloaded.load()
+    assert reloaded.resume_frame == 6
+    assert reloaded.frame_numbers.tolist() == [0, 1, 4]
+    np.testing.assert_array_equal(reloaded.landmarks, values)
+
+    # Same file, other settings: nothing to resume, and the file starts over
+    mismatched = LandmarkCheckpoint(checkpoint.path, dict(checkpoint.header, settings={"model_complexity": 2}))
+    assert not mismatched.load()
+    assert not open_checkpoint(str(tmp_path), clip, {"model_complexity": 1}).load()
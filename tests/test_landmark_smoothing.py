@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from landmark_smoothing import savgol_smooth, smooth_landmarks
+
+def landmarks(frames, seed=0):
+    rng = np.random.default_rng(seed)
+    raw = rng.uniform(0.0, 1.0, (frames, 33, 4)).astype(np.float32)
+    raw[..., 3] = rng.uniform(0.5, 1.0, (frames, 33))
+    return raw
+
+def test_savgol_matches_scipy_on_full_visibility():
+    signal = pytest.importorskip("scipy.signal")
+    raw = landmarks(40)
+    raw[..., 3] = 1.0
+    smoothed = savgol_smooth(np.arange(40), raw, window=9, order=2)
+    expected = signal.savgol_filter(raw[..., :3].astype(np.float64), 9, 2, axis=0, mode="interp")
+    # mode="interp" fits the ends the same way, over the first/last window
+    np.testing.assert_allclose(smoothed[4:-4, ..., :3], expected[4:-4], atol=1e-5)
+
+@pytest.mark.parametrize("frame_numbers", [[0, 1, 2, 3, 50], [0], [0, 1], [0, 40, 80], [0, 1, 30, 31, 32, 33]])
+def test_savgol_handles_gaps_and_short_clips(frame_numbers):
+    raw = landmarks(len(frame_numbers))
+    smoothed = savgol_smooth(frame_numbers, raw, window=9, order=2)
+    assert smoothed.shape == raw.shape
+    assert np.isfinite(smoothed).all()
+    np.testing.assert_array_equal(smoothed[..., 3], raw[..., 3])
+
+    # A detection alone in its window keeps its value, and a pair gets a line
+    # through both points, which also reproduces them
+    frame_numbers = np.asarray(frame_numbers)
+    gaps = np.diff(frame_numbers, prepend=-100, append=frame_numbers[-1] + 100)
+    alone = (gaps[:-1] > 4) & (gaps[1:] > 4)
+    np.testing.assert_allclose(smoothed[alone, ..., :3], raw[alone, ..., :3], atol=1e-6)
+    if len(frame_numbers) == 2:
+        np.testing.assert_allclose(smoothed, raw, atol=1e-6)
+
+def test_savgol_with_zero_weights():
+    raw = landmarks(5)
+    raw[:, 7, 3] = 0.0
+    smoothed = savgol_smooth(np.arange(5), raw, window=5, order=2, min_weight=0.0)
+    assert np.isfinite(smoothed).all()
+    np.testing.assert_array_equal(smoothed[:, 7], raw[:, 7])
+
+def test_savgol_rejects_short_window():
+    with pytest.raises(ValueError):
+        savgol_smooth(np.arange(10), landmarks(10), window=3, order=2)
+
+@pytest.mark.parametrize("method", ["one_euro", "savgol"])
+def test_smooth_landmarks_on_a_single_frame(method):
+    raw = landmarks(1)
+    np.testing.assert_allclose(smooth_landmarks(np.array([0]), raw, 30, method), raw, atol=1e-6)
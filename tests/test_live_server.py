@@ -0,0 +1,105 @@
+import base64
+import json
+import os
+import socket
+import struct
+import time
+
+import pytest
+
+from live_capture import LandmarkServer, read_websocket_frame, websocket_frame
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.01)
+
+@pytest.fixture
+def server():
+    with LandmarkServer(port=0) as server:
+        yield server
+
+def connect(server):
+    return socket.create_connection(server.address, timeout=5)
+
+def recv_exactly(conn, count):
+    data = b""
+    while len(data) < count:
+        chunk = conn.recv(count - len(data))
+        assert chunk, "connection closed"
+        data += chunk
+    return data
+
+def upgrade(server):
+    conn = connect(server)
+    key = base64.b64encode(os.urandom(16)).decode()
+    conn.sendall(f"GET / HTTP/1.1\r\nHost: localhost\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                 f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n".encode())
+    response = b""
+    while b"\r\n\r\n" not in response:
+        response += recv_exactly(conn, 1)
+    assert response.startswith(b"HTTP/1.1 101")
+    return conn
+
+def client_frame(opcode, payload):
+    # Masked, as browsers send them
+    mask = os.urandom(4)
+    masked = bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+    return struct.pack("!BB", 0x80 | opcode, 0x80 | len(payload)) + mask + masked
+
+def server_frame(conn):
+    first, second = recv_exactly(conn, 2)
+    length = second & 0x7F
+    if length == 126:
+        length = struct.unpack("!H", recv_exactly(conn, 2))[0]
+    return first & 0x0F, recv_exactly(conn, length)
+
+def test_read_websocket_frame_waits_for_whole_frames():
+    frame = client_frame(0x1, b"hello")
+    assert read_websocket_frame(frame[:3]) is None
+    assert read_websocket_frame(frame + b"next") == (0x1, b"hello", len(frame))
+    long_frame = websocket_frame(b"x" * 300)
+    assert read_websocket_frame(long_frame) == (0x1, b"x" * 300, len(long_frame))
+
+def test_plain_and_websocket_clients_get_records(server):
+    plain = connect(server)
+    websocket = upgrade(server)
+    wait_for(lambda: server.client_count == 2)
+    server.publish({"frame": 1})
+    assert plain.makefile().readline() == '{"frame": 1}\n'
+    assert server_frame(websocket) == (0x1, b'{"frame": 1}')
+
+def test_ping_gets_a_pong_and_close_drops_the_client(server):
+    websocket = upgrade(server)
+    wait_for(lambda: server.client_count == 1)
+    websocket.sendall(client_frame(0x9, b"are you there"))
+    assert server_frame(websocket) == (0xA, b"are you there")
+
+    websocket.sendall(client_frame(0x8, struct.pack("!H", 1000)))
+    assert server_frame(websocket) == (0x8, struct.pack("!H", 1000))
+    assert websocket.recv(1) == b""
+    wait_for(lambda: server.client_count == 0 and not server.clients)
+
+def test_clients_that_hang_up_are_dropped(server):
+    plain = connect(server)
+    websocket = upgrade(server)
+    wait_for(lambda: server.client_count == 2)
+    plain.close()
+    websocket.close()
+    wait_for(lambda: not server.clients)
+
+def test_slow_handshake_does_not_hold_up_other_clients(server):
+    # An upgrade request that never finishes
+    stalled = connect(server)
+    stalled.sendall(b"GET / HTTP/1.1\r\nHost: local")
+    start = time.perf_counter()
+    websocket = upgrade(server)
+    plain = connect(server)
+    wait_for(lambda: server.client_count == 2)
+    assert time.perf_counter() - start < 2
+    server.publish({"frame": 2})
+    assert server_frame(websocket) == (0x1, b'{"frame": 2}')
+    assert plain.makefile().readline() == '{"frame": 2}\n'
+    stalled.close()
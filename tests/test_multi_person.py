@@ -0,0 +1,116 @@
+import json
+
+import cv2
+import numpy as np
+import pytest
+
+import multi_person
+from landmarks import LANDMARK_COUNT, load_landmark_array
+from multi_person import associate, process_video_multi
+
+FRAMES = 60
+WIDTH, HEIGHT = 320, 240
+# Frame brightness encodes the frame number, in steps that survive encoding
+LEVEL = 4
+
+def frame_index(frame):
+    return int(round(float(frame.mean()) / LEVEL))
+
+def person_boxes(index):
+    # Two dancers crossing paths: 0 walks right along the top, 1 walks left
+    # lower down, and they pass each other halfway through the clip
+    return [(20 + 4 * index, 40, 70 + 4 * index, 140), (250 - 4 * index, 100, 300 - 4 * index, 200)]
+
+def centre(box):
+    return np.array([(box[0] + box[2]) / 2, (box[1] + box[3]) / 2])
+
+class FakeDetector:
+    # Both dancers, ordered left to right, so the order swaps as they cross
+    def __init__(self):
+        self.calls = 0
+
+    def detect(self, frame):
+        self.calls += 1
+        return sorted(person_boxes(frame_index(frame)))
+
+class FakeProcessor:
+    # Landmarks spread over the box of the dancer nearest the crop centre,
+    # with z set to that dancer's number so the tests can tell them apart
+    def __init__(self, **pose_settings):
+        pass
+
+    def detect_frame(self, frame, box=None, inference_size=None):
+        people = [(np.linalg.norm(centre(person) - centre(box)), number, person)
+                  for number, person in enumerate(person_boxes(frame_index(frame)))
+                  if box[0] <= centre(person)[0] <= box[2] and box[1] <= centre(person)[1] <= box[3]]
+        if not people:
+            return None
+        _, number, (x0, y0, x1, y1) = min(people)
+        t = np.linspace(0, 1, LANDMARK_COUNT)
+        return np.stack([(x0 + t * (x1 - x0)) / WIDTH, (y0 + t[::-1] * (y1 - y0)) / HEIGHT,
+                         np.full(LANDMARK_COUNT, float(number)), np.full(LANDMARK_COUNT, 0.9)], axis=1)
+
+    def reset(self):
+        pass
+
+@pytest.fixture
+def clip(tmp_path):
+    path = str(tmp_path / "crossing.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 30, (WIDTH, HEIGHT))
+    for index in range(FRAMES):
+        writer.write(np.full((HEIGHT, WIDTH, 3), index * LEVEL, dtype=np.uint8))
+    writer.release()
+    return path
+
+def test_associate_prefers_iou():
+    tracks = [(0, 0, 10, 10), (20, 0, 30, 10)]
+    detections = [(21, 0, 31, 10), (1, 0, 11, 10)]
+    assert associate(tracks, detections) == ([(0, 1), (1, 0)], [])
+
+def test_associate_takes_the_best_overlap_first():
+    # Both detections overlap the track; the closer one wins and the other is new
+    matches, unmatched = associate([(0, 0, 10, 10)], [(4, 0, 14, 10), (1, 0, 11, 10)])
+    assert matches == [(0, 1)] and unmatched == [0]
+
+def test_associate_falls_back_to_centroid_distance():
+    # IoU 0.21 is under the threshold, but the centres are 0.41 diagonals apart
+    assert associate([(0, 0, 10, 10)], [(3, 5, 13, 15)]) == ([(0, 0)], [])
+    assert associate([(0, 0, 10, 10)], [(3, 5, 13, 15)], max_distance=0.4) == ([], [0])
+
+def test_associate_limits():
+    tracks = [(0, 0, 10, 10)]
+    far = (100, 100, 110, 110)
+    assert associate(tracks, [far]) == ([], [0])
+    # Half overlapping: IoU 1/3 passes at 0.3, not at 0.5, but the centres
+    # are still close enough for the second pass
+    assert associate(tracks, [(5, 0, 15, 10)], iou_threshold=0.5) == ([(0, 0)], [])
+    assert associate(tracks, [(5, 0, 15, 10)], iou_threshold=0.5, max_distance=0.3) == ([], [0])
+
+def test_associate_empty_inputs():
+    assert associate([], []) == ([], [])
+    assert associate([], [(0, 0, 10, 10), (5, 5, 9, 9)]) == ([], [0, 1])
+    assert associate([(0, 0, 10, 10)], []) == ([], [])
+
+def test_track_ids_survive_crossing(clip, tmp_path, monkeypatch):
+    monkeypatch.setattr(multi_person, "VideoProcessor", FakeProcessor)
+    detector = FakeDetector()
+    output_dir = tmp_path / "dancers"
+    dancers = process_video_multi(clip, str(output_dir), "spine", detect_every=5, workers=2, detector=detector)
+
+    assert detector.calls == FRAMES // 5
+    assert [dancer["id"] for dancer in dancers] == [0, 1]
+    numbers = set()
+    for dancer in dancers:
+        _, frame_numbers, raw, _ = load_landmark_array(dancer["landmarks"], mmap=False)
+        assert frame_numbers.tolist() == list(range(FRAMES))
+        # Every frame of a track is the same dancer, before and after the crossing
+        (number,) = np.unique(raw[:, :, 2])
+        numbers.add(int(number))
+        x_centre = raw[:, :, 0].mean(axis=1) * WIDTH
+        expected = [centre(person_boxes(index)[int(number)])[0] for index in range(FRAMES)]
+        np.testing.assert_allclose(x_centre, expected, atol=1)
+    assert numbers == {0, 1}
+
+    with open(output_dir / "dancers.json") as f:
+        manifest = json.load(f)
+    assert manifest["frames_read"] == FRAMES and len(manifest["dancers"]) == 2
@@ -0,0 +1,73 @@
+import types
+
+import cv2
+import numpy as np
+import pytest
+
+mp = pytest.importorskip("mediapipe")
+from mediapipe.framework.formats import landmark_pb2
+
+from landmarks import load_landmark_array
+from video_processor import VideoProcessor
+
+FRAMES = 60
+# Frames on which the fake model finds no pose
+DROPOUTS = {9, 10, 23, 37, 38, 39, 52}
+# Frame brightness encodes the frame number, in steps that survive encoding
+LEVEL = 4
+
+def frame_index(rgb):
+    return int(round(float(rgb.mean()) / LEVEL))
+
+class FakePose:
+    # Landmarks that move linearly with the frame number, so interpolating
+    # between two detections reproduces the frames in between
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def process(self, rgb):
+        index = frame_index(rgb)
+        if index in DROPOUTS:
+            return types.SimpleNamespace(pose_landmarks=None)
+        landmarks = landmark_pb2.NormalizedLandmarkList()
+        for i in range(33):
+            landmark = landmarks.landmark.add()
+            landmark.x = 0.2 + 0.01 * i + 0.004 * index
+            landmark.y = 0.3 + 0.01 * i - 0.002 * index
+            landmark.z = 0.001 * index
+            landmark.visibility = 0.9
+        return types.SimpleNamespace(pose_landmarks=landmarks)
+
+    def reset(self):
+        pass
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def clip(tmp_path, monkeypatch):
+    monkeypatch.setattr(mp.solutions.pose, "Pose", FakePose)
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 30, (64, 48))
+    for index in range(FRAMES):
+        writer.write(np.full((48, 64, 3), index * LEVEL, dtype=np.uint8))
+    writer.release()
+    return path
+
+def run(clip, tmp_path, stride):
+    output = str(tmp_path / f"stride{stride}.npz")
+    VideoProcessor().process_video(clip, output, None, None, "spine", sample_stride=stride)
+    _, frame_numbers, raw, _ = load_landmark_array(output, mmap=False)
+    return frame_numbers, raw
+
+@pytest.mark.parametrize("stride", [2, 4, 7])
+def test_stride_keeps_frames_around_dropouts(clip, tmp_path, stride):
+    expected_frames, expected = run(clip, tmp_path, 1)
+    assert expected_frames.tolist() == [i for i in range(FRAMES) if i not in DROPOUTS]
+
+    # Every pose stride 1 finds is kept. A dropout that falls between two
+    # inferences is never seen and gets interpolated, so stride may add frames.
+    frame_numbers, raw = run(clip, tmp_path, stride)
+    shared = np.isin(frame_numbers, expected_frames)
+    assert frame_numbers[shared].tolist() == expected_frames.tolist()
+    np.testing.assert_allclose(raw[shared], expected, atol=1e-5)
@@ -0,0 +1,165 @@
+import json
+import struct
+
+import numpy as np
+import pytest
+
+from landmarks import LANDMARK_COUNT, save_landmarks
+from spine_converter import _varint, convert_to_spine
+
+class SkelReader:
+    # Reads back what convert_to_spine_binary writes, in the order of Spine's
+    # SkeletonBinary loader, asserting on the fields it always leaves at
+    # their defaults
+    def __init__(self, data):
+        self.data = data
+        self.position = 0
+        self.strings = []
+
+    def byte(self):
+        value = self.data[self.position]
+        self.position += 1
+        return value
+
+    def varint(self):
+        value = shift = 0
+        while True:
+            byte = self.byte()
+            value |= (byte & 0x7F) << shift
+            shift += 7
+            if not byte & 0x80:
+                return value
+
+    def string(self):
+        length = self.varint()
+        if length == 0:
+            return None
+        end = self.position + length - 1
+        value = self.data[self.position:end].decode()
+        self.position = end
+        return value
+
+    def string_ref(self):
+        index = self.varint()
+        return None if index == 0 else self.strings[index - 1]
+
+    def unpack(self, fmt):
+        values = struct.unpack_from(fmt, self.data, self.position)
+        self.position += struct.calcsize(fmt)
+        return values
+
+    def floats(self, count):
+        return list(self.unpack(f">{count}f"))
+
+def read_skel(path):
+    with open(path, 'rb') as f:
+        reader = SkelReader(f.read())
+    skeleton = {}
+    reader.position += 8  # hash
+    skeleton["version"] = reader.string()
+    reader.floats(5)  # x, y, width, height, reference scale
+    assert reader.byte() == 0  # nonessential data
+    reader.strings = [reader.string() for _ in range(reader.varint())]
+
+    bones = []
+    for i in range(reader.varint()):
+        name = reader.string()
+        parent = None if i == 0 else bones[reader.varint()]["name"]
+        assert reader.floats(8) == [0, 0, 0, 1, 1, 0, 0, 0]
+        assert reader.varint() == 0 and reader.byte() == 0  # inherit, skin required
+        bones.append({"name": name, "parent": parent})
+    skeleton["bones"] = bones
+
+    slots = []
+    for _ in range(reader.varint()):
+        name = reader.string()
+        bone = bones[reader.varint()]["name"]
+        assert reader.unpack(">ii") == (-1, -1)  # color, dark color
+        attachment = reader.string_ref()
+        assert reader.varint() == 0  # blend mode
+        slots.append({"name": name, "bone": bone, "attachment": attachment})
+    skeleton["slots"] = slots
+    assert [reader.varint() for _ in range(4)] == [0, 0, 0, 0]  # constraints and skin slots
+
+    skin = {}
+    for _ in range(reader.varint()):
+        slot_name = slots[reader.varint()]["name"]
+        for _ in range(reader.varint()):
+            name = reader.string_ref()
+            assert reader.byte() == 0  # region attachment, no flags
+            x, y, scale_x, scale_y, width, height = reader.floats(6)
+            skin[slot_name] = {name: {"x": x, "y": y, "scaleX": scale_x, "scaleY": scale_y, "rotation": 0,
+                                      "width": width, "height": height}}
+    skeleton["skin"] = skin
+    assert reader.varint() == 0 and reader.varint() == 0  # named skins, events
+
+    assert reader.varint() == 1 and reader.string() == "animation"
+    timeline_count = reader.varint()
+    assert reader.varint() == 0  # slot timelines
+    animation = {}
+    for _ in range(reader.varint()):
+        timelines = animation[bones[reader.varint()]["name"]] = {}
+        for _ in range(reader.varint()):
+            kind = reader.byte()
+            frame_count = reader.varint()
+            assert reader.varint() == 0  # bezier count
+            channels = 3 if kind == 1 else 2
+            frames = [reader.floats(channels)]
+            for _ in range(1, frame_count):
+                frames.append(reader.floats(channels))
+                assert reader.byte() == 0  # linear curve
+            timelines["translate" if kind == 1 else "rotate"] = frames
+    assert sum(len(timelines) for timelines in animation.values()) == timeline_count
+    assert [reader.varint() for _ in range(7)] == [0] * 7
+    assert reader.position == len(reader.data)
+    skeleton["animation"] = animation
+    return skeleton
+
+def write_landmarks(path, frames):
+    # Smooth motion, so keyframe reduction has something to drop
+    rng = np.random.default_rng(0)
+    t = np.arange(frames)[:, None, None] / 30
+    raw = 0.5 + 0.2 * np.sin(t * rng.uniform(0.5, 3, (1, LANDMARK_COUNT, 4)) + rng.uniform(0, 6, (1, LANDMARK_COUNT, 4)))
+    save_landmarks(str(path), 30, np.arange(frames, dtype=np.int32) * 2, raw.astype(np.float32), "spine")
+
+def test_varint():
+    assert _varint(0) == b"\x00"
+    assert _varint(127) == b"\x7f"
+    assert _varint(128) == b"\x80\x01"
+    assert _varint(300) == b"\xac\x02"
+    assert _varint(16384) == b"\x80\x80\x01"
+
+@pytest.mark.parametrize("frames", [0, 1, 40])
+@pytest.mark.parametrize("tolerance", [None, 0.5])
+def test_skel_matches_json(tmp_path, frames, tolerance):
+    landmarks = tmp_path / "landmarks.npz"
+    write_landmarks(landmarks, frames)
+    # A small chunk size so curves are built across several chunks
+    convert_to_spine(str(landmarks), str(tmp_path / "spine.skel"), tolerance=tolerance, chunk_frames=7)
+    convert_to_spine(str(landmarks), str(tmp_path / "spine.json"), tolerance=tolerance)
+    skeleton = read_skel(tmp_path / "spine.skel")
+    with open(tmp_path / "spine.json") as f:
+        expected = json.load(f)
+
+    assert skeleton["version"] == expected["skeleton"]["spine"]
+    assert skeleton["bones"] == [{"name": bone["name"], "parent": bone.get("parent")} for bone in expected["bones"]]
+    assert skeleton["slots"] == expected["slots"]
+    for slot_name, attachments in expected["skins"]["default"].items():
+        for name, attachment in attachments.items():
+            for field, value in attachment.items():
+                assert skeleton["skin"][slot_name][name][field] == pytest.approx(value, rel=1e-6, abs=1e-4)
+
+    # The binary leaves out the timelines the JSON writes empty
+    expected_bones = {
+        bone_name: {channel: keys for channel, keys in timelines.items() if keys}
+        for bone_name, timelines in expected["animations"]["animation"]["bones"].items()
+    }
+    expected_bones = {bone_name: timelines for bone_name, timelines in expected_bones.items() if timelines}
+    assert sorted(skeleton["animation"]) == sorted(expected_bones)
+    for bone_name, timelines in expected_bones.items():
+        assert sorted(skeleton["animation"][bone_name]) == sorted(timelines)
+        for channel, keys in timelines.items():
+            values = [[key["time"], key["angle"]] if channel == "rotate" else [key["time"], key["x"], key["y"]]
+                      for key in keys]
+            # float32 in the binary, float64 in the JSON
+            np.testing.assert_allclose(skeleton["animation"][bone_name][channel], values, rtol=1e-6, atol=1e-4)
@@ -1,109 +1,576 @@
 import cv2
 import mediapipe as mp
 import numpy as np
-import json
+import queue
+import threading
+import time
+
+from instrumentation import NULL_METRICS
+from landmark_checkpoint import DEFAULT_CHECKPOINT_INTERVAL, open_checkpoint
+from landmark_smoothing import smooth_landmarks
+from landmarks import LANDMARK_COUNT, check_output_format, frames_to_array, save_landmarks
+from skeleton_renderer import SkeletonRenderer, plain_renderer, render_overlay_video, render_skeleton_video, video_writer
+
+class ProcessingCancelled(Exception):
+    pass
+
+def landmark_values(pose_landmarks):
+    # 33 x 4 array of (x, y, z, visibility) from a MediaPipe landmark list
+    return np.array([(lm.x, lm.y, lm.z, lm.visibility) for lm in pose_landmarks.landmark], dtype=np.float64)
+
+def landmark_motion(start_values, end_values):
+    # Mean distance the landmarks moved in the image plane
+    return float(np.linalg.norm(end_values[:, :2] - start_values[:, :2], axis=1).mean())
+
+def landmark_box(values, width, height, padding):
+    # Pixel box (x0, y0, x1, y1) around the landmarks, grown by padding times
+    # its size on every side and clipped to the frame; None if it is empty
+    x = values[:, 0] * width
+    y = values[:, 1] * height
+    pad_x = (x.max() - x.min()) * padding
+    pad_y = (y.max() - y.min()) * padding
+    x0 = max(0, int(x.min() - pad_x))
+    y0 = max(0, int(y.min() - pad_y))
+    x1 = min(width, int(np.ceil(x.max() + pad_x)))
+    y1 = min(height, int(np.ceil(y.max() + pad_y)))
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return x0, y0, x1, y1
+
+def interpolate_landmarks(start, end, frame_numbers):
+    # Linear interpolation between two (frame number, values) detections at
+    # each of frame_numbers; visibility is interpolated like the coordinates
+    start_frame, start_values = start
+    end_frame, end_values = end
+    if not frame_numbers:
+        return np.empty((0, LANDMARK_COUNT, 4))
+    t = (np.asarray(frame_numbers, dtype=np.float64) - start_frame) / (end_frame - start_frame)
+    return start_values + (end_values - start_values) * t[:, None, None]
 
 class VideoProcessor:
-    def __init__(self):
+    def __init__(self, min_detection_confidence=0.5, min_tracking_confidence=0.5, model_complexity=1, metrics=None):
         self.mp_pose = mp.solutions.pose
-        self.mp_drawing = mp.solutions.drawing_utils
-        self.pose = self.mp_pose.Pose(static_image_mode=False, min_detection_confidence=0.5, min_tracking_confidence=0.5)
+        # Kept so worker processes can build an identically configured tracker
+        self.pose_settings = {
+            "min_detection_confidence": min_detection_confidence,
+            "min_tracking_confidence": min_tracking_confidence,
+            "model_complexity": model_complexity,
+        }
+        self.pose = self.mp_pose.Pose(static_image_mode=False, **self.pose_settings)
+        # Overlay and skeleton video drawing, and the plainer draw_skeleton style
+        self.renderer = SkeletonRenderer()
+        self.skeleton_renderer = plain_renderer()
+        # Stage timings and counters of process_video (see instrumentation);
+        # records nothing unless an instrumentation.Metrics is given
+        self.metrics = metrics or NULL_METRICS
+
+    def process_video(self, video_path, landmarks_output, overlay_video_output, skeleton_video_output, output_format, cache=None,
+                      sample_stride=1, motion_threshold=None, inference_size=None, roi_padding=None, progress=None, cancel=None,
+                      checkpoint_dir=None, checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL, smoothing=None, smoothing_options=None):
+        # sample_stride > 1 runs pose inference on every Nth frame only and
+        # fills the frames in between by interpolating the landmarks; if an
+        # inference finds no pose, the frames skipped before it are inferred
+        # one by one instead. With a
+        # motion_threshold, inference drops back to every frame while the pose
+        # moves faster than that many normalized image units per frame.
+        # inference_size caps the longer side of the image given to the pose
+        # model; with roi_padding, inference runs on a crop around the previous
+        # detection grown by that fraction of its size. Landmarks and drawings
+        # stay in full-frame coordinates either way. Either video output can be
+        # None to skip drawing and encoding it. progress is called with the
+        # frames read so far and the container's frame count after each frame.
+        # Setting the cancel event stops the run with ProcessingCancelled;
+        # nothing is saved then but the checkpoint.
+        # With a checkpoint_dir, the detections are also appended there every
+        # checkpoint_interval frames, and a run of the same video and settings
+        # that was killed or cancelled resumes from its last checkpoint. The
+        # videos of a resumed run are drawn from the landmarks once it is done,
+        # since a half-written video can't be appended to.
+        # smoothing ("one_euro" or "savgol", see landmark_smoothing) filters the
+        # saved landmarks; the cache and checkpoints keep them unsmoothed, and
+        # the videos show the raw detections.
+        check_output_format(output_format)
+        metrics = self.metrics
+
+        def save(fps, frame_numbers, raw):
+            if smoothing is not None:
+                raw = smooth_landmarks(frame_numbers, raw, fps, smoothing, **(smoothing_options or {}))
+            save_landmarks(landmarks_output, fps, frame_numbers, raw, output_format)
+
+        settings = self.pose_settings
+        if sample_stride > 1:
+            settings = dict(settings, sample_stride=sample_stride, motion_threshold=motion_threshold)
+        if inference_size or roi_padding is not None:
+            settings = dict(settings, inference_size=inference_size, roi_padding=roi_padding)
+
+        if cache is not None:
+            cache_key = cache.key(video_path, settings)
+            entry = cache.get(cache_key)
+            if entry is not None:
+                # Cache hit: remap the stored landmarks without pose inference.
+                # Requested videos are drawn from them, as for a resumed run.
+                save(entry["fps"], entry["frame_numbers"], entry["landmarks"])
+                metrics.count("cache_hits")
+                print(f"Loaded landmarks for {video_path} from cache")
+                if overlay_video_output is not None or skeleton_video_output is not None:
+                    cap = cv2.VideoCapture(video_path)
+                    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+                    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+                    cap.release()
+                    self._render_videos(video_path, np.asarray(entry["frame_numbers"]), entry["landmarks"], entry["fps"],
+                                        width, height, overlay_video_output, skeleton_video_output)
+                if progress:
+                    progress(entry["frames_read"], entry["frames_read"])
+                return entry["frames_read"]
 
-    def process_video(self, video_path, landmarks_output, overlay_video_output, skeleton_video_output, output_format):
         cap = cv2.VideoCapture(video_path)
         frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
         fps = int(cap.get(cv2.CAP_PROP_FPS))
         width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
         height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         
-        landmarks_data = []
+        # Frame numbers and landmark values of every frame with a pose
+        detected_frames = []
+        detected_values = []
+        frames_read = 0
+        frames_inferred = 0
 
-        # Set up video writers
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        overlay_out = cv2.VideoWriter(overlay_video_output, fourcc, fps, (width, height))
-        skeleton_out = cv2.VideoWriter(skeleton_video_output, fourcc, fps, (width, height))
-
-        for frame_num in range(frame_count):
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            # Convert the BGR image to RGB
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = self.pose.process(rgb_frame)
-            
-            if results.pose_landmarks:
-                # Process landmarks based on the selected output format
-                if output_format == "blender":
-                    frame_data = {
-                        "frame": frame_num,
-                        "landmarks": [
-                            {"x": lm.x, "y": lm.z, "z": -lm.y}  # Adjust for Blender's coordinate system
-                            for lm in results.pose_landmarks.landmark
-                        ]
-                    }
-                elif output_format == "spine":
-                    frame_data = {
-                        "frame": frame_num,
-                        "landmarks": [
-                            {"x": lm.x, "y": 1 - lm.y, "z": lm.z}  # Invert y-axis for Spine compatibility
-                            for lm in results.pose_landmarks.landmark
-                        ]
-                    }
-                else:
-                    raise ValueError(f"Unsupported output format: {output_format}")
+        checkpoint = None
+        resumed = False
+        if checkpoint_dir is not None:
+            checkpoint = open_checkpoint(checkpoint_dir, video_path, settings)
+            resumed = checkpoint.load()
+            if resumed:
+                print(f"Resuming {video_path} at frame {checkpoint.resume_frame} from {checkpoint.path}")
+                detected_frames.extend(checkpoint.frame_numbers.tolist())
+                detected_values.extend(checkpoint.landmarks)
+        # Detections up to here are in the checkpoint
+        flushed = len(detected_frames)
+        last_flush = 0
+
+        # Set up video writers; a resumed run draws its videos at the end
+        overlay_out = video_writer(None if resumed else overlay_video_output, fps, width, height)
+        skeleton_out = video_writer(None if resumed else skeleton_video_output, fps, width, height)
 
-                landmarks_data.append(frame_data)
+        def write_frame(frame_num, frame, values):
+            detected_frames.append(frame_num)
+            detected_values.append(values)
 
+            if overlay_out is not None:
                 # Draw the pose annotation on the frame
-                self.mp_drawing.draw_landmarks(
-                    frame, results.pose_landmarks, self.mp_pose.POSE_CONNECTIONS)
-                
-                # Create a black image for the skeleton video
-                black_frame = np.zeros((height, width, 3), dtype=np.uint8)
-                self.mp_drawing.draw_landmarks(
-                    black_frame, results.pose_landmarks, self.mp_pose.POSE_CONNECTIONS)
-
-                # Write the frames
-                overlay_out.write(frame)
-                skeleton_out.write(black_frame)
-
-        cap.release()
-        overlay_out.release()
-        skeleton_out.release()
-
-        # Save landmarks data to JSON
-        with open(landmarks_output, 'w') as f:
-            json.dump({"fps": fps, "frames": landmarks_data}, f)
+                with metrics.timer("draw_overlay"):
+                    frame = self.renderer.draw(frame, values)
+                with metrics.timer("write_overlay"):
+                    overlay_out.write(frame)
+
+            if skeleton_out is not None:
+                # Encoding copies the frame, so the renderer reuses one black buffer
+                with metrics.timer("draw_skeleton"):
+                    skeleton_frame = self.renderer.render(values, width, height)
+                with metrics.timer("write_skeleton"):
+                    skeleton_out.write(skeleton_frame)
+
+        # Frames decoded since the last inference, the last inferred detection
+        # as (frame number, landmark values) and the crop for the next inference
+        skipped = []
+        previous = None
+        next_inference = 0
+        roi = None
+
+        def infer(frame_num, frame):
+            nonlocal frames_inferred, previous, next_inference, roi
+            frames_inferred += 1
+
+            with metrics.timer("infer"):
+                pose_landmarks = self._detect(frame, roi, inference_size)
+
+            current = None
+            step = sample_stride
+            roi = None
+            if pose_landmarks:
+                current = (frame_num, landmark_values(pose_landmarks))
+                if roi_padding is not None:
+                    roi = landmark_box(current[1], width, height, roi_padding)
+                if previous is not None and motion_threshold is not None:
+                    motion = landmark_motion(previous[1], current[1]) / (frame_num - previous[0])
+                    if motion > motion_threshold:
+                        step = 1
+            else:
+                # Keep gaps short until the tracker finds the pose again
+                step = 1
+                metrics.count("frames_without_pose")
+                if skipped:
+                    # The dancer was most likely still there in the frames
+                    # skipped since the last inference, so infer them one by
+                    # one rather than drop them with this frame
+                    pending = skipped[:]
+                    skipped.clear()
+                    for skipped_num, skipped_frame in pending:
+                        infer(skipped_num, skipped_frame)
+                    roi = None
+
+            # Skipped frames are only filled between two detections
+            if previous is not None and current is not None:
+                frame_numbers = [skipped_num for skipped_num, _ in skipped]
+                for (skipped_num, skipped_frame), values in zip(skipped, interpolate_landmarks(previous, current, frame_numbers)):
+                    write_frame(skipped_num, skipped_frame, values)
+                if frame_numbers:
+                    metrics.count("frames_interpolated", len(frame_numbers))
+            skipped.clear()
+
+            if current is not None:
+                write_frame(frame_num, frame, current[1])
+            previous = current
+            next_inference = frame_num + step
+
+        def save_checkpoint(next_frame):
+            # Frames still waiting for interpolation are redone on resume
+            nonlocal flushed, last_flush
+            resume_frame = skipped[0][0] if skipped else next_frame
+            checkpoint.append(detected_frames[flushed:], detected_values[flushed:], resume_frame, next_inference)
+            flushed = len(detected_frames)
+            last_flush = frames_read
+
+        first_frame = 0
+        if resumed:
+            # Grabbing without decoding to an image is exact where seeking
+            # by frame number may not be, and cheap next to inference
+            while first_frame < checkpoint.resume_frame and cap.grab():
+                first_frame += 1
+            frames_read = first_frame
+            next_inference = max(first_frame, checkpoint.next_inference)
+            # The stored detection just before the resume frame was the last
+            # inference; restoring it keeps the strided run on the frames and
+            # interpolation gaps of an uninterrupted one
+            if detected_frames and detected_frames[-1] == first_frame - 1:
+                previous = (detected_frames[-1], np.asarray(detected_values[-1], dtype=np.float64))
+                if roi_padding is not None:
+                    roi = landmark_box(previous[1], width, height, roi_padding)
+
+        try:
+            for frame_num in range(first_frame, frame_count):
+                if cancel is not None and cancel.is_set():
+                    if checkpoint is not None:
+                        save_checkpoint(frame_num)
+                    raise ProcessingCancelled(f"Processing of {video_path} was cancelled")
+
+                frame_start = time.perf_counter()
+                with metrics.timer("read"):
+                    ret, frame = cap.read()
+                if not ret:
+                    break
+                frames_read += 1
+
+                if frame_num < next_inference:
+                    skipped.append((frame_num, frame))
+                else:
+                    infer(frame_num, frame)
+                metrics.observe("frame", time.perf_counter() - frame_start)
+
+                if progress:
+                    progress(frames_read, frame_count)
+
+                if checkpoint is not None and frames_read - last_flush >= checkpoint_interval:
+                    save_checkpoint(frame_num + 1)
+
+            # The last frame read closes the final interpolation gap
+            if skipped:
+                infer(*skipped.pop())
+        finally:
+            cap.release()
+            for writer in (overlay_out, skeleton_out):
+                if writer is not None:
+                    writer.release()
+
+        metrics.count("frames_read", frames_read - first_frame)
+        metrics.count("frames_inferred", frames_inferred)
+        if sample_stride > 1:
+            print(f"Ran pose inference on {frames_inferred} of {frames_read - first_frame} frames")
+
+        # Save landmarks data (JSON or binary, by extension)
+        frame_numbers = np.array(detected_frames, dtype=np.int32)
+        raw = np.array(detected_values, dtype=np.float32).reshape(-1, LANDMARK_COUNT, 4)
+        save(fps, frame_numbers, raw)
+
+        if resumed:
+            self._render_videos(video_path, frame_numbers, raw, fps, width, height, overlay_video_output, skeleton_video_output)
+
+        if cache is not None:
+            cache.put(cache_key, {"fps": fps, "frames_read": frames_read, "frame_numbers": frame_numbers, "landmarks": raw})
+
+        if checkpoint is not None:
+            checkpoint.remove()
+
+        return frames_read
+
+    def reset(self):
+        # Start the tracker afresh so a reused processor doesn't carry the
+        # previous clip's pose into the first frames of the next one
+        self.pose.reset()
+
+    def process_video_pipelined(self, video_path, landmarks_output, overlay_video_output, skeleton_video_output, output_format, queue_size=8):
+        # Same outputs as process_video, but decode, pose inference and the two
+        # encoders run as separate stages connected by bounded queues. Each queue
+        # has a single producer and a single consumer, so frame order is kept.
+        # Either video output can be None to skip its encoder stage.
+        check_output_format(output_format)
+
+        cap = cv2.VideoCapture(video_path)
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = int(cap.get(cv2.CAP_PROP_FPS))
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+        overlay_out = video_writer(overlay_video_output, fps, width, height)
+        skeleton_out = video_writer(skeleton_video_output, fps, width, height)
+
+        decoded = queue.Queue(maxsize=queue_size)
+        overlay_queue = queue.Queue(maxsize=queue_size)
+        skeleton_queue = queue.Queue(maxsize=queue_size)
+        stop = threading.Event()
+        errors = []
+        stats = {stage: {"frames": 0, "seconds": 0.0} for stage in ("decode", "inference", "overlay", "skeleton")}
+
+        def put(q, item):
+            # Give up instead of blocking forever once another stage has failed
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def decode():
+            try:
+                for frame_num in range(frame_count):
+                    start = time.perf_counter()
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                    stats["decode"]["seconds"] += time.perf_counter() - start
+                    stats["decode"]["frames"] += 1
+                    if not put(decoded, (frame_num, frame, rgb_frame)):
+                        return
+            except Exception as e:
+                errors.append(e)
+                stop.set()
+            finally:
+                # The inference stage drains this queue until we exit
+                decoded.put(None)
+
+        def encode(stage, q, writer, draw):
+            try:
+                while True:
+                    item = q.get()
+                    if item is None:
+                        return
+                    start = time.perf_counter()
+                    writer.write(draw(*item))
+                    stats[stage]["seconds"] += time.perf_counter() - start
+                    stats[stage]["frames"] += 1
+            except Exception as e:
+                errors.append(e)
+                stop.set()
+                # Keep draining so the inference stage never blocks on us
+                while q.get() is not None:
+                    pass
+
+        def draw_overlay(frame, values):
+            return self.renderer.draw(frame, values)
+
+        def draw_skeleton_frame(values):
+            # Encoding copies the frame, so the renderer reuses one black buffer
+            return self.renderer.render(values, width, height)
+
+        # (queue, item builder) for each encoder stage that has an output
+        encoders = []
+        threads = [threading.Thread(target=decode, name="decode", daemon=True)]
+        if overlay_out is not None:
+            encoders.append((overlay_queue, lambda frame, values: (frame, values)))
+            threads.append(threading.Thread(target=encode, args=("overlay", overlay_queue, overlay_out, draw_overlay), name="overlay", daemon=True))
+        if skeleton_out is not None:
+            encoders.append((skeleton_queue, lambda frame, values: (values,)))
+            threads.append(threading.Thread(target=encode, args=("skeleton", skeleton_queue, skeleton_out, draw_skeleton_frame), name="skeleton", daemon=True))
+
+        landmarks_data = []
+        wall_start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+
+        # Pose inference stays on the calling thread; the Pose graph is stateful
+        # and must see the frames one at a time, in order.
+        try:
+            while True:
+                item = decoded.get()
+                if item is None:
+                    break
+                frame_num, frame, rgb_frame = item
+                start = time.perf_counter()
+                results = self.pose.process(rgb_frame)
+                stats["inference"]["seconds"] += time.perf_counter() - start
+                stats["inference"]["frames"] += 1
+
+                if results.pose_landmarks:
+                    landmarks_data.append(self._raw_frame(frame_num, results.pose_landmarks))
+                    values = landmark_values(results.pose_landmarks)
+                    if not all(put(q, item(frame, values)) for q, item in encoders):
+                        break
+        except Exception:
+            stop.set()
+            raise
+        finally:
+            # Unblock the decoder if we stopped early, then let the encoders finish
+            while threads[0].is_alive():
+                try:
+                    decoded.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            for q, _ in encoders:
+                q.put(None)
+            for thread in threads:
+                thread.join()
+            cap.release()
+            for writer in (overlay_out, skeleton_out):
+                if writer is not None:
+                    writer.release()
+
+        if errors:
+            raise errors[0]
+
+        wall_seconds = time.perf_counter() - wall_start
+        frame_numbers, raw = frames_to_array(landmarks_data)
+        save_landmarks(landmarks_output, fps, frame_numbers, raw, output_format)
+
+        for stage, stage_stats in stats.items():
+            stage_stats["fps"] = stage_stats["frames"] / stage_stats["seconds"] if stage_stats["seconds"] else 0.0
+            print(f"{stage}: {stage_stats['frames']} frames, {stage_stats['fps']:.1f} frames/sec")
+        stats["total"] = {
+            "frames": stats["decode"]["frames"],
+            "seconds": wall_seconds,
+            "fps": stats["decode"]["frames"] / wall_seconds if wall_seconds else 0.0,
+        }
+        print(f"pipeline: {stats['total']['frames']} frames in {wall_seconds:.2f}s, {stats['total']['fps']:.1f} frames/sec")
+        return stats
+
+    def render_skeleton_video(self, landmarks_path, skeleton_video_output, width, height):
+        # Drawn in the draw_skeleton style; see skeleton_renderer.render_skeleton_video
+        return render_skeleton_video(landmarks_path, skeleton_video_output, width, height, self.skeleton_renderer)
+
+    def render_overlay_video(self, video_path, landmarks_path, overlay_video_output):
+        # Drawn in the draw_skeleton style; see skeleton_renderer.render_overlay_video
+        return render_overlay_video(video_path, landmarks_path, overlay_video_output, self.skeleton_renderer)
+
+    def _render_videos(self, video_path, frame_numbers, raw, fps, width, height, overlay_video_output, skeleton_video_output):
+        # The overlay and skeleton videos process_video draws while it runs,
+        # drawn instead from finished landmarks in one pass over the clip
+        overlay_out = video_writer(overlay_video_output, fps, width, height)
+        skeleton_out = video_writer(skeleton_video_output, fps, width, height)
+        cap = cv2.VideoCapture(video_path) if overlay_out is not None else None
+
+        frame_num = 0
+        try:
+            for target, values in zip(frame_numbers.tolist(), raw):
+                if overlay_out is not None:
+                    while frame_num < target and cap.grab():
+                        frame_num += 1
+                    ret, frame = cap.read()
+                    if ret:
+                        frame_num += 1
+                        overlay_out.write(self.renderer.draw(frame, values))
+                if skeleton_out is not None:
+                    skeleton_out.write(self.renderer.render(values, width, height))
+        finally:
+            if cap is not None:
+                cap.release()
+            for writer in (overlay_out, skeleton_out):
+                if writer is not None:
+                    writer.release()
+
+    def process_frame_range(self, video_path, start, end, warmup_frames=0):
+        # Raw landmarks for frames [start, end) only. The tracker is fed up to
+        # warmup_frames frames before start so it has settled by the first
+        # frame we keep; results for those warm-up frames are discarded.
+        cap = cv2.VideoCapture(video_path)
+        first = max(0, start - warmup_frames)
+        cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+
+        landmarks_data = []
+        try:
+            for frame_num in range(first, end):
+                ret, frame = cap.read()
+                if not ret:
+                    break
+
+                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                results = self.pose.process(rgb_frame)
+                if frame_num >= start and results.pose_landmarks:
+                    landmarks_data.append(self._raw_frame(frame_num, results.pose_landmarks))
+        finally:
+            cap.release()
+
+        return landmarks_data
+
+    def detect_frame(self, frame, box=None, inference_size=None):
+        # 33 x 4 landmark values for one BGR frame, or None; for callers that
+        # bring their own frames, such as live capture. Frames must come in
+        # order, as the tracker follows the pose from one to the next.
+        pose_landmarks = self._detect(frame, box, inference_size)
+        return None if pose_landmarks is None else landmark_values(pose_landmarks)
+
+    def _detect(self, frame, box=None, inference_size=None):
+        # Pose landmarks for the BGR frame, or None. Inference runs on the
+        # (x0, y0, x1, y1) box if given, downscaled so its longer side is at
+        # most inference_size, and the landmarks are mapped back to
+        # normalized full-frame coordinates.
+        height, width = frame.shape[:2]
+        x0, y0, x1, y1 = box or (0, 0, width, height)
+        crop = frame[y0:y1, x0:x1]
+        crop_width, crop_height = x1 - x0, y1 - y0
+        if inference_size and max(crop_width, crop_height) > inference_size:
+            scale = inference_size / max(crop_width, crop_height)
+            size = (max(1, round(crop_width * scale)), max(1, round(crop_height * scale)))
+            with self.metrics.timer("resize"):
+                crop = cv2.resize(crop, size, interpolation=cv2.INTER_AREA)
+
+        # Convert the BGR image to RGB
+        with self.metrics.timer("convert"):
+            rgb_frame = cv2.cvtColor(crop, cv2.COLOR_BGR2RGB)
+        with self.metrics.timer("pose"):
+            pose_landmarks = self.pose.process(rgb_frame).pose_landmarks
+
+        if pose_landmarks and box is not None:
+            # z is scaled like x, by the width of the image it was inferred on
+            for lm in pose_landmarks.landmark:
+                lm.x = (x0 + lm.x * crop_width) / width
+                lm.y = (y0 + lm.y * crop_height) / height
+                lm.z = lm.z * crop_width / width
+        return pose_landmarks
+
+    def _raw_frame(self, frame_num, pose_landmarks):
+        # Format-neutral landmarks in MediaPipe's normalized image coordinates
+        return {
+            "frame": frame_num,
+            "landmarks": [
+                {"x": lm.x, "y": lm.y, "z": lm.z, "visibility": lm.visibility}
+                for lm in pose_landmarks.landmark
+            ]
+        }
 
     def draw_skeleton(self, frame, landmarks):
-        # Helper function to draw lines between landmarks
-        def draw_line(p1, p2, color=(0, 255, 0), thickness=2):
-            cv2.line(frame, (int(p1.x * frame.shape[1]), int(p1.y * frame.shape[0])),
-                     (int(p2.x * frame.shape[1]), int(p2.y * frame.shape[0])), color, thickness)
-
-        # Draw main body lines
-        draw_line(landmarks[11], landmarks[12])  # Shoulders
-        draw_line(landmarks[11], landmarks[23])  # Left torso
-        draw_line(landmarks[12], landmarks[24])  # Right torso
-        draw_line(landmarks[23], landmarks[24])  # Hips
-
-        # Draw arms
-        draw_line(landmarks[11], landmarks[13])  # Left upper arm
-        draw_line(landmarks[13], landmarks[15])  # Left lower arm
-        draw_line(landmarks[12], landmarks[14])  # Right upper arm
-        draw_line(landmarks[14], landmarks[16])  # Right lower arm
-
-        # Draw legs
-        draw_line(landmarks[23], landmarks[25])  # Left thigh
-        draw_line(landmarks[25], landmarks[27])  # Left calf
-        draw_line(landmarks[24], landmarks[26])  # Right thigh
-        draw_line(landmarks[26], landmarks[28])  # Right calf
-
-        # Draw head
-        draw_line(landmarks[0], landmarks[11])  # Neck to left shoulder
-        draw_line(landmarks[0], landmarks[12])  # Neck to right shoulder
+        # Body, arms, legs and head lines in green. landmarks is an array of
+        # (x, y, ...) rows or a sequence of MediaPipe landmarks.
+        if not isinstance(landmarks, np.ndarray):
+            landmarks = np.array([(lm.x, lm.y) for lm in landmarks])
+        self.skeleton_renderer.draw(frame, landmarks)
 
 # Usage
 # processor = VideoProcessor()
-# processor.process_video("input_video.mp4", "landmarks_output.json", "overlay_video.mp4", "skeleton_video.mp4")
\ No newline at end of file
+# processor.process_video("input_video.mp4", "landmarks_output.npz", "overlay_video.mp4", "skeleton_video.mp4", "spine")
+# processor.process_video("input_video.mp4", "landmarks_output.npz", "overlay_video.mp4", "skeleton_video.mp4", "spine", sample_stride=2, motion_threshold=0.01)
+# processor.process_video("input_4k.mp4", "landmarks_output.npz", "overlay_video.mp4", "skeleton_video.mp4", "spine", inference_size=960, roi_padding=0.25)
+# processor.process_video("input_video.mp4", "landmarks_output.npz", None, None, "spine")
+# processor.render_skeleton_video("landmarks_output.npz", "skeleton_video.mp4", 1920, 1080)
+# processor.render_overlay_video("input_video.mp4", "landmarks_output.npz", "overlay_video.mp4")
+# processor.process_video_pipelined("input_video.mp4", "landmarks_output.npz", "overlay_video.mp4", "skeleton_video.mp4", "spine")
\ No newline at end of file